@@ -0,0 +1,129 @@
+# bm25.py
+
+import os
+import json
+import math
+from collections import Counter
+
+import numpy as np
+
+from score_ats import normaliser
+
+
+"""
+INDEX INVERSÉ BM25 sur le corpus de CVs.
+Objectif : retrouver à coût quasi nul les CVs qui contiennent les termes exacts
+de l'offre (noms de compétences, outils), en complément de la similarité SBERT.
+
+Stockage compact (tableaux numpy, ouverts en mmap au premier appel) :
+- bm25_vocab.json   terme -> id
+- bm25_offsets.npy  début des postings de chaque terme (int64, V+1)
+- bm25_docs.npy     ids des documents (int32)
+- bm25_tf.npy       fréquence du terme dans le document (uint16)
+- bm25_doclen.npy   longueur de chaque document en tokens (int32)
+"""
+
+
+K1 = 1.2
+B = 0.75
+K_RRF = 60
+
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the to was were will with
+au aux avec ce ces dans de des du elle en est et il ils je la le les leur mais ne nous on ou par
+pas pour qu que qui sa se ses son sont sur ta te tes ton tu un une vos votre vous
+""".split())
+
+
+def tokeniser(texte):
+    """Tokens normalisés (minuscules, sans accents), sans mots vides ni tokens d'un caractère."""
+    return [t for t in normaliser(texte).split() if len(t) > 1 and t not in STOPWORDS]
+
+
+def construire_bm25(textes, dossier_index):
+    """Construit l'index inversé des `textes` (dans l'ordre des documents) et l'écrit sur disque."""
+    tfs = [Counter(tokeniser(t)) for t in textes]
+    vocab = {}
+    for tf in tfs:
+        for terme in tf:
+            vocab.setdefault(terme, len(vocab))
+
+    # Comptage des postings par terme, puis remplissage en une passe (format CSR)
+    df = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for tf in tfs:
+        for terme in tf:
+            df[vocab[terme] + 1] += 1
+    offsets = np.cumsum(df)
+    docs = np.empty(offsets[-1], dtype=np.int32)
+    freqs = np.empty(offsets[-1], dtype=np.uint16)
+    curseur = offsets[:-1].copy()
+    for d, tf in enumerate(tfs):
+        for terme, n in tf.items():
+            j = vocab[terme]
+            docs[curseur[j]] = d
+            freqs[curseur[j]] = min(n, 65535)
+            curseur[j] += 1
+    doclen = np.array([sum(tf.values()) for tf in tfs], dtype=np.int32)
+
+    with open(os.path.join(dossier_index, "bm25_vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    np.save(os.path.join(dossier_index, "bm25_offsets.npy"), offsets)
+    np.save(os.path.join(dossier_index, "bm25_docs.npy"), docs)
+    np.save(os.path.join(dossier_index, "bm25_tf.npy"), freqs)
+    np.save(os.path.join(dossier_index, "bm25_doclen.npy"), doclen)
+    return len(vocab)
+
+
+def bm25_disponible(dossier_index):
+    return os.path.exists(os.path.join(dossier_index, "bm25_offsets.npy"))
+
+
+class IndexBM25:
+    """Index inversé en lecture seule (mmap) avec scoring BM25 vectorisé."""
+
+    def __init__(self, dossier_index):
+        with open(os.path.join(dossier_index, "bm25_vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        charger = lambda nom: np.load(os.path.join(dossier_index, nom), mmap_mode="r")
+        self.offsets = charger("bm25_offsets.npy")
+        self.docs = charger("bm25_docs.npy")
+        self.tf = charger("bm25_tf.npy")
+        self.doclen = np.asarray(charger("bm25_doclen.npy"), dtype=np.float32)
+        self.n_docs = len(self.doclen)
+        self.avgdl = float(self.doclen.mean()) if self.n_docs else 0.0
+        # Dénominateur BM25 par document, précalculé une fois
+        self._norm = K1 * (1 - B + B * self.doclen / (self.avgdl or 1.0))
+
+    def scores(self, requete):
+        """Score BM25 de chaque document pour la requête (texte ou liste de termes)."""
+        termes = tokeniser(" ".join(requete) if isinstance(requete, (list, tuple)) else requete)
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for terme in set(termes):
+            j = self.vocab.get(terme)
+            if j is None:
+                continue
+            debut, fin = int(self.offsets[j]), int(self.offsets[j + 1])
+            docs = np.asarray(self.docs[debut:fin])
+            tf = np.asarray(self.tf[debut:fin], dtype=np.float32)
+            df = fin - debut
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (K1 + 1) / (tf + self._norm[docs])
+        return scores
+
+
+def fusion_rrf(*scores_listes, k=K_RRF, top=None):
+    """
+    Reciprocal Rank Fusion de plusieurs vecteurs de scores (un score par document).
+    Retourne (indices triés par score fusionné décroissant, scores fusionnés).
+    Les documents à score nul dans une liste ne reçoivent pas de contribution de cette liste.
+    """
+    n = len(scores_listes[0])
+    fusion = np.zeros(n, dtype=np.float32)
+    for scores in scores_listes:
+        scores = np.asarray(scores, dtype=np.float32)
+        ordre = np.argsort(-scores, kind="stable")
+        rangs = np.empty(n, dtype=np.float32)
+        rangs[ordre] = np.arange(1, n + 1, dtype=np.float32)
+        fusion += np.where(scores > 0, 1.0 / (k + rangs), 0.0)
+    ordre = np.argsort(-fusion, kind="stable")
+    return (ordre[:top] if top else ordre), fusion
@@ -0,0 +1,234 @@
+# cache_cv.py
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+
+"""
+MAGASIN DE CVs indexés par empreinte de contenu (SHA-256 des octets uploadés).
+Objectif : ne calculer qu'une seule fois les artefacts qui ne dépendent pas de l'offre
+(texte extrait, expériences, embeddings) et les partager entre sessions.
+Le disque fait foi pour tous les workers : chaque session pose un bail (fichier
+.bail-<session> dans le dossier du CV, valable ARIA_CACHE_CV_BAIL secondes) et chaque
+accès rafraîchit la date du dossier. Au-delà de la capacité, les CVs sans bail vivant
+et sans accès récent sont évincés, les moins récents d'abord.
+"""
+
+
+CAPACITE_CV = int(os.environ.get("ARIA_CACHE_CV_MAX", "200"))
+DUREE_BAIL = int(os.environ.get("ARIA_CACHE_CV_BAIL", str(24 * 3600)))   # secondes
+DELAI_GRACE = 120   # secondes : un CV lu aussi récemment n'est jamais évincé (lecteur sans bail)
+TAILLE_BLOC_HASH = 64 * 1024
+PREFIXE_BAIL = ".bail-"
+
+
+def hash_contenu(source):
+    """SHA-256 hexadécimal d'octets ou d'un fichier binaire (lu par blocs)."""
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        h.update(source)
+        return h.hexdigest()
+    source.seek(0)
+    for bloc in iter(lambda: source.read(TAILLE_BLOC_HASH), b""):
+        h.update(bloc)
+    source.seek(0)
+    return h.hexdigest()
+
+
+def _lire(chemin):
+    if chemin.endswith(".npy"):
+        return np.load(chemin)
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f) if chemin.endswith(".json") else f.read()
+
+
+def _ecrire(chemin, valeur):
+    # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel,
+    # et deux écrivains (threads ou workers) n'ont jamais le même fichier temporaire
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(chemin), prefix=".tmp-")
+    try:
+        if chemin.endswith(".npy"):
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(valeur))
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                if chemin.endswith(".json"):
+                    json.dump(valeur, f, ensure_ascii=False, indent=2)
+                else:
+                    f.write(str(valeur))
+        os.replace(tmp, chemin)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _toucher(chemin):
+    """Rafraîchit la date de modification (récence partagée entre workers)."""
+    try:
+        os.utime(chemin)
+    except FileNotFoundError:
+        pass
+
+
+class MagasinCV:
+    """Artefacts de CV partagés sur disque, avec baux par session et éviction LRU par date d'accès."""
+
+    def __init__(self, dossier, capacite=CAPACITE_CV, duree_bail=DUREE_BAIL):
+        self.dossier = dossier
+        self.capacite = capacite
+        self.duree_bail = duree_bail
+        self._lock = threading.Lock()
+        self._sessions = {}             # session_id -> cv_hash (baux posés par ce worker)
+        self._locks_calcul = {}         # (cv_hash, nom) -> Lock, un seul calcul à la fois
+        os.makedirs(dossier, exist_ok=True)
+
+    def chemin(self, cv_hash, nom):
+        return os.path.join(self.dossier, cv_hash, nom)
+
+    # ---------- Baux ----------
+    def _bail(self, cv_hash, session_id):
+        return os.path.join(self.dossier, cv_hash, PREFIXE_BAIL + session_id)
+
+    def acquerir(self, cv_hash, session_id):
+        """La session référence désormais ce CV (et relâche le précédent le cas échéant)."""
+        with self._lock:
+            ancien = self._sessions.get(session_id)
+            self._sessions[session_id] = cv_hash
+        if ancien and ancien != cv_hash:
+            self._rompre(ancien, session_id)
+        os.makedirs(os.path.join(self.dossier, cv_hash), exist_ok=True)
+        _toucher(os.path.join(self.dossier, cv_hash))
+        with open(self._bail(cv_hash, session_id), "w"):
+            pass
+        self._evincer()
+
+    def liberer_session(self, session_id):
+        with self._lock:
+            cv_hash = self._sessions.pop(session_id, None)
+        if cv_hash:
+            self._rompre(cv_hash, session_id)
+        self._evincer()
+
+    def _rompre(self, cv_hash, session_id):
+        try:
+            os.remove(self._bail(cv_hash, session_id))
+        except FileNotFoundError:
+            pass
+
+    def _baux_vivants(self, dossier_cv, maintenant):
+        try:
+            noms = os.listdir(dossier_cv)
+        except FileNotFoundError:
+            return 0
+        vivants = 0
+        for nom in noms:
+            if nom.startswith(PREFIXE_BAIL):
+                try:
+                    vivants += maintenant - os.path.getmtime(os.path.join(dossier_cv, nom)) < self.duree_bail
+                except FileNotFoundError:
+                    pass
+        return vivants
+
+    def _evincable(self, dossier_cv, maintenant):
+        try:
+            recent = maintenant - os.path.getmtime(dossier_cv) < DELAI_GRACE
+        except FileNotFoundError:
+            return False
+        return not recent and not self._baux_vivants(dossier_cv, maintenant)
+
+    def _dossiers(self):
+        return [d for d in os.listdir(self.dossier)
+                if not d.startswith(".") and os.path.isdir(os.path.join(self.dossier, d))]
+
+    def _evincer(self):
+        """
+        Supprime les CVs sans bail vivant les moins récemment accédés au-delà de la capacité.
+        Le dossier est d'abord renommé (atomique) : un autre worker qui y accède ensuite
+        recalcule ses artefacts au lieu de lire un dossier à moitié supprimé.
+        """
+        dossiers = self._dossiers()
+        excedent = len(dossiers) - self.capacite
+        if excedent <= 0:
+            return
+        maintenant = time.time()
+        dates = {}
+        for d in dossiers:
+            try:
+                dates[d] = os.path.getmtime(os.path.join(self.dossier, d))
+            except FileNotFoundError:
+                pass
+        for cv_hash in sorted(dates, key=dates.get):
+            if excedent <= 0:
+                break
+            dossier_cv = os.path.join(self.dossier, cv_hash)
+            if not self._evincable(dossier_cv, maintenant):
+                continue
+            corbeille = os.path.join(self.dossier, f".evince-{cv_hash}-{os.getpid()}-{threading.get_ident()}")
+            try:
+                os.rename(dossier_cv, corbeille)
+            except OSError:
+                continue   # déjà évincé par un autre worker
+            excedent -= 1
+            shutil.rmtree(corbeille, ignore_errors=True)
+
+    # ---------- Artefacts ----------
+    def artefact(self, cv_hash, nom, calcul, memoriser=None):
+        """
+        Retourne (valeur, chemin) de l'artefact `nom` du CV, en le calculant une seule fois.
+        L'extension du nom fixe le format : .txt, .json ou .npy.
+        Si memoriser(valeur) est faux (ex. extraction vide), rien n'est écrit et le chemin
+        est None : le prochain appel recalcule.
+        """
+        chemin = self.chemin(cv_hash, nom)
+        with self._lock:
+            lock = self._locks_calcul.setdefault((cv_hash, nom), threading.Lock())
+        _toucher(os.path.dirname(chemin))
+
+        with lock:
+            try:
+                return _lire(chemin), chemin
+            except FileNotFoundError:
+                pass
+            valeur = calcul()
+            if memoriser is not None and not memoriser(valeur):
+                return valeur, None
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            _ecrire(chemin, valeur)
+
+        with self._lock:
+            self._locks_calcul.pop((cv_hash, nom), None)
+        return valeur, chemin
+
+    def ecrire(self, cv_hash, nom, valeur):
+        """Remplace la valeur de l'artefact (ex. marqueur d'échec remplacé par un nouvel essai)."""
+        chemin = self.chemin(cv_hash, nom)
+        with self._lock:
+            lock = self._locks_calcul.setdefault((cv_hash, nom), threading.Lock())
+        with lock:
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            _ecrire(chemin, valeur)
+        return chemin
+
+    def lire(self, cv_hash, nom):
+        """Valeur de l'artefact s'il a déjà été calculé, sinon None (ne calcule rien)."""
+        try:
+            return _lire(self.chemin(cv_hash, nom))
+        except FileNotFoundError:
+            return None
+
+    def stats(self):
+        maintenant = time.time()
+        dossiers = self._dossiers()
+        return {
+            "cvs": len(dossiers),
+            "references": sum(self._baux_vivants(os.path.join(self.dossier, d), maintenant) for d in dossiers),
+            "capacite": self.capacite,
+        }
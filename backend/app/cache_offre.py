@@ -0,0 +1,185 @@
+# cache_offre.py
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+"""
+CACHE PARTAGÉ des analyses d'offres d'emploi.
+Objectif : quand plusieurs candidats postulent à la même annonce, ne scraper
+et n'analyser l'offre qu'une seule fois (clé = URL normalisée ou hash du texte),
+y compris pour des requêtes simultanées (single-flight).
+"""
+
+
+TTL_OFFRE = int(os.environ.get("ARIA_CACHE_OFFRE_TTL", str(6 * 3600)))   # secondes
+CAPACITE_OFFRES = int(os.environ.get("ARIA_CACHE_OFFRE_MAX", "500"))
+
+# Paramètres de tracking qui ne changent pas le contenu de l'annonce
+PARAMS_TRACKING = re.compile(r"^(utm_.*|gclid|fbclid|msclkid|mc_[a-z]+|ref|refid|trk|trackingid|src|source|origin)$", re.I)
+
+
+def normaliser_url(url):
+    """URL canonique : schéma/hôte en minuscules, sans fragment, port par défaut ni tracking."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not PARAMS_TRACKING.match(k))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def hash_texte_offre(texte):
+    """Hash du texte de l'offre, insensible à la casse et aux espaces."""
+    texte = re.sub(r"\s+", " ", texte or "").strip().lower()
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Un seul appel en vol par clé : les appelants concurrents attendent son résultat."""
+
+    class _Appel:
+        __slots__ = ("fini", "resultat", "erreur")
+
+        def __init__(self):
+            self.fini = threading.Event()
+            self.resultat = None
+            self.erreur = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vol = {}
+
+    def executer(self, cle, fn):
+        with self._lock:
+            appel = self._en_vol.get(cle)
+            meneur = appel is None
+            if meneur:
+                appel = self._en_vol[cle] = self._Appel()
+
+        if not meneur:
+            appel.fini.wait()
+            if appel.erreur is not None:
+                raise appel.erreur
+            return appel.resultat
+
+        try:
+            appel.resultat = fn()
+            return appel.resultat
+        except Exception as e:
+            appel.erreur = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vol[cle]
+            appel.fini.set()
+
+
+class CacheOffres:
+    """
+    Analyses d'offres indexées par URL normalisée et par hash du texte.
+    Une entrée contient : texte_offre, analyse (JSON), embedding des mots-clés, hash.
+    """
+
+    def __init__(self, ttl=TTL_OFFRE, capacite=CAPACITE_OFFRES):
+        self.ttl = ttl
+        self.capacite = capacite
+        self._lock = threading.Lock()
+        self._par_hash = OrderedDict()   # hash texte -> (horodatage, entrée)
+        self._par_url = {}               # url normalisée -> hash texte
+        self._vol = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, hash_offre):
+        with self._lock:
+            item = self._par_hash.get(hash_offre)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._par_hash[hash_offre]
+                return None
+            self._par_hash.move_to_end(hash_offre)
+            return item[1]
+
+    def _put(self, entree, url=None):
+        with self._lock:
+            self._par_hash[entree["hash"]] = (time.monotonic(), entree)
+            self._par_hash.move_to_end(entree["hash"])
+            if url:
+                self._par_url[url] = entree["hash"]
+            while len(self._par_hash) > self.capacite:
+                self._par_hash.popitem(last=False)
+            if len(self._par_url) > 2 * self.capacite:
+                self._par_url = {u: h for u, h in self._par_url.items() if h in self._par_hash}
+
+    def get(self, hash_offre):
+        return self._get(hash_offre)
+
+    def connait_url(self, url):
+        """L'offre de cette URL est-elle déjà analysée (et encore valide) ?"""
+        with self._lock:
+            hash_connu = self._par_url.get(normaliser_url(url))
+        return hash_connu is not None and self._get(hash_connu) is not None
+
+    def obtenir(self, url=None, texte=None, scraper=None, analyser=None, encoder=None):
+        """
+        Retourne l'entrée d'analyse de l'offre, en scrapant/analysant au plus une fois.
+
+        url + scraper : l'offre est téléchargée si l'URL n'est pas en cache
+        texte : texte déjà disponible (mode API)
+        analyser(texte) -> dict ; encoder(analyse) -> np.ndarray
+        """
+        if url:
+            url_norm = normaliser_url(url)
+            with self._lock:
+                hash_connu = self._par_url.get(url_norm)
+            entree = self._get(hash_connu) if hash_connu else None
+            if entree is not None:
+                self.hits += 1
+                return entree
+            # Une seule requête scrape l'URL, les autres attendent
+            return self._vol.executer("url:" + url_norm,
+                                      lambda: self._depuis_texte(scraper(url), analyser, encoder, url_norm))
+        return self._depuis_texte(texte, analyser, encoder)
+
+    def _depuis_texte(self, texte, analyser, encoder, url_norm=None):
+        hash_offre = hash_texte_offre(texte)
+        entree = self._get(hash_offre)
+        if entree is not None:
+            self.hits += 1
+            if url_norm:
+                self._put(entree, url_norm)
+            return entree
+
+        def _calculer():
+            # Re-vérifie : un autre meneur a pu remplir le cache entre-temps
+            deja = self._get(hash_offre)
+            if deja is not None:
+                return deja
+            self.misses += 1
+            analyse = analyser(texte)
+            entree = {
+                "hash": hash_offre,
+                "texte_offre": texte,
+                "analyse": analyse,
+                "embedding": encoder(analyse) if (encoder and analyse) else None,
+            }
+            # Une analyse vide (JSON illisible) n'est pas mise en cache
+            if analyse:
+                self._put(entree, url_norm)
+            return entree
+
+        return self._vol.executer("texte:" + hash_offre, _calculer)
+
+    def stats(self):
+        with self._lock:
+            return {"offres": len(self._par_hash), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,230 @@
+# cassettes.py
+
+import os
+import json
+import time
+import zlib
+import base64
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+"""
+CASSETTES : enregistrement / relecture des appels Mistral et des pages d'offres.
+Objectif : rejouer une session complète (phase 1, phase 2, chatbot) sans réseau,
+de façon reproductible, pour les tests de performance et de non-régression.
+
+- ARIA_CASSETTE_MODE=enregistrer : chaque réponse Mistral (complète ou en flux,
+  avec l'horodatage de chaque morceau) et chaque page d'offre téléchargée (octets
+  lus, compressés) est ajoutée au fichier ARIA_CASSETTE (JSON lines)
+- ARIA_CASSETTE_MODE=rejouer : les réponses sont servies depuis la cassette, avec
+  les latences d'origine (ARIA_CASSETTE_LATENCE=originale) ou sans attente (nulle).
+  Un appel absent de la cassette lève une erreur (pas de repli silencieux sur le réseau)
+
+Les appels identiques (même modèle, même prompt / même URL) sont rejoués dans
+l'ordre d'enregistrement ; le dernier est resservi une fois la liste épuisée.
+Pour réenregistrer, supprimer le fichier : l'enregistrement ajoute à la fin.
+"""
+
+
+MODE = os.environ.get("ARIA_CASSETTE_MODE", "").lower()          # "", "enregistrer", "rejouer"
+CHEMIN = os.environ.get("ARIA_CASSETTE", os.path.join(os.getcwd(), "cassettes", "session.jsonl"))
+LATENCE = os.environ.get("ARIA_CASSETTE_LATENCE", "originale").lower()    # "originale" ou "nulle"
+TAILLE_BLOC_PAGE = 64 * 1024
+
+
+def _cle(genre, *parties):
+    return hashlib.sha256("\n".join((genre,) + parties).encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """Enregistreur / lecteur d'échanges réseau, partagé par les threads."""
+
+    def __init__(self, chemin=CHEMIN, mode=MODE, latence=LATENCE):
+        if mode not in ("", "enregistrer", "rejouer"):
+            raise Exception(f"ARIA_CASSETTE_MODE inconnu : {mode} (enregistrer | rejouer)")
+        self.chemin = chemin
+        self.mode = mode
+        self.latence = latence != "nulle"
+        self._lock = threading.Lock()
+        self._entrees = None        # rejouer : cle -> [entrées], chargées au premier appel
+        self._positions = Counter()
+        self.compteurs = Counter()
+        if mode:
+            print(f"[CASSETTE] Mode {mode} : {chemin}")
+
+    @property
+    def enregistre(self):
+        return self.mode == "enregistrer"
+
+    @property
+    def rejoue(self):
+        return self.mode == "rejouer"
+
+    # ======================
+    # Fichier
+    # ======================
+    def _ecrire(self, entree):
+        ligne = json.dumps(entree, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.chemin)), exist_ok=True)
+            with open(self.chemin, "a", encoding="utf-8") as f:
+                f.write(ligne)
+            self.compteurs[f"enregistres_{entree['genre']}"] += 1
+
+    def _charger(self):
+        """Index cle -> entrées (sous self._lock)."""
+        if self._entrees is None:
+            self._entrees = defaultdict(list)
+            if not os.path.exists(self.chemin):
+                raise Exception(f"Cassette introuvable : {self.chemin}")
+            with open(self.chemin, encoding="utf-8") as f:
+                for ligne in f:
+                    if ligne.strip():
+                        entree = json.loads(ligne)
+                        self._entrees[entree["cle"]].append(entree)
+            print(f"[CASSETTE] {sum(map(len, self._entrees.values()))} échanges chargés")
+        return self._entrees
+
+    def _suivante(self, genre, cle, description):
+        """Prochaine entrée enregistrée pour cette clé (la dernière est resservie)."""
+        with self._lock:
+            entrees = self._charger().get(cle)
+            if not entrees:
+                self.compteurs[f"absents_{genre}"] += 1
+                raise Exception(f"Cassette : aucun enregistrement pour {description}")
+            i = self._positions[cle]
+            self._positions[cle] = i + 1
+            self.compteurs[f"rejoues_{genre}"] += 1
+            return entrees[min(i, len(entrees) - 1)]
+
+    def _attendre(self, secondes):
+        if self.latence and secondes > 0:
+            time.sleep(secondes)
+
+    def _rejouer_erreur(self, entree):
+        if entree.get("erreur"):
+            raise Exception(entree["erreur"])
+
+    # ======================
+    # Mistral
+    # ======================
+    def mistral(self, modele, prompt, appel):
+        """Réponse complète : appel() en direct / enregistré, ou relue depuis la cassette."""
+        if not self.mode:
+            return appel()
+        cle = _cle("mistral", modele, prompt)
+        if self.rejoue:
+            entree = self._suivante("mistral", cle, f"le prompt « {prompt[:60]}... »")
+            self._attendre(entree["duree_s"])
+            self._rejouer_erreur(entree)
+            return entree["reponse"]
+
+        debut = time.monotonic()
+        entree = {"genre": "mistral", "cle": cle, "modele": modele, "apercu": prompt[:120]}
+        try:
+            entree["reponse"] = appel()
+            return entree["reponse"]
+        except Exception as e:
+            entree["erreur"] = str(e)
+            raise
+        finally:
+            entree["duree_s"] = round(time.monotonic() - debut, 3)
+            self._ecrire(entree)
+
+    def mistral_flux(self, modele, prompt, flux):
+        """Réponse en flux : morceaux de flux() (générateur), enregistrés avec leur instant
+        d'arrivée, ou relus au même rythme. Un flux abandonné par l'appelant (objet JSON
+        fermé) est enregistré tel que lu : la relecture s'arrête au même endroit."""
+        if not self.mode:
+            yield from flux()
+            return
+        cle = _cle("mistral_flux", modele, prompt)
+        if self.rejoue:
+            entree = self._suivante("mistral_flux", cle, f"le prompt « {prompt[:60]}... »")
+            debut = time.monotonic()
+            for instant, morceau in entree["morceaux"]:
+                self._attendre(instant - (time.monotonic() - debut))
+                yield morceau
+            self._rejouer_erreur(entree)
+            return
+
+        debut = time.monotonic()
+        entree = {"genre": "mistral_flux", "cle": cle, "modele": modele, "apercu": prompt[:120], "morceaux": []}
+        source = flux()
+        try:
+            for morceau in source:
+                entree["morceaux"].append([round(time.monotonic() - debut, 3), morceau])
+                yield morceau
+        except Exception as e:
+            entree["erreur"] = str(e)
+            raise
+        finally:
+            source.close()
+            entree["duree_s"] = round(time.monotonic() - debut, 3)
+            self._ecrire(entree)
+
+    # ======================
+    # Pages web
+    # ======================
+    @contextmanager
+    def page(self, url, ouvrir):
+        """
+        Page téléchargée : ouvrir(url) est un context manager qui fournit
+        (type de contenu, charset HTTP ou None, itérateur de blocs d'octets).
+        Seuls les octets effectivement lus sont enregistrés (lecture bornée).
+        """
+        if not self.mode:
+            with ouvrir(url) as page:
+                yield page
+            return
+        cle = _cle("page", url)
+        if self.rejoue:
+            entree = self._suivante("page", cle, url)
+            self._rejouer_erreur(entree)
+            yield entree["type_contenu"], entree["charset"], self._blocs_rejoues(entree)
+            return
+
+        debut = time.monotonic()
+        entree = {"genre": "page", "cle": cle, "url": url, "type_contenu": "", "charset": None}
+        lus, ouverte = [], False
+
+        def enregistrer(blocs):
+            try:
+                for bloc in blocs:
+                    lus.append(bloc)
+                    yield bloc
+            except Exception as e:
+                entree["erreur_lecture"] = str(e)
+                raise
+        try:
+            with ouvrir(url) as (type_contenu, charset, blocs):
+                ouverte = True
+                entree.update(type_contenu=type_contenu, charset=charset)
+                yield type_contenu, charset, enregistrer(blocs)
+        except Exception as e:
+            if not ouverte:         # erreur HTTP / réseau à l'ouverture (pas celle de l'appelant)
+                entree["erreur"] = str(e)
+            raise
+        finally:
+            entree["duree_s"] = round(time.monotonic() - debut, 3)
+            entree["contenu"] = base64.b64encode(zlib.compress(b"".join(lus))).decode("ascii")
+            self._ecrire(entree)
+
+    def _blocs_rejoues(self, entree):
+        contenu = zlib.decompress(base64.b64decode(entree.get("contenu") or ""))
+        n_blocs = max(1, -(-len(contenu) // TAILLE_BLOC_PAGE))
+        for i in range(0, len(contenu), TAILLE_BLOC_PAGE):
+            self._attendre(entree["duree_s"] / n_blocs)
+            yield contenu[i:i + TAILLE_BLOC_PAGE]
+        if entree.get("erreur_lecture"):
+            raise Exception(entree["erreur_lecture"])
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode or "inactif", **self.compteurs}
+
+
+cassette = Cassette()
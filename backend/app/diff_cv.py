@@ -0,0 +1,210 @@
+# diff_cv.py
+
+import re
+from difflib import SequenceMatcher
+
+from score_ats import normaliser
+
+
+"""
+DIFF STRUCTUREL LOCAL entre le CV original et le CV optimisé (cv_optimise_complet).
+Objectif : lister ce qui a réellement changé (expériences alignées, puces reformulées,
+mots-clés ajoutés, compétences nouvelles) en quelques millisecondes, sans appel LLM.
+Le CV original peut être du texte brut ou la même structure JSON.
+"""
+
+
+SEUIL_INCHANGE = 0.90      # similarité au-dessus de laquelle une puce est considérée identique
+SEUIL_REFORMULE = 0.35     # en dessous : contenu nouveau plutôt que reformulé
+SEUIL_ALIGNEMENT = 0.30    # similarité minimale poste/entreprise pour aligner deux expériences
+MAX_MODIFS_AFFICHEES = 8
+
+
+def _tokens(texte):
+    return set(normaliser(texte).split())
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _liste(valeur):
+    """Champ texte ou liste -> liste d'éléments (séparateurs , ; | • ou retours ligne)."""
+    if not valeur:
+        return []
+    if isinstance(valeur, list):
+        return [str(v).strip() for v in valeur if str(v).strip()]
+    return [v.strip() for v in re.split(r"[,;|•\n]", str(valeur)) if v.strip()]
+
+
+class _Index:
+    """Lignes du CV original avec leurs tokens, pour retrouver la ligne la plus proche d'une phrase."""
+
+    def __init__(self, lignes):
+        self.lignes = [l for l in lignes if len(l.strip()) > 2]
+        self.tokens = [_tokens(l) for l in self.lignes]
+
+    def plus_proche(self, phrase):
+        if not self.lignes:
+            return None, 0.0
+        tp = _tokens(phrase)
+        # Pré-filtre par Jaccard, puis ratio difflib sur les meilleurs candidats seulement
+        candidats = sorted(range(len(self.lignes)), key=lambda i: _jaccard(tp, self.tokens[i]), reverse=True)[:3]
+        meilleur, score = None, 0.0
+        for i in candidats:
+            r = SequenceMatcher(None, normaliser(phrase), normaliser(self.lignes[i])).ratio()
+            r = max(r, _jaccard(tp, self.tokens[i]))
+            if r > score:
+                meilleur, score = self.lignes[i], r
+        return meilleur, score
+
+
+def _aplatir(valeur):
+    """Toutes les chaînes d'une structure JSON, une par ligne."""
+    if isinstance(valeur, dict):
+        return [l for v in valeur.values() for l in _aplatir(v)]
+    if isinstance(valeur, list):
+        return [l for v in valeur for l in _aplatir(v)]
+    return [str(valeur)] if valeur not in (None, "") else []
+
+
+def _texte_original(original):
+    """Texte brut du CV original (dict structuré ou texte)."""
+    if isinstance(original, dict):
+        return "\n".join(_aplatir(original))
+    return str(original or "")
+
+
+def _comparer_puces(puces, index):
+    res = {"reformulees": [], "ajoutees": [], "inchangees": 0}
+    for puce in puces:
+        avant, sim = index.plus_proche(puce)
+        if sim >= SEUIL_INCHANGE:
+            res["inchangees"] += 1
+        elif sim >= SEUIL_REFORMULE:
+            res["reformulees"].append({"avant": avant, "apres": puce, "similarite": round(sim, 2)})
+        else:
+            res["ajoutees"].append(puce)
+    return res
+
+
+def _aligner_experiences(exps_opt, exps_orig):
+    """Appariement glouton optimisé -> original sur la similarité poste + entreprise."""
+    cle = lambda e: _tokens(f"{e.get('poste', '')} {e.get('entreprise', e.get('employeur', ''))}")
+    cles_orig = [cle(e) for e in exps_orig]
+    paires, pris = [], set()
+    for e in exps_opt:
+        ce = cle(e)
+        scores = [(_jaccard(ce, co), j) for j, co in enumerate(cles_orig) if j not in pris]
+        best = max(scores, default=(0.0, None))
+        if best[1] is not None and best[0] >= SEUIL_ALIGNEMENT:
+            pris.add(best[1])
+            paires.append((e, exps_orig[best[1]]))
+        else:
+            paires.append((e, None))
+    retirees = [exps_orig[j] for j in range(len(exps_orig)) if j not in pris]
+    return paires, retirees
+
+
+def comparer_cv(original, optimise, mots_cles=None):
+    """
+    Diff structurel original -> optimisé.
+
+    Parameters
+    ----------
+    original : str | dict
+        Texte du CV original, ou sa structure (même format que cv_optimise_complet)
+    optimise : dict
+        cv_optimise_complet
+    mots_cles : list[str], optional
+        Mots-clés de l'offre (mots_cles_ats + competences_cles) pour détecter ceux ajoutés
+
+    Returns
+    -------
+    dict : détail par section / expérience + "modifications_apportes" (liste lisible pour l'étape 5)
+    """
+    if isinstance(optimise, dict) and "cv_optimise_complet" in optimise:
+        optimise = optimise["cv_optimise_complet"]
+    if not isinstance(optimise, dict) or not optimise:
+        return {"sections": {}, "experiences": [], "mots_cles_ajoutes": [], "modifications_apportes": []}
+
+    texte_orig = _texte_original(original)
+    index = _Index(texte_orig.splitlines())
+    norm_orig = f" {normaliser(texte_orig)} "
+    present_orig = lambda terme: f" {normaliser(terme)} " in norm_orig
+
+    sections = {}
+
+    # Résumé
+    resume = str(optimise.get("resume") or "")
+    if resume:
+        resume_orig = original.get("resume") if isinstance(original, dict) else None
+        if resume_orig:
+            sim = SequenceMatcher(None, normaliser(resume), normaliser(resume_orig)).ratio()
+        else:
+            _, sim = index.plus_proche(resume)
+        statut = "inchange" if sim >= SEUIL_INCHANGE else "reformule" if sim >= SEUIL_REFORMULE else "ajoute"
+        sections["resume"] = {"statut": statut, "similarite": round(sim, 2)}
+
+    # Compétences (éléments présents dans l'optimisé mais pas dans l'original)
+    for cle in ("competences_techniques", "soft_skills", "langues", "certifications"):
+        items = _liste(optimise.get(cle))
+        if items:
+            ajoutes = [i for i in items if not present_orig(i)]
+            sections[cle] = {"ajoutes": ajoutes, "conserves": len(items) - len(ajoutes)}
+
+    # Expériences
+    exps_orig = original.get("experiences", []) if isinstance(original, dict) else []
+    paires, retirees = _aligner_experiences(optimise.get("experiences", []) or [], exps_orig)
+    experiences = []
+    for exp, exp_orig in paires:
+        puces = _liste(exp.get("taches"))
+        idx = _Index(_liste(exp_orig.get("taches"))) if exp_orig else index
+        detail = _comparer_puces(puces, idx)
+        present = bool(exp_orig) or any(present_orig(v) for v in (exp.get("entreprise"), exp.get("poste")) if v)
+        detail.update({
+            "poste": exp.get("poste", ""),
+            "entreprise": exp.get("entreprise", ""),
+            "statut": "alignee" if present else "nouvelle",
+        })
+        experiences.append(detail)
+
+    # Mots-clés de l'offre désormais présents
+    texte_opt = " ".join(_aplatir(optimise))
+    norm_opt = f" {normaliser(texte_opt)} "
+    mots_cles_ajoutes = [m for m in dict.fromkeys(mots_cles or [])
+                         if f" {normaliser(m)} " in norm_opt and not present_orig(m)]
+
+    return {
+        "sections": sections,
+        "experiences": experiences,
+        "experiences_retirees": [f"{e.get('poste', '')} @ {e.get('entreprise', e.get('employeur', ''))}" for e in retirees],
+        "mots_cles_ajoutes": mots_cles_ajoutes,
+        "modifications_apportes": _resumer(sections, experiences, mots_cles_ajoutes),
+    }
+
+
+def _resumer(sections, experiences, mots_cles_ajoutes):
+    """Phrases courtes pour le panneau 'Améliorations appliquées'."""
+    modifs = []
+    if mots_cles_ajoutes:
+        modifs.append(f"Mots-clés de l'offre ajoutés : {', '.join(mots_cles_ajoutes[:6])}")
+    resume = sections.get("resume")
+    if resume and resume["statut"] != "inchange":
+        modifs.append("Résumé de profil rédigé" if resume["statut"] == "ajoute" else "Résumé de profil reformulé")
+    for exp in experiences:
+        n_ref, n_add = len(exp["reformulees"]), len(exp["ajoutees"])
+        if n_ref or n_add:
+            parts = []
+            if n_ref:
+                parts.append(f"{n_ref} puce(s) reformulée(s)")
+            if n_add:
+                parts.append(f"{n_add} ajoutée(s)")
+            modifs.append(f"{exp['poste'] or 'Expérience'} : {', '.join(parts)}")
+    comp = sections.get("competences_techniques")
+    if comp and comp["ajoutes"]:
+        modifs.append(f"Compétences techniques mises en avant : {', '.join(comp['ajoutes'][:6])}")
+    soft = sections.get("soft_skills")
+    if soft and soft["ajoutes"]:
+        modifs.append(f"Soft skills ajoutées : {', '.join(soft['ajoutes'][:5])}")
+    return modifs[:MAX_MODIFS_AFFICHEES]
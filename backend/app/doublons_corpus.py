@@ -0,0 +1,154 @@
+# doublons_corpus.py
+
+import os
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from score_ats import normaliser
+
+
+"""
+DÉDOUBLONNAGE du corpus de CVs (MinHash + LSH), à l'ingestion.
+Objectif : regrouper les quasi-doublons (variantes d'un même modèle ou d'une même
+personne) et n'indexer qu'un document canonique par groupe. Un index plus petit
+est plus rapide à interroger, et les exemples du RAG ne sont plus trois copies
+du même CV.
+
+- Shingles : 3-grammes de mots normalisés, hachés (crc32) puis ramenés sous P = 2^31 - 1
+- Signature MinHash : NB_PERMUTATIONS fonctions (a.x + b) mod P, vectorisées numpy ;
+  a, b, x < 2^31 donc a.x + b < 2^63 : pas de débordement uint64
+- LSH : la signature est découpée en bandes ; deux CVs partageant une bande
+  deviennent candidats, confirmés si leur Jaccard estimé >= ARIA_DOUBLONS_SEUIL
+- Groupes : union-find sur les paires confirmées ; le canonique est le CV le plus
+  long du groupe (le plus complet)
+"""
+
+
+SEUIL_DOUBLON = float(os.environ.get("ARIA_DOUBLONS_SEUIL", "0.8"))
+NB_PERMUTATIONS = 128
+NB_BANDES = 16                  # 16 x 8 lignes : seuil LSH ~ (1/16)^(1/8) = 0.71
+TAILLE_SHINGLE = 3              # Jaccard ~0.8 pour ~3 % de mots modifiés
+PREMIER = np.uint64(2 ** 31 - 1)  # premier de Mersenne : a, b, x < 2^31 et a.x + b < 2^63
+
+# Marqueurs d'anonymisation du corpus : identiques partout, ils rapprocheraient tous les CVs
+ANONYMISATION = {"company", "name", "city", "state"}
+
+
+def shingles(texte, taille=TAILLE_SHINGLE):
+    """Ensemble des n-grammes de mots du texte normalisé, hachés sur 31 bits (< PREMIER)."""
+    mots = [m for m in normaliser(texte).split() if m not in ANONYMISATION]
+    if len(mots) < taille:
+        mots = mots + [""] * (taille - len(mots))
+    return np.unique(np.fromiter(
+        (zlib.crc32(" ".join(mots[i:i + taille]).encode("utf-8")) for i in range(len(mots) - taille + 1)),
+        dtype=np.uint64) % PREMIER)
+
+
+def _permutations(n=NB_PERMUTATIONS, graine=42):
+    rng = np.random.default_rng(graine)
+    a = rng.integers(1, PREMIER, size=n, dtype=np.uint64)
+    b = rng.integers(0, PREMIER, size=n, dtype=np.uint64)
+    return a, b
+
+
+def signatures_minhash(textes, n_permutations=NB_PERMUTATIONS):
+    """Matrice (N, n_permutations) des signatures MinHash des textes."""
+    a, b = _permutations(n_permutations)
+    sig = np.empty((len(textes), n_permutations), dtype=np.uint64)
+    for i, texte in enumerate(textes):
+        h = shingles(texte)
+        sig[i] = ((h[:, None] * a[None, :] + b[None, :]) % PREMIER).min(axis=0)
+    return sig
+
+
+def paires_candidates(signatures, n_bandes=NB_BANDES):
+    """Paires (i, j), i < j, partageant au moins une bande de signature identique."""
+    lignes = signatures.shape[1] // n_bandes
+    paires = set()
+    for bande in range(n_bandes):
+        seaux = defaultdict(list)
+        bloc = np.ascontiguousarray(signatures[:, bande * lignes:(bande + 1) * lignes])
+        for i, cle in enumerate(bloc):
+            seaux[cle.tobytes()].append(i)
+        for membres in seaux.values():
+            for x, i in enumerate(membres):
+                for j in membres[x + 1:]:
+                    paires.add((i, j))
+    return paires
+
+
+def _racine(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def grouper_doublons(textes, seuil=SEUIL_DOUBLON):
+    """
+    Groupes de quasi-doublons.
+
+    Returns
+    -------
+    list[int] : pour chaque texte, l'indice de son document canonique (lui-même s'il est unique)
+    """
+    n = len(textes)
+    if n < 2:
+        return list(range(n))
+    signatures = signatures_minhash(textes)
+    parents = list(range(n))
+    for i, j in paires_candidates(signatures):
+        if np.mean(signatures[i] == signatures[j]) >= seuil:
+            ri, rj = _racine(parents, i), _racine(parents, j)
+            if ri != rj:
+                parents[rj] = ri
+
+    groupes = defaultdict(list)
+    for i in range(n):
+        groupes[_racine(parents, i)].append(i)
+    canonique = list(range(n))
+    for membres in groupes.values():
+        elu = max(membres, key=lambda i: (len(textes[i]), -i))
+        for i in membres:
+            canonique[i] = elu
+    return canonique
+
+
+def rapport_doublons(canonique, noms=None):
+    """Bilan du dédoublonnage : taille avant / après, groupes, plus gros groupes."""
+    n = len(canonique)
+    groupes = defaultdict(list)
+    for i, c in enumerate(canonique):
+        groupes[c].append(i)
+    multiples = sorted((m for m in groupes.values() if len(m) > 1), key=len, reverse=True)
+    nom = (lambda i: noms[i]) if noms else (lambda i: i)
+    return {
+        "n_documents": n,
+        "n_canoniques": len(groupes),
+        "n_doublons": n - len(groupes),
+        "n_groupes": len(multiples),
+        "reduction_pct": round(100.0 * (n - len(groupes)) / n, 1) if n else 0.0,
+        "seuil_jaccard": SEUIL_DOUBLON,
+        "plus_grands_groupes": [[nom(i) for i in m] for m in multiples[:10]],
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from pathlib import Path
+    from extraction_cv import extraire_texte_pdf
+
+    dossier = Path(sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tous_les_CVs"))
+    chemins = sorted(dossier.glob("*.pdf"))
+    textes = [extraire_texte_pdf(str(c)) for c in chemins]
+    t0 = time.perf_counter()
+    canonique = grouper_doublons(textes)
+    duree = time.perf_counter() - t0
+    rapport = rapport_doublons(canonique, [c.name for c in chemins])
+    print(f"{rapport['n_documents']} CVs -> {rapport['n_canoniques']} canoniques "
+          f"(-{rapport['reduction_pct']} %, {rapport['n_groupes']} groupes) en {duree:.1f}s")
+    for groupe in rapport["plus_grands_groupes"]:
+        print("  ", ", ".join(groupe))
@@ -0,0 +1,112 @@
+# echeance.py
+
+import os
+import time
+import threading
+
+
+"""
+ÉCHÉANCES de requête : budget de temps + annulation, propagés à travers les phases.
+Objectif : qu'une étape lente (RAG, Mistral) ne bloque plus la page. Chaque requête
+reçoit une Echeance ; les étapes obligatoires s'arrêtent (DelaiDepasse) quand elle
+est dépassée, les étapes optionnelles (RAG, évaluation, alternatives) sont sautées
+ou servies par un repli local et notées dans `degradations` pour l'affichage.
+
+L'annulation (client déconnecté, travail spéculatif abandonné) est coopérative :
+les phases appellent verifier_echeance() entre leurs étapes coûteuses et les appels
+Mistral en streaming s'arrêtent au morceau suivant.
+"""
+
+
+DELAI_PHASE_1 = float(os.environ.get("ARIA_DELAI_PHASE_1", "60"))     # secondes
+DELAI_PHASE_2 = float(os.environ.get("ARIA_DELAI_PHASE_2", "60"))
+DELAI_API = float(os.environ.get("ARIA_DELAI_API", "60"))
+# Temps minimal restant pour tenter une étape optionnelle
+BUDGET_RAG = float(os.environ.get("ARIA_BUDGET_RAG", "8"))
+BUDGET_EVALUATION = float(os.environ.get("ARIA_BUDGET_EVALUATION", "15"))
+
+
+class TravailAnnule(Exception):
+    """Travail abandonné en cours de route (client déconnecté, autre branche choisie)."""
+
+
+class DelaiDepasse(Exception):
+    """Le budget de temps de la requête est épuisé."""
+
+
+class Echeance:
+    """
+    Budget de temps d'une requête (None = illimité) et jeton d'annulation.
+    Partagée entre threads : les phases et leurs appels parallèles consultent la même.
+    Porte aussi la classe de priorité et la session de la requête pour l'ordonnanceur
+    des appels Mistral (voir ordonnanceur_llm.py).
+    """
+
+    def __init__(self, secondes=None, priorite="analyse", session=None):
+        self.limite = None if secondes is None else time.monotonic() + secondes
+        self.priorite = priorite
+        self.session = session
+        self._annulee = threading.Event()
+        self._appelant = None       # requête qui a repris ce travail (voir rattacher)
+        self.degradations = []      # [{"etape", "raison"}] : étapes sautées ou servies en repli
+
+    def annuler(self):
+        self._annulee.set()
+
+    @property
+    def annulee(self):
+        return self._annulee.is_set() or (self._appelant is not None and self._appelant.annulee)
+
+    def rattacher(self, appelant):
+        """
+        Travail de fond (spéculatif) repris par une requête : il prend sa priorité, sa
+        session et son délai, s'arrête si elle est annulée, et ses dégradations lui remontent.
+        """
+        self.priorite = appelant.priorite
+        self.session = appelant.session
+        self.limite = appelant.limite
+        self._appelant = appelant
+        appelant.degradations.extend(self.degradations)
+        self.degradations = appelant.degradations
+
+    @property
+    def expiree(self):
+        return self.limite is not None and time.monotonic() >= self.limite
+
+    def restant(self):
+        """Secondes restantes (None = pas de limite)."""
+        return None if self.limite is None else max(0.0, self.limite - time.monotonic())
+
+    def delai(self, plafond=None):
+        """Timeout à passer à un appel bloquant : le restant, borné par `plafond`."""
+        restant = self.restant()
+        if restant is None:
+            return plafond
+        return restant if plafond is None else min(restant, plafond)
+
+    def permet(self, secondes):
+        """Reste-t-il au moins `secondes` pour une étape optionnelle ?"""
+        restant = self.restant()
+        return not self.annulee and (restant is None or restant >= secondes)
+
+    def verifier(self):
+        if self.annulee:
+            raise TravailAnnule("travail annulé")
+        if self.expiree:
+            raise DelaiDepasse("délai de la requête dépassé")
+
+    def degrader(self, etape, raison):
+        self.degradations.append({"etape": etape, "raison": raison})
+        print(f"[ECHEANCE] {etape} dégradé : {raison}")
+
+
+def verifier_echeance(echeance):
+    """Point d'arrêt coopératif (sans effet si la phase tourne sans échéance)."""
+    if echeance is not None:
+        echeance.verifier()
+
+
+def verifier_annulation(echeance):
+    """Annulation seulement : une étape qui a un repli continue après le délai."""
+    if echeance is not None and echeance.annulee:
+        raise TravailAnnule("travail annulé")
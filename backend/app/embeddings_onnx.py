@@ -0,0 +1,288 @@
+# embeddings_onnx.py
+
+import os
+import json
+import time
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+except ImportError:  # backend optionnel, SentenceTransformer (PyTorch) reste le fallback
+    ort = None
+
+
+"""
+BACKEND D'EMBEDDINGS CPU : all-MiniLM-L6-v2 exporté en ONNX et quantifié int8.
+Objectif : sans GPU, sbert.encode (PyTorch CPU) est le premier coût local du RAG,
+du score ATS et de la construction de l'index. ONNX Runtime (graphe fusionné,
+poids int8 dynamiques, threads réglés) produit les mêmes embeddings plus vite.
+
+- Export (une fois, hors ligne) : python embeddings_onnx.py exporter
+  -> modele.onnx (fp32), modele_int8.onnx, tokenizer.json, validation.json
+- Validation : cosinus PyTorch / ONNX sur un échantillon du corpus ; le modèle
+  n'est utilisé que si le minimum dépasse ARIA_ONNX_COSINUS_MIN (sinon repli PyTorch)
+- Benchmark : python embeddings_onnx.py bench (latence d'un texte, docs/s par lot,
+  PyTorch vs ONNX fp32 vs int8, balayage du nombre de threads)
+
+Sélection : ARIA_EMBEDDINGS_BACKEND = torch (défaut) | auto (ONNX int8 s'il est exporté et validé) | onnx
+ONNX reste opt-in tant que exporter / valider / bench n'ont pas été passés sur la machine cible
+(cosinus et docs/s relevés dans validation.json et la sortie du bench). Un index construit avec un
+backend doit être interrogé avec le même : meta.json le note, charger_index le vérifie.
+Même pipeline que SentenceTransformer : tokenisation tronquée à 256, moyenne des
+états cachés pondérée par le masque, normalisation L2.
+"""
+
+
+NOM_MODELE = "all-MiniLM-L6-v2"
+BACKEND = os.environ.get("ARIA_EMBEDDINGS_BACKEND", "torch")      # torch | auto | onnx
+DOSSIER_ONNX = os.environ.get("ARIA_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "modeles_onnx"))
+FICHIER_ONNX = os.environ.get("ARIA_ONNX_FICHIER", "modele_int8.onnx")
+THREADS = int(os.environ.get("ARIA_ONNX_THREADS", "0"))           # 0 = selon le process (voir threads_onnx)
+WORKERS_WEB = int(os.environ.get("WEB_CONCURRENCY", "0"))         # workers web de la machine (0 = inconnu)
+# Process dédié à l'encodage (serveur de modèles, construction de l'index, bench) : positionné
+# par leurs points d'entrée. Sinon les modèles sont chargés dans un worker web.
+PROCESS_DEDIE = False
+COSINUS_MIN = float(os.environ.get("ARIA_ONNX_COSINUS_MIN", "0.99"))
+LONGUEUR_MAX = 256              # max_seq_length de all-MiniLM-L6-v2
+DIMENSION = 384
+TAILLE_LOT = 32
+
+
+def _coeurs():
+    try:
+        return len(os.sched_getaffinity(0))     # respecte les limites CPU du conteneur
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_onnx():
+    """
+    Threads intra-op d'une session ONNX : tous les cœurs dans un process dédié ; dans un worker
+    web, sa part des cœurs (1 si le nombre de workers est inconnu), N workers à N threads
+    chacun se disputant sinon les mêmes cœurs.
+    """
+    if THREADS:
+        return THREADS
+    if PROCESS_DEDIE:
+        return _coeurs()
+    return max(1, _coeurs() // WORKERS_WEB) if WORKERS_WEB else 1
+
+
+# ======================
+# Encodeur ONNX
+# ======================
+class EncodeurONNX:
+    """Remplaçant de SentenceTransformer.encode pour l'inférence CPU (thread-safe)."""
+
+    def __init__(self, dossier=DOSSIER_ONNX, fichier=FICHIER_ONNX, threads=None):
+        if ort is None:
+            raise Exception("onnxruntime / tokenizers non installés.")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads or threads_onnx()
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(dossier, fichier), options,
+                                            providers=["CPUExecutionProvider"])
+        self.entrees = {e.name for e in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(dossier, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=LONGUEUR_MAX)
+        self.tokenizer.no_padding()
+        self.nom = f"onnx:{fichier}"
+        self.threads = options.intra_op_num_threads
+
+    def _lot(self, encodages):
+        longueur = max(len(e.ids) for e in encodages)
+        ids = np.zeros((len(encodages), longueur), dtype=np.int64)
+        masque = np.zeros_like(ids)
+        for i, e in enumerate(encodages):
+            ids[i, :len(e.ids)] = e.ids
+            masque[i, :len(e.ids)] = 1
+        entrees = {"input_ids": ids, "attention_mask": masque}
+        if "token_type_ids" in self.entrees:
+            entrees["token_type_ids"] = np.zeros_like(ids)
+        etats = self.session.run(None, entrees)[0]
+        poids = masque[:, :, None].astype(np.float32)
+        moyenne = (etats * poids).sum(axis=1) / np.clip(poids.sum(axis=1), 1e-9, None)
+        return moyenne / np.clip(np.linalg.norm(moyenne, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, textes, batch_size=TAILLE_LOT, **_):
+        """Embeddings normalisés (N, 384) float32. Lots triés par longueur (moins de padding)."""
+        if isinstance(textes, str):
+            return self.encode([textes], batch_size)[0]
+        textes = list(textes)
+        if not textes:
+            return np.zeros((0, DIMENSION), dtype=np.float32)
+        encodages = self.tokenizer.encode_batch(textes)
+        ordre = np.argsort([len(e.ids) for e in encodages])
+        sortie = np.empty((len(textes), DIMENSION), dtype=np.float32)
+        for debut in range(0, len(textes), batch_size):
+            indices = ordre[debut:debut + batch_size]
+            sortie[indices] = self._lot([encodages[i] for i in indices])
+        return sortie
+
+
+# ======================
+# Sélection du backend
+# ======================
+def _validation(dossier=DOSSIER_ONNX):
+    try:
+        with open(os.path.join(dossier, "validation.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def backend_embeddings(nom=None):
+    """Nom du backend effectif ('auto' = ONNX s'il est installé, exporté et validé)."""
+    nom = (nom or BACKEND).lower()
+    if nom == "torch":
+        return "torch"
+    validation = _validation()
+    disponible = ort is not None and os.path.exists(os.path.join(DOSSIER_ONNX, FICHIER_ONNX))
+    valide = bool(validation) and validation.get(FICHIER_ONNX, {}).get("cosinus_min", 0) >= COSINUS_MIN
+    if disponible and valide:
+        return "onnx"
+    if nom == "onnx":
+        raison = "non installé ou non exporté" if not disponible else "validation absente ou insuffisante"
+        print(f"[EMBEDDINGS] Backend ONNX indisponible ({raison}), repli sur PyTorch.")
+    return "torch"
+
+
+def charger_modeles(backend=None):
+    """{"sbert": encodeur (méthode encode), "keybert": KeyBERT sur le même encodeur, "backend": "onnx" | "torch"}."""
+    from keybert import KeyBERT
+    if backend_embeddings(backend) == "onnx":
+        from keybert.backend import BaseEmbedder
+        sbert = EncodeurONNX()
+
+        class _EmbedderONNX(BaseEmbedder):
+            def embed(self, documents, verbose=False):
+                return sbert.encode(documents)
+
+        print(f"[EMBEDDINGS] {NOM_MODELE} via {sbert.nom} ({sbert.threads} threads)")
+        return {"sbert": sbert, "keybert": KeyBERT(model=_EmbedderONNX()), "backend": "onnx"}
+
+    from sentence_transformers import SentenceTransformer
+    sbert = SentenceTransformer(NOM_MODELE)
+    return {"sbert": sbert, "keybert": KeyBERT(model=sbert), "backend": "torch"}
+
+
+# ======================
+# Export, validation, benchmark (hors ligne)
+# ======================
+def exporter(dossier=DOSSIER_ONNX):
+    """Exporte le modèle PyTorch en ONNX (graphe BERT fusionné) puis le quantifie en int8 dynamique."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(dossier, exist_ok=True)
+    sbert = SentenceTransformer(NOM_MODELE, device="cpu")
+    transformer = sbert[0].auto_model.eval()
+    sbert.tokenizer.save_pretrained(dossier)        # tokenizer.json (tokenizer rapide)
+
+    exemple = sbert.tokenizer(["Exemple de CV"], return_tensors="pt")
+    noms = ["input_ids", "attention_mask", "token_type_ids"]
+    axes = {n: {0: "lot", 1: "sequence"} for n in noms}
+    axes["last_hidden_state"] = {0: "lot", 1: "sequence"}
+    fp32 = os.path.join(dossier, "modele.onnx")
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(exemple[n] for n in noms), fp32, input_names=noms,
+                          output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14)
+
+    try:
+        from onnxruntime.transformers import optimizer
+        config = transformer.config
+        optimise = optimizer.optimize_model(fp32, model_type="bert", num_heads=config.num_attention_heads,
+                                            hidden_size=config.hidden_size)
+        optimise.save_model_to_file(fp32)
+    except Exception as e:
+        print(f"[EMBEDDINGS] Fusion du graphe ignorée : {e}")
+
+    quantize_dynamic(fp32, os.path.join(dossier, "modele_int8.onnx"), weight_type=QuantType.QInt8)
+    print(f"[EMBEDDINGS] Export ONNX -> {dossier}")
+
+
+def echantillon_corpus(n=200):
+    """Textes de validation / benchmark : CVs du corpus (texte complet et premières lignes)."""
+    from index_corpus import charger_index, CORPUS_DIR, lister_documents, _lire_document
+    index = charger_index()
+    if index is not None and index.documents:
+        textes = [index.texte(i) for i in range(min(n // 2, len(index)))]
+        textes += [" ".join(d["mots_cles"]) for d in index.documents[:n // 2]]
+    else:
+        textes = [_lire_document(c) for c in list(lister_documents(CORPUS_DIR))[:n // 2]]
+        textes += [t.split("\n", 1)[0] for t in textes]
+    return [t for t in textes if t.strip()]
+
+
+def cosinus_lignes(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def valider(textes=None, dossier=DOSSIER_ONNX):
+    """Cosinus entre embeddings PyTorch et ONNX (fp32 et int8) ; écrit validation.json."""
+    from sentence_transformers import SentenceTransformer
+    textes = textes or echantillon_corpus()
+    reference = np.asarray(SentenceTransformer(NOM_MODELE, device="cpu").encode(textes), dtype=np.float32)
+    resultats = {}
+    for fichier in ("modele.onnx", "modele_int8.onnx"):
+        cos = cosinus_lignes(reference, EncodeurONNX(dossier, fichier, threads=_coeurs()).encode(textes))
+        resultats[fichier] = {"cosinus_min": round(float(cos.min()), 5), "cosinus_moyen": round(float(cos.mean()), 5),
+                              "n_textes": len(textes), "valide": bool(cos.min() >= COSINUS_MIN)}
+        print(f"[EMBEDDINGS] {fichier} : cosinus min {cos.min():.4f}, moyen {cos.mean():.4f} "
+              f"({'OK' if cos.min() >= COSINUS_MIN else 'REFUSÉ'}, seuil {COSINUS_MIN})")
+    with open(os.path.join(dossier, "validation.json"), "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2)
+    return resultats
+
+
+def _mesurer(encodeur, textes, repetitions=30):
+    encodeur.encode(textes[:8])                     # préchauffage
+    latences = []
+    for t in textes[:repetitions]:
+        debut = time.perf_counter()
+        encodeur.encode([t])
+        latences.append(time.perf_counter() - debut)
+    debut = time.perf_counter()
+    encodeur.encode(textes)
+    duree = time.perf_counter() - debut
+    return {"latence_p50_ms": round(1000 * float(np.median(latences)), 1),
+            "docs_par_s": round(len(textes) / duree, 1)}
+
+
+def benchmark(textes=None, dossier=DOSSIER_ONNX):
+    """Latence d'un texte et débit par lot : PyTorch, ONNX fp32, ONNX int8 (1..N threads)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    textes = textes or echantillon_corpus()
+    resultats = {}
+    torch.set_num_threads(_coeurs())
+    resultats["torch"] = _mesurer(SentenceTransformer(NOM_MODELE, device="cpu"), textes)
+    resultats["onnx_fp32"] = _mesurer(EncodeurONNX(dossier, "modele.onnx", threads=_coeurs()), textes)
+    threads = sorted({1, 2, 4, _coeurs()} & set(range(1, _coeurs() + 1)))
+    for n in threads:
+        resultats[f"onnx_int8_{n}t"] = _mesurer(EncodeurONNX(dossier, "modele_int8.onnx", threads=n), textes)
+    print(f"{len(textes)} textes, {_coeurs()} cœurs")
+    for nom, r in resultats.items():
+        print(f"  {nom:16s} {r['latence_p50_ms']:8.1f} ms/texte  {r['docs_par_s']:8.1f} docs/s")
+    return resultats
+
+
+if __name__ == "__main__":
+    import sys
+    commande = sys.argv[1] if len(sys.argv) > 1 else "bench"
+    if commande == "exporter":
+        exporter()
+        valider()
+    elif commande == "valider":
+        valider()
+    elif commande == "bench":
+        benchmark()
+    else:
+        print("Usage : python embeddings_onnx.py [exporter | valider | bench]")
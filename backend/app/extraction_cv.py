@@ -0,0 +1,200 @@
+# extraction_cv.py
+
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+import docx2txt
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # backend optionnel, PyPDF2 reste le fallback
+    pdfium = None
+
+
+"""
+MODULE D'EXTRACTION TEXTE des CVs (PDF / DOCX).
+Objectif : extraire le texte page par page, en parallèle pour les gros PDF,
+sans jamais charger plus de pages que nécessaire.
+"""
+
+
+# ======================
+# Configuration
+# ======================
+PDF_MAX_PAGES = int(os.environ.get("ARIA_PDF_MAX_PAGES", "15"))          # au-delà, ce n'est plus un CV
+PDF_SEUIL_PARALLELE = int(os.environ.get("ARIA_PDF_SEUIL_PARALLELE", "6"))  # nb de pages avant de paralléliser
+PDF_WORKERS = int(os.environ.get("ARIA_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_BACKEND = os.environ.get("ARIA_PDF_BACKEND", "auto")                  # auto | pypdfium2 | pypdf2
+
+SEPARATEUR_PAGES = "\n"
+
+_pool = None
+# PDFium n'est pas thread-safe : un seul appel à la fois par process (threads de requêtes,
+# préflight). Les workers du pool d'extraction parallèle sont des process distincts.
+_verrou_pdfium = threading.Lock()
+
+
+# ======================
+# Backends PDF
+# ======================
+def _ouvrir_source(source):
+    """Normalise la source (bytes, chemin ou fichier binaire) pour les lecteurs PDF."""
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _pypdf2_nb_pages(source):
+    return len(PyPDF2.PdfReader(_ouvrir_source(source)).pages)
+
+
+def _pypdf2_extraire(source, debut, fin):
+    reader = PyPDF2.PdfReader(_ouvrir_source(source))
+    return [reader.pages[i].extract_text() or "" for i in range(debut, fin)]
+
+
+def _pdfium_nb_pages(source):
+    with _verrou_pdfium:
+        pdf = pdfium.PdfDocument(_ouvrir_source(source))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _pdfium_extraire(source, debut, fin):
+    pages = []
+    with _verrou_pdfium:
+        pdf = pdfium.PdfDocument(_ouvrir_source(source))
+        try:
+            for i in range(debut, fin):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    return pages
+
+
+# Registre des backends : nom -> (compter les pages, extraire une plage de pages)
+BACKENDS_PDF = {
+    "pypdf2": (_pypdf2_nb_pages, _pypdf2_extraire),
+}
+if pdfium is not None:
+    BACKENDS_PDF["pypdfium2"] = (_pdfium_nb_pages, _pdfium_extraire)
+
+
+def backend_pdf(nom=None):
+    """Retourne le nom du backend effectif ('auto' = pypdfium2 si installé, sinon PyPDF2)."""
+    nom = (nom or PDF_BACKEND).lower()
+    if nom == "auto":
+        return "pypdfium2" if "pypdfium2" in BACKENDS_PDF else "pypdf2"
+    if nom not in BACKENDS_PDF:
+        print(f"[EXTRACTION] Backend '{nom}' indisponible, repli sur PyPDF2.")
+        return "pypdf2"
+    return nom
+
+
+# ======================
+# Extraction parallèle
+# ======================
+def _get_pool():
+    """Pool de processus partagé (spawn : on ne fork pas un process qui a chargé SBERT)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _extraire_plage(nom_backend, chemin, debut, fin):
+    """Exécuté dans un worker : rouvre le PDF depuis le disque et extrait [debut, fin)."""
+    return BACKENDS_PDF[nom_backend][1](chemin, debut, fin)
+
+
+def _extraire_en_parallele(nom_backend, source, nb_pages):
+    # Les workers lisent le fichier depuis le disque plutôt que de recevoir une copie des octets
+    chemin_tmp = None
+    if isinstance(source, str):
+        chemin = source
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            if isinstance(source, (bytes, bytearray)):
+                tmp.write(source)
+            else:
+                source.seek(0)
+                shutil.copyfileobj(source, tmp)
+            chemin = chemin_tmp = tmp.name
+
+    try:
+        taille_bloc = max(1, -(-nb_pages // PDF_WORKERS))
+        plages = [(d, min(d + taille_bloc, nb_pages)) for d in range(0, nb_pages, taille_bloc)]
+        pool = _get_pool()
+        futures = [pool.submit(_extraire_plage, nom_backend, chemin, d, f) for d, f in plages]
+        pages = []
+        for fut in futures:  # l'ordre des futures conserve l'ordre des pages
+            pages.extend(fut.result())
+        return pages
+    finally:
+        if chemin_tmp:
+            os.remove(chemin_tmp)
+
+
+# ======================
+# API publique
+# ======================
+def compter_pages_pdf(source, backend=None):
+    """Nombre de pages du PDF (même backend, et donc même sérialisation PDFium, que l'extraction)."""
+    return BACKENDS_PDF[backend_pdf(backend)][0](source)
+
+
+def extraire_texte_pdf(source, max_pages=None, backend=None):
+    """
+    Extrait le texte d'un PDF page par page.
+
+    Parameters
+    ----------
+    source : bytes | str | fichier binaire
+        Contenu du PDF, chemin sur disque ou fichier (ex: SpooledTemporaryFile de l'upload)
+    max_pages : int
+        Nombre maximum de pages lues (défaut : ARIA_PDF_MAX_PAGES)
+    backend : str
+        'pypdf2', 'pypdfium2' ou 'auto'
+
+    Returns
+    -------
+    str : texte des pages, séparées par un saut de ligne
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    nom_backend = backend_pdf(backend)
+    compter, extraire = BACKENDS_PDF[nom_backend]
+    try:
+        nb_pages = min(compter(source), max_pages)
+        if nb_pages > PDF_SEUIL_PARALLELE and PDF_WORKERS > 1:
+            pages = _extraire_en_parallele(nom_backend, source, nb_pages)
+        else:
+            pages = extraire(source, 0, nb_pages)
+        return SEPARATEUR_PAGES.join(pages)
+    except Exception as e:
+        raise Exception(f"Erreur PDF : {e}")
+
+
+def extraire_texte_docx(source):
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            source = BytesIO(source)
+        elif hasattr(source, "seek"):
+            source.seek(0)
+        return docx2txt.process(source)
+    except Exception as e:
+        raise Exception(f"Erreur DOCX : {e}")
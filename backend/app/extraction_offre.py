@@ -0,0 +1,273 @@
+# extraction_offre.py
+
+import os
+import re
+import json
+import codecs
+from contextlib import contextmanager
+from html import unescape
+from html.parser import HTMLParser
+
+import requests
+
+from cassettes import cassette
+
+
+"""
+EXTRACTION DU TEXTE D'UNE OFFRE depuis son URL, sans arbre DOM.
+Objectif : les pages des job boards pèsent souvent plusieurs Mo (scripts, menus,
+JSON embarqué). La page est lue en streaming et coupée à ARIA_OFFRE_MAX_OCTETS ;
+chaque bloc est passé à un HTMLParser qui saute les sous-arbres script / style /
+nav / footer et l'en-tête du site (<header> hors <main> / <article>) au lieu de
+construire puis nettoyer un arbre complet. Le <title> sert d'intitulé si la page
+n'a pas de <h1>.
+
+Si la page publie une offre schema.org JobPosting en JSON-LD (cas de la plupart
+des job boards, pour Google for Jobs), ce texte structuré est utilisé directement
+et la lecture s'arrête dès qu'il est complet.
+"""
+
+
+MAX_OCTETS = int(os.environ.get("ARIA_OFFRE_MAX_OCTETS", str(2 * 1024 * 1024)))
+MAX_CARACTERES = 25000
+TIMEOUT = 15
+TAILLE_BLOC = 64 * 1024
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+
+# Sous-arbres ignorés (contenu non affiché ou navigation du site)
+BALISES_IGNOREES = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "footer"}
+# Contenu principal : un <header> à l'intérieur est l'en-tête de l'offre (intitulé, lieu), pas celui du site
+BALISES_CONTENU = {"main", "article"}
+# Balises qui séparent des blocs de texte
+BALISES_BLOC = {"p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6",
+                "section", "article", "main", "dd", "dt", "table"}
+
+CHARSET_META = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+
+# ======================
+# Extraction HTML
+# ======================
+class ExtracteurOffre(HTMLParser):
+    """
+    Texte visible de la page (au plus MAX_CARACTERES) et offre JSON-LD, alimenté par morceaux.
+    """
+
+    def __init__(self, max_caracteres=MAX_CARACTERES):
+        super().__init__(convert_charrefs=True)
+        self.max_caracteres = max_caracteres
+        self.morceaux = []
+        self.n_caracteres = 0
+        self.offre = None           # JobPosting JSON-LD (le premier avec description, sinon le premier)
+        self._ignore = 0            # profondeur dans un sous-arbre ignoré
+        self._entete_site = 0       # profondeur dans un <header> hors contenu principal (ignoré)
+        self._contenu = 0           # profondeur dans <main> / <article>
+        self._titre = None          # tampon du <title> en cours
+        self.titre = ""             # <title> de la page (intitulé de repli)
+        self.h1 = False             # la page a-t-elle un <h1> visible ?
+        self._jsonld = None         # tampon du <script type="application/ld+json"> en cours
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script" and (dict(attrs).get("type") or "").lower() == "application/ld+json":
+            self._jsonld = []
+        if tag in BALISES_IGNOREES:
+            self._ignore += 1
+        elif tag == "header" and (self._entete_site or not self._contenu):
+            self._entete_site += 1
+        elif tag == "title" and not self._ignore and not self.titre:
+            self._titre = []
+        elif tag in BALISES_BLOC:
+            self._contenu += tag in BALISES_CONTENU
+            self.h1 = self.h1 or (tag == "h1" and not self._masque)
+            self.morceaux.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BALISES_BLOC:
+            self.morceaux.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in BALISES_IGNOREES and self._ignore:
+            self._ignore -= 1
+            if tag == "script" and self._jsonld is not None:
+                if not self.offre_complete:
+                    self.offre = trouver_job_posting("".join(self._jsonld)) or self.offre
+                self._jsonld = None
+        elif tag == "header" and self._entete_site:
+            self._entete_site -= 1
+        elif tag == "title" and self._titre is not None:
+            self.titre = nettoyer_texte(" ".join(self._titre))
+            self._titre = None
+        elif tag in BALISES_BLOC:
+            if tag in BALISES_CONTENU and self._contenu:
+                self._contenu -= 1
+            self.morceaux.append("\n")
+
+    @property
+    def _masque(self):
+        return bool(self._ignore or self._entete_site)
+
+    def handle_data(self, data):
+        if self._jsonld is not None:
+            self._jsonld.append(data)
+        elif self._titre is not None:
+            self._titre.append(data)
+        elif not self._masque and self.n_caracteres < self.max_caracteres and data.strip():
+            self.morceaux.append(data)
+            self.n_caracteres += len(data)
+
+    @property
+    def offre_complete(self):
+        """JobPosting avec description : suffit à lui seul, la page n'apporterait rien."""
+        return self.offre is not None and bool(self.offre.get("description"))
+
+    @property
+    def complet(self):
+        """Assez de texte lu : la suite de la page n'apporterait rien."""
+        return self.n_caracteres >= self.max_caracteres
+
+    def texte(self):
+        texte = "".join(self.morceaux)
+        if self.titre and not self.h1:
+            texte = self.titre + "\n" + texte
+        return nettoyer_texte(texte)[:self.max_caracteres]
+
+
+def nettoyer_texte(texte):
+    """Espaces compactés, lignes vides supprimées."""
+    lignes = (re.sub(r"[ \t\r\f\v\xa0]+", " ", l).strip() for l in texte.split("\n"))
+    return "\n".join(l for l in lignes if l)
+
+
+def html_vers_texte(html, max_caracteres=MAX_CARACTERES):
+    extracteur = ExtracteurOffre(max_caracteres)
+    extracteur.feed(html)
+    extracteur.close()
+    return extracteur.texte()
+
+
+# ======================
+# JSON-LD schema.org
+# ======================
+def _est_job_posting(obj):
+    types = obj.get("@type")
+    return "JobPosting" in (types if isinstance(types, list) else [types])
+
+
+def trouver_job_posting(bloc):
+    """Objet JobPosting d'un bloc JSON-LD (objet, liste ou @graph), ou None."""
+    try:
+        donnees = json.loads(bloc.strip().rstrip(";"))
+    except ValueError:
+        return None
+    pile = [donnees]
+    while pile:
+        obj = pile.pop()
+        if isinstance(obj, list):
+            pile.extend(reversed(obj))
+        elif isinstance(obj, dict):
+            if _est_job_posting(obj):
+                return obj
+            if "@graph" in obj:
+                pile.append(obj["@graph"])
+    return None
+
+
+def _valeur(v):
+    """Texte d'une propriété schema.org (texte, objet nommé, liste, HTML échappé)."""
+    if isinstance(v, list):
+        return ", ".join(filter(None, (_valeur(x) for x in v)))
+    if isinstance(v, dict):
+        if "address" in v:
+            return _valeur(v["address"])
+        if "addressLocality" in v or "addressCountry" in v:
+            return ", ".join(filter(None, (_valeur(v.get(k)) for k in ("addressLocality", "addressRegion", "addressCountry"))))
+        return _valeur(v.get("name") or v.get("value") or "")
+    if v is None:
+        return ""
+    texte = unescape(str(v))
+    return html_vers_texte(texte) if "<" in texte else texte.strip()
+
+
+def texte_job_posting(offre):
+    """Texte de l'offre à partir des champs JobPosting (même rôle que le texte de la page)."""
+    champs = [
+        ("Poste", "title"),
+        ("Entreprise", "hiringOrganization"),
+        ("Lieu", "jobLocation"),
+        ("Contrat", "employmentType"),
+        ("Description", "description"),
+        ("Missions", "responsibilities"),
+        ("Compétences", "skills"),
+        ("Qualifications", "qualifications"),
+        ("Expérience", "experienceRequirements"),
+        ("Formation", "educationRequirements"),
+    ]
+    lignes = []
+    for libelle, cle in champs:
+        valeur = _valeur(offre.get(cle))
+        if valeur:
+            lignes.append(f"{libelle} : {valeur}")
+    return "\n".join(lignes)[:MAX_CARACTERES]
+
+
+# ======================
+# Téléchargement borné
+# ======================
+def _encodage(charset_http, debut):
+    if charset_http:
+        return charset_http
+    m = CHARSET_META.search(debut)
+    return m.group(1).decode("ascii") if m else "utf-8"
+
+
+def _ouvrir_page(timeout):
+    """Ouverture HTTP en streaming : (type de contenu, charset de l'en-tête ou None, blocs)."""
+    @contextmanager
+    def ouvrir(url):
+        with requests.get(url, timeout=timeout, headers={"User-Agent": USER_AGENT}, stream=True) as r:
+            r.raise_for_status()
+            type_contenu = r.headers.get("content-type", "").lower()
+            yield type_contenu, r.encoding if "charset" in type_contenu else None, r.iter_content(TAILLE_BLOC)
+    return ouvrir
+
+
+def extraire_offre(url, max_octets=MAX_OCTETS, timeout=TIMEOUT):
+    """
+    Texte de l'offre publiée à `url` : JobPosting JSON-LD s'il existe, sinon texte
+    visible de la page. Lit au plus `max_octets` et s'arrête dès qu'un JobPosting avec
+    description a été lu ou que MAX_CARACTERES de texte visible ont été lus (un JSON-LD placé
+    après ne serait pas vu ; il est presque toujours dans <head> ou en tête de <body>).
+    """
+    # Page servie par la cassette en mode enregistrer / rejouer (voir cassettes.py)
+    with cassette.page(url, _ouvrir_page(timeout)) as (type_contenu, charset_http, blocs):
+        html = not type_contenu or "html" in type_contenu or "xml" in type_contenu
+        extracteur, brut = ExtracteurOffre(), []
+        decodeur, lus = None, 0
+        for bloc in blocs:
+            if decodeur is None:
+                try:
+                    decodeur = codecs.getincrementaldecoder(_encodage(charset_http, bloc[:4096]))(errors="replace")
+                except LookupError:
+                    decodeur = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            lus += len(bloc)
+            fin = lus >= max_octets
+            if fin:
+                bloc = bloc[:len(bloc) - (lus - max_octets)]
+            texte = decodeur.decode(bloc, final=fin)
+            if html:
+                extracteur.feed(texte)
+            else:
+                brut.append(texte)      # text/plain... : pas de balises
+            if fin or extracteur.offre_complete or extracteur.complet:
+                break
+
+    if not html:
+        return nettoyer_texte("".join(brut))[:MAX_CARACTERES]
+    extracteur.close()
+    if extracteur.offre_complete:
+        return texte_job_posting(extracteur.offre)
+    if extracteur.offre is not None:
+        # JobPosting sans description (titre, entreprise...) : complété par le texte visible
+        return (texte_job_posting(extracteur.offre) + "\n" + extracteur.texte()).strip()[:MAX_CARACTERES]
+    return extracteur.texte()
@@ -0,0 +1,385 @@
+# index_corpus.py
+
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from bm25 import construire_bm25, bm25_disponible, IndexBM25
+from doublons_corpus import grouper_doublons, rapport_doublons
+
+
+"""
+INDEX DU CORPUS de CVs (Tous_les_CVs), construit hors ligne.
+Objectif : ne plus relire / ré-encoder la base à chaque requête. Pour chaque CV,
+l'index stocke son titre de poste, ses mots-clés KeyBERT et l'embedding SBERT de
+ces mots-clés (même représentation que le RAG), ainsi qu'un index inversé BM25
+du texte complet (voir bm25.py).
+
+Les embeddings sont stockés normalisés en float32 ET quantifiés (int8 + une échelle
+par vecteur, ou float16). Les workers ouvrent ces fichiers en mmap lecture seule :
+les pages sont partagées par l'OS entre processus au lieu d'une copie par worker.
+Le scoring se fait directement sur les vecteurs quantifiés, avec re-scoring float32
+optionnel des meilleurs candidats.
+
+À l'ingestion, les quasi-doublons (MinHash/LSH, voir doublons_corpus.py) sont
+regroupés et seul le document canonique de chaque groupe est indexé ; le bilan
+est écrit dans doublons.json.
+
+Les textes complets (pour le contexte du RAG) sont dans un fichier à part, lu par
+décalage (textes.jsonl + textes_offsets.npy) : un worker ne garde en mémoire que les
+métadonnées des documents et ne lit que les quelques textes retenus par requête.
+
+Le corpus est aussi regroupé hors ligne (KMeans sur les embeddings) : l'identifiant
+de cluster de chaque CV sert à diversifier les résultats du RAG sans clustering à
+chaque requête.
+
+Construction :  python index_corpus.py [dossier_cvs] [dossier_index]
+Tous les fichiers sont écrits par la construction ; le chargement (workers web) ne
+fait que lire et échoue clairement si l'un d'eux manque.
+"""
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, "Tous_les_CVs")
+INDEX_DIR = os.environ.get("ARIA_INDEX_DIR", os.path.join(BASE_DIR, "index_corpus"))
+
+FICHIER_DOCUMENTS = "documents.jsonl"
+FICHIER_TEXTES = "textes.jsonl"
+FICHIER_OFFSETS_TEXTES = "textes_offsets.npy"
+FICHIER_EMBEDDINGS = "embeddings.npy"
+FICHIER_EMBEDDINGS_Q = "embeddings_{format}.npy"
+FICHIER_ECHELLES = "embeddings_int8_scales.npy"
+FICHIER_CLUSTERS = "clusters.npy"
+FICHIER_META = "meta.json"
+FICHIER_DOUBLONS = "doublons.json"
+
+FORMAT_QUANTIF = os.environ.get("ARIA_EMB_QUANT", "int8")       # int8 | float16 | float32
+RERANK_TOP = int(os.environ.get("ARIA_EMB_RERANK", "100"))     # 0 = pas de re-scoring float32
+TAILLE_BLOC = 8192                                              # lignes décodées à la fois
+
+N_CLUSTERS = int(os.environ.get("ARIA_CORPUS_CLUSTERS", "0"))  # 0 = automatique (~ racine de N/2)
+DEDOUBLONNER = os.environ.get("ARIA_CORPUS_DEDUP", "1") != "0"
+
+TOP_N_MOTS_CLES = 10
+MAX_CHARS_TEXTE = 20000
+
+_index = None
+_index_erreur = None        # index présent mais inutilisable (fichiers manquants) : signalé une fois
+_lock = threading.Lock()
+
+
+# ======================
+# Construction
+# ======================
+def titre_cv(texte):
+    """Titre de poste = première ligne non vide du CV (format du corpus)."""
+    for ligne in texte.splitlines():
+        ligne = re.sub(r"\s+", " ", ligne).strip()
+        if len(ligne) > 2:
+            return (ligne.title() if ligne.isupper() else ligne)[:80]
+    return ""
+
+
+def _lire_document(chemin):
+    from extraction_cv import extraire_texte_pdf
+    if chemin.suffix.lower() == ".pdf":
+        return extraire_texte_pdf(str(chemin))
+    return chemin.read_text(encoding="utf-8", errors="ignore")
+
+
+def lister_documents(dossier=CORPUS_DIR):
+    """Chemins des CVs du corpus (.pdf, .txt, .md), triés pour un ordre stable."""
+    return sorted(p for p in Path(dossier).iterdir() if p.suffix.lower() in (".pdf", ".txt", ".md"))
+
+
+def construire_index(dossier=CORPUS_DIR, dossier_index=INDEX_DIR):
+    """
+    Extrait et dédoublonne le corpus, puis résume (KeyBERT) et encode (SBERT) les seuls
+    documents canoniques avant d'écrire l'index sur disque.
+    """
+    from rag_reformulation_cv import extraire_mots_cles, encoder_textes, backend_encodeur
+
+    t0 = time.perf_counter()
+    os.makedirs(dossier_index, exist_ok=True)
+    lus = []
+    for chemin in lister_documents(dossier):
+        try:
+            texte = _lire_document(chemin)
+        except Exception as e:
+            print(f"[INDEX] Ignoré {chemin.name} : {e}")
+            continue
+        if texte.strip():
+            lus.append((chemin, texte))
+
+    rapport = dedoublonner_corpus(lus, dossier_index)
+    documents = []
+    for chemin, texte in lus:
+        if chemin.stem not in rapport["canoniques"]:
+            continue
+        documents.append({
+            "id": chemin.stem,
+            "fichier": chemin.name,
+            "titre": titre_cv(texte),
+            "mots_cles": extraire_mots_cles([texte], TOP_N_MOTS_CLES)[0],
+            "texte": texte[:MAX_CHARS_TEXTE],
+            "doublons": rapport["canoniques"][chemin.stem],
+        })
+
+    embeddings = encoder_textes([" ".join(d["mots_cles"]) for d in documents])
+
+    with open(os.path.join(dossier_index, FICHIER_DOCUMENTS), "w", encoding="utf-8") as f:
+        for d in documents:
+            f.write(json.dumps({k: v for k, v in d.items() if k != "texte"}, ensure_ascii=False) + "\n")
+    ecrire_textes([d["texte"] for d in documents], dossier_index)
+    _sauver(os.path.join(dossier_index, FICHIER_EMBEDDINGS), embeddings)
+    quantifier_embeddings(dossier_index)
+    n_termes = construire_bm25([d["texte"] for d in documents], dossier_index)
+    n_clusters = clusteriser_embeddings(dossier_index)
+    meta = {
+        "n_documents": len(documents),
+        "n_documents_source": len(lus),
+        "n_doublons_ecartes": len(lus) - len(documents),
+        "n_clusters": n_clusters,
+        "n_termes_bm25": n_termes,
+        "dimension": int(embeddings.shape[1]) if len(documents) else 0,
+        "backend_embeddings": backend_encodeur(),
+        "source": os.path.abspath(dossier),
+        "construit_le": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(dossier_index, FICHIER_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    print(f"[INDEX] {len(documents)} CVs indexés en {time.perf_counter() - t0:.1f}s -> {dossier_index}")
+    return meta
+
+
+def dedoublonner_corpus(lus, dossier_index=INDEX_DIR):
+    """
+    Regroupe les quasi-doublons de `lus` [(chemin, texte)] et écrit doublons.json.
+    Retourne le bilan (rapport_doublons) + "canoniques" : {id canonique: [ids écartés]}.
+    """
+    t0 = time.perf_counter()
+    ids = [chemin.stem for chemin, _ in lus]
+    canonique = grouper_doublons([texte for _, texte in lus]) if DEDOUBLONNER else list(range(len(lus)))
+    rapport = rapport_doublons(canonique, ids)
+    rapport["canoniques"] = {ids[c]: [] for c in sorted(set(canonique))}
+    for i, c in enumerate(canonique):
+        if i != c:
+            rapport["canoniques"][ids[c]].append(ids[i])
+    with open(os.path.join(dossier_index, FICHIER_DOUBLONS), "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"[INDEX] Dédoublonnage : {rapport['n_documents']} -> {rapport['n_canoniques']} CVs "
+          f"(-{rapport['reduction_pct']} %, {rapport['n_groupes']} groupes) en {time.perf_counter() - t0:.1f}s")
+    return rapport
+
+
+def ecrire_textes(textes, dossier_index=INDEX_DIR):
+    """Textes complets, une chaîne JSON par ligne, et décalage en octets du début de chaque ligne."""
+    offsets = [0]
+    with open(os.path.join(dossier_index, FICHIER_TEXTES), "wb") as f:
+        for texte in textes:
+            ligne = (json.dumps(texte, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(ligne)
+            offsets.append(offsets[-1] + len(ligne))
+    _sauver(os.path.join(dossier_index, FICHIER_OFFSETS_TEXTES), np.asarray(offsets, dtype=np.int64))
+
+
+def _sauver(chemin, tableau):
+    """
+    np.save atomique : un worker qui a déjà ouvert le fichier en mmap garde l'ancienne version.
+    Fichier temporaire propre à chaque appel : plusieurs workers peuvent quantifier en même temps.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(chemin) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, tableau)
+        os.replace(tmp, chemin)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def quantifier_embeddings(dossier_index=INDEX_DIR):
+    """
+    Écrit les versions int8 (+ échelles par vecteur) et float16 des embeddings normalisés.
+    Fonctionne aussi sur un index existant (pas de ré-encodage).
+    """
+    chemin = lambda nom: os.path.join(dossier_index, nom)
+    emb = np.load(chemin(FICHIER_EMBEDDINGS)).astype(np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-9
+
+    echelles = np.maximum(np.abs(emb).max(axis=1), 1e-9) / 127.0
+    q8 = np.clip(np.rint(emb / echelles[:, None]), -127, 127).astype(np.int8)
+    _sauver(chemin(FICHIER_EMBEDDINGS), emb)
+    _sauver(chemin(FICHIER_EMBEDDINGS_Q.format(format="float16")), emb.astype(np.float16))
+    _sauver(chemin(FICHIER_ECHELLES), echelles.astype(np.float32))
+    # En dernier : sa présence signale un index normalisé et quantifié
+    _sauver(chemin(FICHIER_EMBEDDINGS_Q.format(format="int8")), q8)
+
+
+def clusteriser_embeddings(dossier_index=INDEX_DIR, n_clusters=N_CLUSTERS):
+    """
+    Regroupe le corpus (KMeans sur les embeddings normalisés) et écrit l'identifiant
+    de cluster de chaque document. Retourne le nombre de clusters.
+    """
+    from sklearn.cluster import KMeans
+
+    emb = np.load(os.path.join(dossier_index, FICHIER_EMBEDDINGS)).astype(np.float32)
+    n = len(emb)
+    k = min(n_clusters or max(1, int(round(np.sqrt(n / 2)))), n)
+    if k <= 1:
+        labels = np.zeros(n, dtype=np.int32)
+    else:
+        labels = KMeans(n_clusters=k, random_state=42, n_init=10).fit(emb).labels_.astype(np.int32)
+    _sauver(os.path.join(dossier_index, FICHIER_CLUSTERS), labels)
+    return int(k)
+
+
+# ======================
+# Lecture
+# ======================
+class IndexCorpus:
+    """
+    Index ouvert en lecture seule : métadonnées des documents en mémoire, embeddings et
+    décalages des textes en mmap (partagés entre workers), textes lus à la demande (texte(i)).
+    """
+
+    def __init__(self, dossier_index=INDEX_DIR, format_quantif=FORMAT_QUANTIF):
+        self.dossier = dossier_index
+        self._bm25 = None
+        self.format = format_quantif
+        chemin = lambda nom: os.path.join(dossier_index, nom)
+        requis = [FICHIER_DOCUMENTS, FICHIER_TEXTES, FICHIER_OFFSETS_TEXTES, FICHIER_EMBEDDINGS, FICHIER_CLUSTERS]
+        if self.format != "float32":
+            requis.append(FICHIER_EMBEDDINGS_Q.format(format=self.format))
+        if self.format == "int8":
+            requis.append(FICHIER_ECHELLES)
+        manquants = [nom for nom in requis if not os.path.exists(chemin(nom))]
+        if manquants:
+            raise Exception(f"Index incomplet dans {dossier_index} (manque {', '.join(manquants)}) : "
+                            f"reconstruire avec python index_corpus.py")
+
+        with open(chemin(FICHIER_DOCUMENTS), "r", encoding="utf-8") as f:
+            self.documents = [json.loads(l) for l in f if l.strip()]
+        self.offsets_textes = np.load(chemin(FICHIER_OFFSETS_TEXTES), mmap_mode="r")
+        self._fd_textes = os.open(chemin(FICHIER_TEXTES), os.O_RDONLY)
+        self.embeddings_f32 = np.load(chemin(FICHIER_EMBEDDINGS), mmap_mode="r")
+        if self.format == "float32":
+            self.embeddings_q, self.echelles = self.embeddings_f32, None
+        else:
+            self.embeddings_q = np.load(chemin(FICHIER_EMBEDDINGS_Q.format(format=self.format)), mmap_mode="r")
+            self.echelles = np.load(chemin(FICHIER_ECHELLES), mmap_mode="r") if self.format == "int8" else None
+        self.clusters = np.load(chemin(FICHIER_CLUSTERS), mmap_mode="r")
+        try:
+            with open(chemin(FICHIER_META), "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            self.meta = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def texte(self, i):
+        """Texte complet du document i, lu sur disque (pread : sûr entre threads)."""
+        debut, fin = int(self.offsets_textes[i]), int(self.offsets_textes[i + 1])
+        return json.loads(os.pread(self._fd_textes, fin - debut, debut).decode("utf-8"))
+
+    @property
+    def bm25(self):
+        """Index BM25, ouvert (mmap) au premier usage. None si absent de l'index."""
+        if self._bm25 is None and bm25_disponible(self.dossier):
+            with _lock:
+                if self._bm25 is None:
+                    self._bm25 = IndexBM25(self.dossier)
+        return self._bm25
+
+    def vecteurs(self, indices):
+        """Embeddings float32 normalisés des documents demandés (lecture des seules lignes utiles)."""
+        return np.asarray(self.embeddings_f32[np.asarray(indices)], dtype=np.float32)
+
+    def similarites(self, vecteur, rerank=RERANK_TOP):
+        """
+        Similarité cosinus de `vecteur` avec chaque document (np.ndarray de taille N),
+        calculée sur les vecteurs quantifiés par blocs, puis re-scorée en float32
+        pour les `rerank` meilleurs candidats.
+        """
+        q = np.asarray(vecteur, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-9)
+        n = len(self.embeddings_q)
+        sims = np.empty(n, dtype=np.float32)
+        for debut in range(0, n, TAILLE_BLOC):
+            bloc = np.asarray(self.embeddings_q[debut:debut + TAILLE_BLOC], dtype=np.float32)
+            s = bloc @ q
+            if self.echelles is not None:
+                s *= self.echelles[debut:debut + TAILLE_BLOC]
+            sims[debut:debut + TAILLE_BLOC] = s
+
+        if rerank and self.format != "float32" and n:
+            r = min(rerank, n)
+            top = np.sort(np.argpartition(-sims, r - 1)[:r])   # lignes triées : lecture mmap séquentielle
+            sims[top] = self.vecteurs(top) @ q
+        return sims
+
+    def plus_proches(self, vecteur, k=10):
+        """[(indice, similarité)] des k documents les plus proches, du plus au moins similaire."""
+        sims = self.similarites(vecteur)
+        k = min(k, len(sims))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(i), float(sims[i])) for i in top]
+
+
+def index_disponible(dossier_index=INDEX_DIR):
+    return os.path.exists(os.path.join(dossier_index, FICHIER_EMBEDDINGS))
+
+
+def verifier_backend(index, backend_requetes):
+    """
+    Les requêtes doivent être encodées par le backend qui a construit l'index : ONNX int8 et
+    PyTorch donnent des embeddings proches mais pas identiques. False (et avertissement) sinon.
+    """
+    construit = index.meta.get("backend_embeddings")
+    if construit and construit != backend_requetes:
+        print(f"[WARNING] Index construit avec le backend '{construit}', requêtes encodées avec "
+              f"'{backend_requetes}' : reconstruire l'index ou régler ARIA_EMBEDDINGS_BACKEND={construit}")
+        return False
+    return True
+
+
+def charger_index(dossier_index=INDEX_DIR, backend_requetes=None):
+    """
+    Index partagé du process, chargé au premier appel. None si l'index n'a pas été construit.
+    backend_requetes : backend d'encodage des requêtes (par défaut celui de rag_reformulation_cv),
+    comparé au backend noté dans meta.json au chargement.
+    """
+    global _index, _index_erreur
+    if _index is None and _index_erreur is None:
+        with _lock:
+            if _index is None and _index_erreur is None and index_disponible(dossier_index):
+                try:
+                    _index = IndexCorpus(dossier_index)
+                except Exception as e:
+                    _index_erreur = str(e)
+                    print(f"[INDEX] Index inutilisable : {e}")
+                    return None
+                print(f"[INDEX] {len(_index)} CVs chargés depuis {dossier_index}")
+                if backend_requetes is None:
+                    from rag_reformulation_cv import backend_encodeur
+                    backend_requetes = backend_encodeur()
+                verifier_backend(_index, backend_requetes)
+    return _index
+
+
+if __name__ == "__main__":
+    import sys
+    import embeddings_onnx
+    embeddings_onnx.PROCESS_DEDIE = True    # construction hors ligne : tous les cœurs
+    construire_index(*sys.argv[1:3])
@@ -0,0 +1,364 @@
+# json_llm.py
+
+import re
+import json
+
+
+"""
+PARSING TOLÉRANT du JSON renvoyé par Mistral.
+Objectif : récupérer un objet exploitable même quand la réponse contient de la prose,
+des fences ```json, des virgules finales ou une sortie tronquée, puis vérifier
+le résultat contre le schéma du prompt pour ne redemander QUE les champs manquants.
+"""
+
+
+# ======================
+# Schémas par prompt
+# ======================
+# Un schéma est un dict {clé: type | tuple de types | sous-schéma dict | [schéma d'un élément]}
+TEXTE_OU_LISTE = (str, list)
+
+SCHEMAS = {
+    "analyse_offre": {
+        "competences_cles": list,
+        "missions_principales": list,
+        "mots_cles_ats": list,
+        "titre_poste": str,
+    },
+    "evaluation": {
+        "score": (int, float),
+        "points_forts": list,
+        "points_faibles": list,
+        "verdict_court": str,
+        "recommandations": list,
+    },
+    "experiences": {
+        "experiences": [{"poste": str, "employeur": str}],
+    },
+    "alternatives": {
+        "alternatives": list,
+    },
+    "cv_optimise": {
+        "cv_optimise_complet": {
+            "entete": {"prenom_nom": str, "contact_info": (str, dict, list)},
+            "resume": str,
+            "experiences": [{"poste": str, "entreprise": str, "dates": str, "taches": TEXTE_OU_LISTE}],
+            "formation": [{"diplome": str, "ecole": str, "dates": str}],
+            "competences_techniques": TEXTE_OU_LISTE,
+            "soft_skills": TEXTE_OU_LISTE,
+            "langues": TEXTE_OU_LISTE,
+        },
+        "competences_suggerees": list,
+    },
+    # Génération du CV optimisé par sections (logic.generer_cv_par_sections)
+    "section_resume": {"resume": str},
+    "section_taches": {"taches": list},
+    "section_competences": {"competences_techniques": TEXTE_OU_LISTE, "competences_suggerees": list},
+    "section_soft_skills": {"soft_skills": TEXTE_OU_LISTE},
+    "section_entete": {"prenom_nom": str, "contact_info": (str, dict, list)},
+    "section_formation": {"formation": [{"diplome": str, "ecole": str, "dates": str}]},
+    "modification_cv": {
+        "cv_modifie": str,
+        "changements_faits": list,
+    },
+}
+
+MAX_CONTEXTE_COMPLETION = 4000
+TRONQUE = "\x00"              # marque la fin d'une chaîne coupée par la troncature (retirée au parse)
+
+
+# ======================
+# Parseur incrémental
+# ======================
+class ParseurJSONIncremental:
+    """
+    Consomme la réponse par morceaux (streaming) et normalise au fil de l'eau :
+    - ignore la prose / les fences avant le premier '{' ou '[' (le premier '{' seulement
+      si le schéma attend un objet : "Note [1] : {...}" ne démarre pas sur "[1]")
+    - s'arrête à la fermeture de la racine (la prose finale est ignorée)
+    - supprime les virgules finales et échappe les retours ligne dans les chaînes
+    - sait refermer une sortie tronquée (clé sans valeur, crochets) ; une chaîne coupée
+      n'est pas gardée comme valeur complète : elle devient None (champ manquant)
+    """
+
+    def __init__(self, schema=None):
+        self.ouvrants = "{" if isinstance(schema, dict) else "[" if isinstance(schema, list) else "{["
+        self.tampon = []        # JSON normalisé (sans espaces hors chaînes)
+        self.pile = []          # '{' / '[' ouverts
+        self.roles = []         # pour chaque niveau objet : 'cle' ou 'valeur'
+        self.dans_chaine = False
+        self.echappe = False
+        self.demarre = False
+        self.termine = False
+
+    def feed(self, morceau):
+        """Ajoute un morceau de texte. Retourne True dès que la racine JSON est fermée."""
+        for c in morceau:
+            if self.termine:
+                break
+            if not self.demarre:
+                if c not in self.ouvrants:
+                    continue
+                self.demarre = True
+            self._consommer(c)
+        return self.termine
+
+    def _consommer(self, c):
+        t = self.tampon
+        if self.dans_chaine:
+            if self.echappe:
+                self.echappe = False
+                t.append(c)
+            elif c == "\\":
+                self.echappe = True
+                t.append(c)
+            elif c == '"':
+                self.dans_chaine = False
+                t.append(c)
+            elif c == "\n":
+                t.append("\\n")
+            elif c == "\t":
+                t.append("\\t")
+            elif c >= " ":
+                t.append(c)
+            return
+
+        if c.isspace():
+            return
+        if c == '"':
+            self.dans_chaine = True
+            t.append(c)
+        elif c in "{[":
+            self.pile.append(c)
+            if c == "{":
+                self.roles.append("cle")
+            t.append(c)
+        elif c in "}]":
+            if not self.pile:
+                return
+            if t and t[-1] == ",":
+                t.pop()
+            if self.pile.pop() == "{":
+                self.roles.pop()
+            t.append("}" if c == "}" else "]")
+            if not self.pile:
+                self.termine = True
+        elif c == ":":
+            if self.roles:
+                self.roles[-1] = "valeur"
+            t.append(c)
+        elif c == ",":
+            if t and t[-1] in ",{[":   # virgule en double / en tête
+                return
+            if self.pile and self.pile[-1] == "{":
+                self.roles[-1] = "cle"
+            t.append(c)
+        else:
+            t.append(c)
+
+    def texte_repare(self):
+        """JSON refermé à partir de ce qui a été reçu (même si la sortie est tronquée)."""
+        if not self.demarre:
+            return ""
+        t = list(self.tampon)
+        if self.termine:
+            return "".join(t)
+
+        if self.dans_chaine:
+            if self.echappe:
+                t.pop()
+            # Valeur coupée : marquée pour être retirée ; clé coupée : complétée par :null plus bas
+            est_cle = self.pile and self.pile[-1] == "{" and self.roles[-1] == "cle"
+            t.append('"' if est_cle else '\\u0000"')
+        texte = "".join(t)
+
+        # Littéral ou nombre coupé en plein milieu (ex: "tru", "12.") -> retiré
+        m = re.search(r"([:,\[])([^\"{}\[\]:,]+)$", texte)
+        if m:
+            try:
+                json.loads(m.group(2))
+            except ValueError:
+                texte = texte[:m.start(2)]
+
+        if texte.endswith(","):
+            texte = texte[:-1]
+        if texte.endswith(":"):
+            texte += "null"
+        elif self.pile and self.pile[-1] == "{" and self.roles[-1] == "cle" and texte.endswith('"'):
+            texte += ":null"        # clé reçue sans sa valeur
+
+        for ouvrant in reversed(self.pile):
+            texte += "}" if ouvrant == "{" else "]"
+        return texte
+
+    def resultat(self):
+        """
+        Objet Python réparé, ou None si rien d'exploitable. La chaîne coupée par une
+        troncature (toujours la dernière feuille) est remplacée par None.
+        """
+        texte = self.texte_repare()
+        if not texte:
+            return None
+        try:
+            obj = json.loads(texte)
+        except ValueError:
+            return None
+        _marquer_tronque(obj)
+        return obj
+
+
+def _marquer_tronque(noeud):
+    """Remplace par None la dernière feuille si c'est une chaîne coupée (suffixe TRONQUE)."""
+    while isinstance(noeud, (dict, list)) and noeud:
+        cle = next(reversed(noeud)) if isinstance(noeud, dict) else len(noeud) - 1
+        valeur = noeud[cle]
+        if isinstance(valeur, str):
+            if valeur.endswith(TRONQUE):
+                noeud[cle] = None
+            return
+        noeud = valeur
+
+
+def retirer_nuls(noeud):
+    """Retire les éléments None des listes (chaîne coupée non redemandée ou non obtenue)."""
+    if isinstance(noeud, dict):
+        for valeur in noeud.values():
+            retirer_nuls(valeur)
+    elif isinstance(noeud, list):
+        noeud[:] = [v for v in noeud if v is not None]
+        for valeur in noeud:
+            retirer_nuls(valeur)
+    return noeud
+
+
+def charger_json(texte, schema=None):
+    """
+    Parse tolérant d'une réponse complète (prose, fences, virgules, troncature).
+    schema : s'il attend un objet, le parse démarre au premier '{'.
+    """
+    if not texte:
+        return None
+    parseur = ParseurJSONIncremental(schema)
+    parseur.feed(texte)
+    return retirer_nuls(parseur.resultat())
+
+
+# ======================
+# Validation de schéma
+# ======================
+def _type_ok(valeur, attendu):
+    if isinstance(attendu, tuple):
+        return any(_type_ok(valeur, a) for a in attendu)
+    if attendu in (int, float) and isinstance(valeur, bool):
+        return False
+    return isinstance(valeur, attendu)
+
+
+def champs_manquants(obj, schema, prefixe=""):
+    """
+    Liste des chemins ('a.b.0.c') absents, nuls ou de mauvais type par rapport au schéma
+    (y compris les éléments nuls d'une liste : chaîne coupée par une troncature).
+    """
+    manquants = []
+    if not isinstance(obj, dict):
+        return [prefixe.rstrip(".") or "$"]
+    for cle, attendu in schema.items():
+        chemin = f"{prefixe}{cle}"
+        valeur = obj.get(cle)
+        if valeur is None:
+            manquants.append(chemin)
+        elif isinstance(attendu, dict):
+            manquants.extend(champs_manquants(valeur, attendu, chemin + "."))
+        elif isinstance(attendu, list):
+            if not isinstance(valeur, list):
+                manquants.append(chemin)
+            else:
+                for i, item in enumerate(valeur):
+                    manquants.extend(champs_manquants(item, attendu[0], f"{chemin}.{i}."))
+        elif not _type_ok(valeur, attendu):
+            manquants.append(chemin)
+        elif isinstance(valeur, list):
+            manquants.extend(f"{chemin}.{i}" for i, item in enumerate(valeur) if item is None)
+    return manquants
+
+
+def _poser(obj, chemin, valeur):
+    """Écrit `valeur` au chemin pointé ('a.b.0.c') en créant les dicts intermédiaires."""
+    parties = chemin.split(".")
+    courant = obj
+    for partie, suivante in zip(parties, parties[1:]):
+        if isinstance(courant, list):
+            courant = courant[int(partie)]
+        else:
+            if not isinstance(courant.get(partie), (dict, list)):
+                courant[partie] = [] if suivante.isdigit() else {}
+            courant = courant[partie]
+    if isinstance(courant, list):
+        courant[int(parties[-1])] = valeur
+    else:
+        courant[parties[-1]] = valeur
+
+
+def _description_type(attendu):
+    if isinstance(attendu, tuple):
+        return " ou ".join(_description_type(a) for a in attendu)
+    if isinstance(attendu, (dict, list)):
+        return "objet JSON" if isinstance(attendu, dict) else "liste JSON"
+    return {str: "texte", list: "liste", dict: "objet", int: "entier", float: "nombre"}.get(attendu, "valeur")
+
+
+def _type_attendu(schema, chemin):
+    courant = schema
+    for partie in chemin.split("."):
+        if courant is list and partie.isdigit():
+            courant = None      # élément d'une liste non typée
+            continue
+        if isinstance(courant, list):
+            courant = courant[0]
+            if partie.isdigit():
+                continue
+        if isinstance(courant, dict):
+            courant = courant.get(partie)
+    return courant
+
+
+def prompt_completer_champs(prompt_original, partiel, manquants, schema):
+    """Prompt court qui ne redemande que les champs manquants (format chemin -> valeur)."""
+    liste = "\n".join(f'    - "{c}" ({_description_type(_type_attendu(schema, c))})' for c in manquants)
+    contexte = prompt_original[:MAX_CONTEXTE_COMPLETION]
+    return f"""
+    Ta réponse précédente était un JSON incomplet. NE RÉÉCRIS PAS tout le document.
+    Renvoie UNIQUEMENT un objet JSON plat dont les clés sont les chemins manquants ci-dessous
+    et les valeurs le contenu attendu :
+{liste}
+
+    JSON DÉJÀ OBTENU :
+    {json.dumps(partiel, ensure_ascii=False)[:MAX_CONTEXTE_COMPLETION]}
+
+    DEMANDE INITIALE :
+    {contexte}
+    """
+
+
+def completer_champs(obj, schema, prompt_original, appeler):
+    """
+    Valide `obj` contre le schéma et, s'il manque des champs, les redemande en un seul appel court.
+    `appeler(prompt) -> str` est la fonction d'appel LLM.
+    """
+    if obj is None:
+        return None
+    manquants = champs_manquants(obj, schema)
+    if not manquants or manquants == ["$"]:
+        return retirer_nuls(obj) if not manquants else None
+
+    print(f"[JSON] {len(manquants)} champ(s) manquant(s), complétion ciblée : {manquants[:5]}")
+    complement = charger_json(appeler(prompt_completer_champs(prompt_original, obj, manquants, schema)),
+                              {chemin: object for chemin in manquants})
+    if isinstance(complement, dict):
+        for chemin in manquants:
+            if complement.get(chemin) is not None:
+                try:
+                    _poser(obj, chemin, complement[chemin])
+                except (IndexError, ValueError, KeyError, TypeError):
+                    pass
+    return retirer_nuls(obj)
@@ -1,18 +1,35 @@
 import os
 import re
 import json
-import PyPDF2
-import docx2txt
-import requests
 import glob
-from io import BytesIO
+import time
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as AttenteExpiree
 from mistralai import Mistral
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 
 # Importation des modules existants
 from export_cv import creer_docx_cv, creer_pdf_cv
-from rag_reformulation_cv import rag_retrieval_sbbert
+from modele_cv import CV, texte_cv, lire_texte_cv
+from extraction_cv import extraire_texte_pdf, extraire_texte_docx
+from rag_reformulation_cv import rag_retrieval_sbbert, encoder_cv, encoder_mots_cles_offre, plus_proches_corpus
+from cache_cv import MagasinCV, hash_contenu
+from cache_offre import CacheOffres
+from json_llm import ParseurJSONIncremental, SCHEMAS, charger_json, completer_champs, champs_manquants, retirer_nuls
+from score_ats import scorer_cv
+from diff_cv import comparer_cv
+from index_corpus import charger_index
+from serveur_modeles import ModelesIndisponibles
+import preflight
+from extraction_offre import extraire_offre
+from cassettes import cassette
+from ordonnanceur_llm import OrdonnanceurLLM
+from speculation import Speculateur
+from echeance import (Echeance, DelaiDepasse, TravailAnnule, verifier_echeance, verifier_annulation,
+                      DELAI_PHASE_1, DELAI_PHASE_2, DELAI_API, BUDGET_RAG, BUDGET_EVALUATION)
+from parseur_cv import analyser_cv, experiences_cv, SEUIL_CONFIANCE, EMAIL, TELEPHONE, DIPLOME, ECOLE
 
 # ==========================
 # CONFIGURATION
@@ -23,10 +40,33 @@ MODEL = "mistral-small-latest"
 client = Mistral(api_key=MISTRAL_API_KEY)
 print(f"[LOGIC] Utilisation du modèle Mistral : {MODEL}")
 
+# Appels Mistral simultanés par worker (limite de débit de l'API),
+# attribués par priorité (interactif > analyse > fond) et à tour de rôle entre sessions
+MISTRAL_CONCURRENCE = int(os.environ.get("ARIA_MISTRAL_CONCURRENCE", "4"))
+limiteur_mistral = OrdonnanceurLLM(MISTRAL_CONCURRENCE)
+
 # Dossier temporaire pour stocker les textes volumineux
 TEMP_DIR = os.path.join(os.getcwd(), "temp_data")
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Artefacts de CV partagés entre sessions (clé = hash du fichier uploadé)
+magasin_cv = MagasinCV(os.path.join(TEMP_DIR, "cv_store"))
+
+# Analyses d'offres partagées entre utilisateurs (URL normalisée / hash du texte)
+cache_offres = CacheOffres()
+
+# Extractions d'expériences : parseur local vs repli LLM (exposé sur /api/stats)
+stats_parseur = Counter()
+
+# Tâches de fond (raffinements LLM non bloquants pour l'affichage)
+executeur_fond = ThreadPoolExecutor(max_workers=int(os.environ.get("ARIA_WORKERS_FOND", "4")),
+                                    thread_name_prefix="aria-fond")
+
+# Phase 2 et alternatives pré-calculées pendant la lecture du diagnostic
+speculateur = Speculateur(ordonnanceur=limiteur_mistral)
+# Phase 2 spéculative reprise au clic : marge après l'échéance pour recevoir son résultat dégradé
+MARGE_REPRISE_PHASE_2 = float(os.environ.get("ARIA_MARGE_REPRISE_PHASE_2", "5"))
+
 # ==========================
 # GESTION STOCKAGE DISQUE (VITAL POUR FLASK)
 # ==========================
@@ -62,6 +102,8 @@ def get_json_from_disk(path):
 
 def clean_session_files(session_id):
     """Nettoie tous les fichiers temporaires liés à une session."""
+    annuler_evaluation(session_id)
+    magasin_cv.liberer_session(session_id)
     for ext in ["txt", "json"]:
         pattern = os.path.join(TEMP_DIR, f"{session_id}_*.{ext}")
         for f in glob.glob(pattern):
@@ -76,63 +118,110 @@ def clean_session_files(session_id):
 def lire_fichier_upload(file_storage):
     return file_storage.read(), file_storage.filename.lower()
 
-def extraire_texte_pdf(file_bytes):
-    try:
-        reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        return "".join([page.extract_text() or "" for page in reader.pages])
-    except Exception as e:
-        raise Exception(f"Erreur PDF : {e}")
-
-def extraire_texte_docx(file_bytes):
-    try:
-        return docx2txt.process(BytesIO(file_bytes))
-    except Exception as e:
-        raise Exception(f"Erreur DOCX : {e}")
-
 def extraire_offre_depuis_url(url):
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        r = requests.get(url, timeout=15, headers=headers)
-        r.raise_for_status()
-        
-        soup = BeautifulSoup(r.text, 'html.parser')
-        
-        # Nettoyage
-        for element in soup(["script", "style", "header", "footer", "nav", "iframe", "noscript", "svg"]):
-            element.decompose()
-            
-        text = soup.get_text(separator=' ')
-        return re.sub(r'\s+', ' ', text).strip()[:25000]
+        # Lecture en streaming bornée + extraction sans arbre DOM (JSON-LD JobPosting prioritaire)
+        return extraire_offre(url)
     except Exception as e:
         raise Exception(f"Erreur scraping offre : {e}")
 
-def appeler_mistral(prompt):
-    if not MISTRAL_API_KEY: raise Exception("Clé API manquante.")
-    try:
+def _prendre_place_mistral(echeance):
+    """Place dans limiteur_mistral (classe et session de l'échéance), attendue au plus
+    jusqu'à l'échéance et l'attente max de la classe. Retourne le timeout HTTP (ms)."""
+    verifier_echeance(echeance)
+    if echeance is None:
+        if not limiteur_mistral.acquerir():
+            raise Exception("API Mistral : file d'attente saturée.")
+        return None
+    if not limiteur_mistral.acquerir(echeance.priorite, echeance.session, timeout=echeance.delai()):
+        # Délai de la requête ou attente max de la classe : les étapes optionnelles se replient
+        raise DelaiDepasse("File d'attente Mistral : délai dépassé.")
+    delai = echeance.delai()
+    return max(1, int(delai * 1000)) if delai is not None else None
+
+def _erreur_mistral(e, echeance):
+    if echeance is not None and echeance.expiree:
+        return DelaiDepasse(f"API Mistral : délai dépassé ({e})")
+    return Exception(f"API Mistral : {e}")
+
+def appeler_mistral(prompt, echeance=None):
+    if not MISTRAL_API_KEY and not cassette.rejoue: raise Exception("Clé API manquante.")
+    timeout_ms = _prendre_place_mistral(echeance)
+
+    def appel():
         resp = client.chat.complete(
             model=MODEL,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prompt}],
+            timeout_ms=timeout_ms
         )
         return resp.choices[0].message.content
+    try:
+        # Enregistré / rejoué par la cassette si ARIA_CASSETTE_MODE est défini
+        return cassette.mistral(MODEL, prompt, appel)
     except Exception as e:
-        raise Exception(f"API Mistral : {e}")
+        raise _erreur_mistral(e, echeance)
+    finally:
+        limiteur_mistral.liberer()
+
+def appeler_mistral_stream(prompt, echeance=None):
+    """Génère la réponse de Mistral morceau par morceau (streaming).
+    Le flux est coupé au morceau suivant si l'échéance est annulée ou dépassée."""
+    if not MISTRAL_API_KEY and not cassette.rejoue: raise Exception("Clé API manquante.")
+    timeout_ms = _prendre_place_mistral(echeance)
+
+    def flux():
+        with client.chat.stream(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            timeout_ms=timeout_ms
+        ) as stream:
+            for event in stream:
+                delta = event.data.choices[0].delta.content
+                if delta:
+                    yield delta
+    morceaux = cassette.mistral_flux(MODEL, prompt, flux)
+    try:
+        for delta in morceaux:
+            verifier_echeance(echeance)
+            yield delta
+    except (TravailAnnule, DelaiDepasse):
+        raise
+    except Exception as e:
+        raise _erreur_mistral(e, echeance)
+    finally:
+        morceaux.close()
+        limiteur_mistral.liberer()
 
-def safe_json_load(text: str):
-    if not text: return None
-    text = text.strip()
-    if "```json" in text:
-        text = text.split("```json")[1].split("```")[0].strip()
-    elif text.startswith("```"):
-        text = text.strip("`").strip()
+def appeler_mistral_json(prompt, schema=None, avec_brut=False, echeance=None):
+    """
+    Appel Mistral en streaming avec parsing JSON incrémental :
+    la lecture s'arrête dès que l'objet racine est fermé, les défauts courants
+    sont réparés localement et seuls les champs manquants du schéma sont redemandés.
+    """
+    parseur = ParseurJSONIncremental(SCHEMAS[schema] if schema else None)
+    morceaux = []
+    flux = appeler_mistral_stream(prompt, echeance)
     try:
-        return json.loads(text)
-    except:
-        return None
+        for morceau in flux:
+            morceaux.append(morceau)
+            if parseur.feed(morceau):
+                break
+    finally:
+        flux.close()    # libère le flux (et sa place dans limiteur_mistral) dès l'objet fermé
+    brut = "".join(morceaux)
+    obj = parseur.resultat()
+    if obj is not None and schema:
+        obj = completer_champs(obj, SCHEMAS[schema], prompt, lambda p: appeler_mistral(p, echeance))
+    elif obj is not None:
+        obj = retirer_nuls(obj)
+    return (obj, brut) if avec_brut else obj
+
+def safe_json_load(text: str, schema=None):
+    """Parse tolérant : fences, prose autour, virgules finales, sortie tronquée."""
+    return charger_json(text, SCHEMAS[schema] if schema else None)
 
 def json_cv_to_text(data_json):
-    """Convertit le JSON structuré en texte lisible."""
+    """Convertit le JSON structuré (ou un modele_cv.CV) en texte lisible."""
     if not data_json: 
         return ""
     
@@ -140,59 +229,7 @@ def json_cv_to_text(data_json):
     if isinstance(data_json, str): 
         return data_json
     
-    # Si c'est un dict avec cv_optimise_complet imbriqué
-    if isinstance(data_json, dict) and 'cv_optimise_complet' in data_json:
-        data_json = data_json['cv_optimise_complet']
-    
-    txt = ""
-    ent = data_json.get('entete', {})
-    
-    # Formatage propre du contact
-    nom = ent.get('prenom_nom', '').upper()
-    contact_raw = ent.get('contact_info', '')
-    
-    if isinstance(contact_raw, dict):
-        contact_str = " | ".join([str(v) for v in contact_raw.values() if v])
-    elif isinstance(contact_raw, list):
-        contact_str = " | ".join([str(v) for v in contact_raw if v])
-    else:
-        contact_str = str(contact_raw)
-        
-    txt += f"{nom}\n{contact_str}\n\n"
-    
-    if data_json.get('resume'):
-        txt += f"PROFIL __________________________________________________\n{data_json['resume']}\n\n"
-        
-    if data_json.get('experiences'):
-        txt += "EXPERIENCES _____________________________________________\n"
-        for e in data_json['experiences']:
-            txt += f"{e.get('poste')} @ {e.get('entreprise')} ({e.get('dates')})\n"
-            taches = e.get('taches', [])
-            if isinstance(taches, list):
-                for t in taches: txt += f"- {t}\n"
-            else:
-                txt += f"- {taches}\n"
-            txt += "\n"
-            
-    if data_json.get('formation'):
-        txt += "FORMATION _______________________________________________\n"
-        for f in data_json['formation']:
-            txt += f"{f.get('diplome')} - {f.get('ecole')} ({f.get('dates')})\n"
-            
-    txt += "COMPÉTENCES & DIVERS ____________________________________\n"
-    
-    def add_sec(key, title):
-        val = data_json.get(key)
-        if val:
-            if isinstance(val, list): val = ", ".join(val)
-            return f"{title}: {val}\n"
-        return ""
-    
-    txt += add_sec('competences_techniques', 'Tech')
-    txt += add_sec('soft_skills', 'Soft Skills')
-    txt += add_sec('langues', 'Langues')
-    
-    return txt
+    return texte_cv(CV.depuis_json(data_json))
 
 def update_fichiers(data, session_id):
     """Génère les fichiers DOCX et PDF."""
@@ -207,6 +244,9 @@ def update_fichiers(data, session_id):
             payload = get_large_text_from_disk(data['optimized_cv_path'])
 
         if payload:
+            # JSON normalisé une seule fois pour les deux exports
+            if isinstance(payload, dict):
+                payload = CV.depuis_json(payload)
             data['docx_path'] = creer_docx_cv(payload)
             data['pdf_path'] = creer_pdf_cv(payload)
     except Exception as e:
@@ -370,6 +410,98 @@ def prompt_generer_cv_optimise(texte_cv, liste_exp, analyse_offre, contexte_rag,
     CV ORIGINAL : {texte_cv}
     """
 
+# ---------------------------------------------------
+# 5 bis. Génération par sections (appels courts et parallèles)
+# ---------------------------------------------------
+def _offre_compacte(analyse_offre):
+    """Titre, compétences et mots-clés ATS de l'offre, sur quelques lignes."""
+    if not isinstance(analyse_offre, dict):
+        return _truncate(str(analyse_offre or ""), 1000)
+    return "\n".join([
+        f"Titre du poste: {analyse_offre.get('titre_poste', '')}",
+        f"Compétences clés: {', '.join(map(str, analyse_offre.get('competences_cles', [])))}",
+        f"Missions: {', '.join(map(str, analyse_offre.get('missions_principales', [])))}",
+        f"Mots-clés ATS: {', '.join(map(str, analyse_offre.get('mots_cles_ats', [])))}",
+    ])
+
+def prompt_section_resume(resume_original, experiences, analyse_offre, contexte_rag, recos):
+    postes = "\n".join(f"- {e['poste']} @ {e['employeur']} ({e['dates']})" for e in experiences)
+    return f"""
+    Tu es un expert en rédaction de CV. Rédige le résumé exécutif du CV pour correspondre à l'offre.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide : {{"resume": "3-4 lignes percutantes"}}
+
+    CONSIGNES :
+    - N'invente aucune expérience ni compétence absente du CV.
+    - Inspire-toi du style : {_truncate(contexte_rag, MAX_RAG_CHARS)}
+    - Applique les recos : {', '.join(recos)}
+
+    OFFRE : {_offre_compacte(analyse_offre)}
+    RÉSUMÉ ORIGINAL : {_truncate(resume_original, 1500) or "(aucun)"}
+    POSTES OCCUPÉS :
+    {postes}
+    """
+
+def prompt_section_taches(experience, analyse_offre, recos):
+    taches = "\n".join(f"- {t}" for t in experience["taches"]) or "(aucune tâche détaillée)"
+    return f"""
+    Tu es un expert en rédaction de CV. Reformule les tâches de CETTE expérience pour l'offre.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide : {{"taches": ["Action 1 + résultat", "Action 2 (mots-clés ATS)"]}}
+
+    CONSIGNES :
+    - 3 à 6 puces, verbe d'action + résultat, mots-clés ATS de l'offre quand ils sont justifiés.
+    - Reste fidèle aux faits de l'expérience, n'invente ni chiffres ni outils.
+    - Applique les recos : {', '.join(recos)}
+
+    OFFRE : {_offre_compacte(analyse_offre)}
+    EXPÉRIENCE : {experience['poste']} @ {experience['employeur']} ({experience['dates']})
+    TÂCHES ORIGINALES :
+    {taches}
+    """
+
+def prompt_section_competences(competences_originales, texte_cv, analyse_offre):
+    return f"""
+    Tu es un expert en rédaction de CV. Réécris la liste des compétences techniques (Hard Skills) du CV
+    dans l'ordre de pertinence pour l'offre, et suggère celles de l'offre absentes du CV.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide :
+    {{"competences_techniques": "Liste des compétences techniques originales",
+      "competences_suggerees": ["Compétence 1 (Absente du CV original)"]}}
+
+    OFFRE : {_offre_compacte(analyse_offre)}
+    COMPÉTENCES DU CV : {_truncate(competences_originales, 2000) or _truncate(texte_cv, 3000)}
+    """
+
+def prompt_section_soft_skills(texte_cv, analyse_offre):
+    return f"""
+    Tu es un expert en rédaction de CV. Liste les compétences comportementales (Soft Skills) du candidat
+    les plus pertinentes pour le poste (ex: Communication, Rigueur...), déduites de son CV.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide : {{"soft_skills": "Compétence 1, Compétence 2"}}
+
+    OFFRE : {_offre_compacte(analyse_offre)}
+    CV ORIGINAL : {_truncate(texte_cv, 3000)}
+    """
+
+def prompt_section_entete(texte_cv):
+    return f"""
+    Tu es un expert en lecture de CV. Recopie l'en-tête du CV : nom complet du candidat et coordonnées.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide :
+    {{"prenom_nom": "Prénom Nom", "contact_info": "Téléphone | Email | Liens"}}
+
+    CONSIGNES : recopie tel quel, n'invente rien ; chaîne vide si l'information est absente.
+
+    CV ORIGINAL : {_truncate(texte_cv, 2000)}
+    """
+
+def prompt_section_formation(formation_originale, texte_cv):
+    return f"""
+    Tu es un expert en lecture de CV. Liste les diplômes et formations du CV.
+    Ta réponse DOIT être UNIQUEMENT un objet JSON valide :
+    {{"formation": [{{"diplome": "...", "ecole": "...", "dates": "...", "details": "..."}}]}}
+
+    CONSIGNES : recopie fidèlement (pas de reformulation, pas d'invention) ; liste vide s'il n'y en a pas.
+
+    FORMATION DU CV : {_truncate(formation_originale, 2000) or _truncate(texte_cv, 4000)}
+    """
+
 # ---------------------------------------------------
 # 6. Modification d’un CV
 # ---------------------------------------------------
@@ -406,7 +538,7 @@ def prompt_modification_cv(cv_actuel, instruction):
     """
 
 # ---------------------------------------------------
-# 7. Comparaison des versions
+# 7. Comparaison des versions (remplacé par diff_cv.comparer_cv, local)
 # ---------------------------------------------------
 def prompt_comparer_versions(cv_orig, cv_opt, analyse):
     o1 = _truncate(cv_orig, MAX_CV_CHARS)
@@ -432,6 +564,27 @@ def prompt_comparer_versions(cv_orig, cv_opt, analyse):
 # LOGIQUE PRINCIPALE (PHASES)
 # ==========================
 
+def analyser_offre(url_offre=None, texte_offre=None):
+    """
+    Analyse d'offre via le cache partagé : scraping + prompt_analyse_offre + embedding
+    des mots-clés, exécutés une seule fois par offre même sous requêtes simultanées.
+    Retourne l'entrée du cache (clés : hash, texte_offre, analyse, embedding).
+    """
+    return cache_offres.obtenir(
+        url=url_offre,
+        texte=texte_offre,
+        scraper=extraire_offre_depuis_url,
+        analyser=lambda texte: appeler_mistral_json(prompt_analyse_offre(texte), "analyse_offre") or {},
+        encoder=encoder_mots_cles_offre,
+    )
+
+def embedding_offre(data, analyse_offre):
+    """Embedding des mots-clés de l'offre : repris du cache si possible."""
+    entree = cache_offres.get(data.get('offre_hash')) if data.get('offre_hash') else None
+    if entree is not None and entree.get("embedding") is not None:
+        return entree["embedding"]
+    return encoder_mots_cles_offre(analyse_offre) if analyse_offre else None
+
 def validate_evaluation_json(eval_dict):
     """Valide et corrige le format du JSON d'évaluation"""
     if not isinstance(eval_dict, dict):
@@ -457,53 +610,323 @@ def validate_evaluation_json(eval_dict):
     
     return result
 
-def phase_1_analyse(cv_bytes, cv_name, url_offre, session_id):
-    """Phase 1 : Analyse. SAUVEGARDE TOUT SUR DISQUE."""
-    if cv_name.endswith(".pdf"): 
-        cv_text = extraire_texte_pdf(cv_bytes)
-    else: 
-        cv_text = extraire_texte_docx(cv_bytes)
-    
-    # 1. Sauvegarde Texte CV
-    cv_text_path = save_text_to_disk(cv_text, session_id, "cv_original")
+def extraire_experiences_cv(cv_text, echeance=None):
+    """
+    Expériences du CV [{poste, employeur}] : parseur local (quelques ms), et appel
+    Mistral seulement si sa confiance est sous ARIA_PARSEUR_SEUIL.
+    """
+    exp_json, confiance = experiences_cv(cv_text)
+    if confiance >= SEUIL_CONFIANCE:
+        stats_parseur["local"] += 1
+        return exp_json['experiences']
+    stats_parseur["llm"] += 1
+    print(f"[PARSEUR] Confiance {confiance} < {SEUIL_CONFIANCE} : extraction des expériences par Mistral")
+    exp_json = appeler_mistral_json(prompt_extraire_experiences(cv_text), "experiences", echeance=echeance)
+    return exp_json.get('experiences', []) if isinstance(exp_json, dict) else []
+
+def _experiences_contexte(cv_text, echeance=None):
+    """Expériences du CV au format court 'poste @ employeur' (contexte du prompt)."""
+    return [f"{e.get('poste', '')} @ {e.get('employeur', '')}" for e in extraire_experiences_cv(cv_text, echeance)]
+
+def _evaluation_locale(score_ats):
+    """Évaluation de repli tirée du score ATS local (quand l'évaluation Mistral n'a pas le temps)."""
+    manquants = score_ats.get("manquants", [])
+    return {
+        "score": score_ats.get("score", 0),
+        "points_forts": [f"Mot-clé couvert : {c['mot_cle']}" for c in score_ats.get("couverture", []) if c.get("trouve")][:3],
+        "points_faibles": [f"Mot-clé absent : {m}" for m in manquants[:3]],
+        "verdict_court": f"Couverture ATS : {score_ats.get('score', 0)}/100 (évaluation rapide)",
+        "recommandations": [f"Mettre en avant « {m} » si vous le maîtrisez" for m in manquants[:3]],
+    }
+
+_evaluations_en_cours = {}         # session_id -> (future, echeance) de l'évaluation Mistral
+INTERVALLE_ATTENTE_EVALUATION = 0.5  # secondes entre deux vérifications d'annulation pendant l'attente
+_evaluations_lock = threading.Lock()
+
+def _evaluer_en_fond(cv_text, analyse_offre, eval_path, score, echeance):
+    """
+    Évaluation Mistral du CV original, lancée après l'affichage du score ATS local :
+    remplace l'évaluation rapide sur disque (même chemin, écriture atomique) si elle aboutit.
+    Le score reste celui de la couverture ATS locale (une seule échelle de l'étape 2 à l'étape 5) :
+    Mistral n'apporte que le verdict, les forces / faiblesses et les recommandations.
+    """
+    try:
+        eval_parsed = appeler_mistral_json(prompt_evaluer_cv(cv_text, analyse_offre), "evaluation", echeance=echeance)
+        if eval_parsed and not echeance.annulee:
+            evaluation = validate_evaluation_json(eval_parsed)
+            evaluation["score"] = score
+            tmp = f"{eval_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(evaluation, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, eval_path)
+    except TravailAnnule:
+        pass  # nouvelle analyse ou session terminée
+    except Exception as e:
+        print(f"[WARNING] Évaluation Mistral échouée, score ATS local conservé: {e}")
+
+def annuler_evaluation(session_id):
+    """Abandonne l'évaluation Mistral en cours de la session (nouvelle analyse, reset)."""
+    with _evaluations_lock:
+        entree = _evaluations_en_cours.pop(session_id, None)
+    if entree is not None:
+        future, echeance = entree
+        echeance.annuler()
+        future.cancel()
+
+def attendre_evaluation(session_id, echeance=None):
+    """
+    Attend l'évaluation Mistral de la session avant de lire ses recommandations (phase 2).
+    Travail de fond (sans limite) : jusqu'à la fin de l'évaluation ; requête : au plus
+    BUDGET_EVALUATION secondes, puis repli sur les recommandations de l'évaluation rapide.
+    """
+    with _evaluations_lock:
+        entree = _evaluations_en_cours.get(session_id)
+    if entree is None:
+        return
+    limite = None
+    while not entree[0].done():
+        verifier_annulation(echeance)
+        # Un travail spéculatif promu par une requête prend son délai en cours de route
+        if limite is None and echeance is not None and echeance.restant() is not None:
+            limite = time.monotonic() + echeance.delai(BUDGET_EVALUATION)
+        if limite is not None and time.monotonic() >= limite:
+            echeance.degrader("evaluation", "évaluation IA en retard : recommandations de l'évaluation rapide")
+            return
+        try:
+            entree[0].result(timeout=INTERVALLE_ATTENTE_EVALUATION)
+        except AttenteExpiree:
+            pass
+        except Exception:
+            return  # annulée : l'évaluation rapide reste sur disque
+
+def evaluation_en_attente(session_id):
+    """True tant que l'évaluation Mistral de l'étape 2 tourne (la page affiche le score local)."""
+    with _evaluations_lock:
+        entree = _evaluations_en_cours.get(session_id)
+    return entree is not None and not entree[0].done()
+
+def phase_1_analyse(cv_source, cv_name, url_offre, session_id, cv_hash=None, echeance=None):
+    """Phase 1 : Analyse. SAUVEGARDE TOUT SUR DISQUE.
+    cv_source : octets du CV ou fichier binaire (upload spooled).
+    Le texte et les expériences sont partagés entre sessions via le hash du CV.
+    L'évaluation enregistrée est d'abord celle du score ATS local ; l'évaluation Mistral
+    tourne ensuite en fond et la remplace (voir evaluation_en_attente)."""
+    annuler_evaluation(session_id)
+    # 0. Contrôles préalables (quelques ms, avant toute dépense LLM)
+    avertissements = preflight.verifier_fichier(cv_source, cv_name)
+    # L'URL est vérifiée pendant l'extraction du texte (sauf offre déjà en cache)
+    verif_url = None if cache_offres.connait_url(url_offre) else executeur_fond.submit(preflight.verifier_url, url_offre)
+
+    cv_hash = cv_hash or hash_contenu(cv_source)
+    magasin_cv.acquerir(cv_hash, session_id)
+
+    def _extraire():
+        if cv_name.lower().endswith(".pdf"):
+            return extraire_texte_pdf(cv_source)
+        return extraire_texte_docx(cv_source)
+
+    # 1. Texte CV (extrait une seule fois par contenu)
+    cv_text, cv_text_path = magasin_cv.artefact(cv_hash, "cv_original.txt", _extraire)
+    avertissements += preflight.verifier_texte(cv_text)
+    if verif_url is not None:
+        avertissements += verif_url.result()
     
-    # 2. Scraping Offre
-    offre_text = extraire_offre_depuis_url(url_offre)
+    # 2. Scraping + analyse de l'offre (cache partagé, une seule requête par offre)
+    # Pas d'échéance ici : le calcul est partagé avec les autres requêtes sur la même offre
+    offre = analyser_offre(url_offre=url_offre)
+    analyse_offre = offre["analyse"]
+    verifier_echeance(echeance)
     
     # 3. Appels IA & Sauvegardes
-    analyse_offre = safe_json_load(appeler_mistral(prompt_analyse_offre(offre_text))) or {}
     analyse_path = save_json_to_disk(analyse_offre, session_id, "analyse_offre")
+
+    # Score ATS local (couverture des mots-clés, quelques ms, sans LLM)
+    score_ats = scorer_cv(cv_text, analyse_offre)
+    score_ats_path = save_json_to_disk(score_ats, session_id, "score_ats_original")
     
-    # Évaluation avec validation
-    eval_raw = appeler_mistral(prompt_evaluer_cv(cv_text, analyse_offre))
-    eval_parsed = safe_json_load(eval_raw)
-    eval_orig = validate_evaluation_json(eval_parsed or {})
+    # Évaluation rapide (score ATS local) affichée tout de suite ; l'évaluation Mistral suit en fond
+    eval_orig = validate_evaluation_json(_evaluation_locale(score_ats))
     eval_path = save_json_to_disk(eval_orig, session_id, "evaluation_original")
+    echeance_eval = Echeance(DELAI_API, priorite="analyse", session=session_id)
+    with _evaluations_lock:
+        _evaluations_en_cours[session_id] = (
+            executeur_fond.submit(_evaluer_en_fond, cv_text, analyse_offre, eval_path, eval_orig["score"], echeance_eval),
+            echeance_eval)
     
-    # Extraction expériences
-    
-    exp_json = safe_json_load(appeler_mistral(prompt_extraire_experiences(cv_text)))
-    exps = exp_json.get('experiences', []) if isinstance(exp_json, dict) else []
-    exps_readable = [f"{e.get('poste')} @ {e.get('employeur')}" for e in exps]
-    exps_path = save_json_to_disk(exps_readable, session_id, "experiences_list")
+    # Extraction expériences (indépendante de l'offre → partagée)
+    # Pas d'échéance ici non plus : l'artefact est partagé par toutes les requêtes sur ce CV
+    verifier_annulation(echeance)
+    # Extraction vide (parseur et Mistral bredouilles) : pas mémoïsée, le prochain upload réessaie
+    _, exps_path = magasin_cv.artefact(cv_hash, "experiences_list.json", lambda: _experiences_contexte(cv_text),
+                                       memoriser=bool)
+    verifier_echeance(echeance)
 
     # On ne retourne QUE des chemins (session légère)
     return {
+        'cv_hash': cv_hash,
         'cv_text_path': cv_text_path, 
         'analyse_offre_path': analyse_path,
         'evaluation_original_path': eval_path,
+        'score_ats_path': score_ats_path,
         'experiences_path': exps_path,
         'url_offre': url_offre,
-        'score_initial': eval_orig.get('score', 0)
+        'offre_hash': offre["hash"],
+        'score_initial': eval_orig.get('score', 0),
+        'avertissements': avertissements,
+        'degradations': list(echeance.degradations) if echeance is not None else []
     }
 
-def phase_2_optimisation(data, session_id):
-    """Phase 2 : Optimisation & Sauvegarde disque - VERSION ROBUSTE"""
+def obtenir_embedding_cv(data):
+    """Embedding du CV de la session, calculé une fois par contenu."""
+    cv_text = get_large_text_from_disk(data.get('cv_text_path'))
+    if not data.get('cv_hash'):
+        return encoder_cv(cv_text)
+    emb, _ = magasin_cv.artefact(data['cv_hash'], "embedding.npy", lambda: encoder_cv(cv_text))
+    return emb
+
+def _contact_info(contact):
+    return " | ".join(v for v in [contact["telephone"], contact["email"], *contact["liens"]] if v)
+
+def generer_cv_par_sections(cv_text, analyse_offre, contexte_rag="Standard", recos=(), echeance=None):
+    """
+    Génère cv_optimise_complet en appels courts et concurrents (sous limiteur_mistral) :
+    résumé, tâches de chaque expérience, compétences techniques et soft skills.
+    Les postes (intitulé, employeur, dates) sont repris du parseur local, ainsi que l'en-tête
+    et la formation quand le parseur les a trouvés : la confiance ne porte que sur les
+    expériences, donc un nom / des coordonnées ou une formation absents du résultat local
+    alors que le texte en contient sont redemandés au LLM (sections entete / formation).
+    La durée est celle de la section la plus longue, pas de la sortie totale.
+    Les sections non terminées à l'échéance gardent leur contenu original (dégradation notée).
+
+    Returns
+    -------
+    (json, brut) comme appeler_mistral_json(..., avec_brut=True), ou None si le parseur
+    n'est pas assez fiable pour découper le CV (prompt unique dans ce cas)
+    """
+    analyse = analyser_cv(cv_text)
+    if analyse["confiance"] < SEUIL_CONFIANCE or not analyse["experiences"]:
+        return None
+    sections = analyse["sections"]
+    experiences = analyse["experiences"]
+    recos = list(recos)
+
+    travaux = {
+        "resume": (prompt_section_resume(" ".join(sections.get("resume", [])), experiences,
+                                         analyse_offre, contexte_rag, recos), "section_resume"),
+        "competences": (prompt_section_competences(", ".join(sections.get("competences", [])), cv_text,
+                                                   analyse_offre), "section_competences"),
+        "soft_skills": (prompt_section_soft_skills(cv_text, analyse_offre), "section_soft_skills"),
+    }
+    for i, exp in enumerate(experiences):
+        travaux[f"experience_{i}"] = (prompt_section_taches(exp, analyse_offre, recos), "section_taches")
+    contact = analyse["contact"]
+    if not contact["nom"] or (not _contact_info(contact) and (EMAIL.search(cv_text) or TELEPHONE.search(cv_text))):
+        travaux["entete"] = (prompt_section_entete(cv_text), "section_entete")
+    if not analyse["formation"] and (sections.get("formation") or DIPLOME.search(cv_text) or ECOLE.search(cv_text)):
+        travaux["formation"] = (prompt_section_formation("\n".join(sections.get("formation", [])), cv_text),
+                                "section_formation")
+
+    durees = {}
+
+    def _section(nom, prompt, schema):
+        verifier_echeance(echeance)
+        debut = time.perf_counter()
+        try:
+            return appeler_mistral_json(prompt, schema, echeance=echeance)
+        finally:
+            durees[nom] = round((time.perf_counter() - debut) * 1000)
+
+    t0 = time.perf_counter()
+    resultats, erreurs = {}, {}
+    pool = ThreadPoolExecutor(max_workers=len(travaux), thread_name_prefix="aria-sections")
+    try:
+        futures = {nom: pool.submit(_section, nom, prompt, schema) for nom, (prompt, schema) in travaux.items()}
+        for nom, fut in futures.items():
+            try:
+                res = fut.result(timeout=echeance.delai() if echeance is not None else None)
+                resultats[nom] = res if isinstance(res, dict) else {}
+            except AttenteExpiree:
+                erreurs[nom] = DelaiDepasse()
+            except Exception as e:
+                erreurs[nom] = e
+    finally:
+        # Sans attendre les sections en retard : elles s'arrêtent d'elles-mêmes sur l'échéance
+        pool.shutdown(wait=False, cancel_futures=True)
+    verifier_annulation(echeance)
+    hors_delai = [nom for nom, e in erreurs.items() if isinstance(e, DelaiDepasse)]
+    if len(erreurs) == len(travaux) and not hors_delai:
+        raise next(iter(erreurs.values()))
+    if hors_delai:
+        echeance.degrader("generation", f"{len(hors_delai)}/{len(travaux)} section(s) non réécrite(s) à temps : "
+                                        "contenu original conservé")
+    elif erreurs:
+        print(f"[WARNING] Sections non générées (contenu original conservé) : {sorted(erreurs)}")
+
+    resume = resultats.get("resume", {}).get("resume")
+    competences = resultats.get("competences", {})
+    entete = resultats.get("entete", {})
+    formation = resultats.get("formation", {}).get("formation")
+    cv_base = {
+        "entete": {"prenom_nom": contact["nom"] or entete.get("prenom_nom") or "",
+                   "contact_info": _contact_info(contact) or entete.get("contact_info") or ""},
+        "resume": resume if isinstance(resume, str) and resume else " ".join(sections.get("resume", [])),
+        "experiences": [
+            {
+                "poste": exp["poste"],
+                "entreprise": exp["employeur"],
+                "dates": exp["dates"],
+                "taches": resultats.get(f"experience_{i}", {}).get("taches") or exp["taches"],
+            }
+            for i, exp in enumerate(experiences)
+        ],
+        "formation": analyse["formation"] or [f for f in formation or [] if isinstance(f, dict)],
+        "competences_techniques": competences.get("competences_techniques") or ", ".join(sections.get("competences", [])),
+        "soft_skills": resultats.get("soft_skills", {}).get("soft_skills") or "",
+        "langues": ", ".join(sections.get("langues", [])),
+        "certifications": ", ".join(sections.get("certifications", [])),
+        "interets": ", ".join(sections.get("interets", [])),
+    }
+    js = {"cv_optimise_complet": cv_base, "competences_suggerees": competences.get("competences_suggerees") or []}
+
+    # Validation du document fusionné (une section mal typée est redemandée seule, s'il reste du temps)
+    if champs_manquants(js, SCHEMAS["cv_optimise"]) and not (echeance is not None and echeance.expiree):
+        js = completer_champs(js, SCHEMAS["cv_optimise"],
+                              prompt_generer_cv_optimise(cv_text, [], analyse_offre, contexte_rag, recos),
+                              lambda p: appeler_mistral(p, echeance))
+    total = round((time.perf_counter() - t0) * 1000)
+    print(f"[GENERATION] {len(travaux)} sections en {total} ms (plus longue : {max(durees.values(), default=0)} ms)")
+    return js, json.dumps(js, ensure_ascii=False)
+
+def generer_cv_optimise(cv_text, exps_list, analyse_offre, contexte_rag, recos, echeance=None, repli_original=True):
+    """
+    CV optimisé (json, brut) : sections parallèles si le parseur est fiable, sinon prompt unique.
+    Échéance dépassée sans aucun résultat : (None, CV original) avec la dégradation notée si
+    repli_original (parcours web), sinon DelaiDepasse est propagée (API : réponse 504).
+    """
+    try:
+        resultat = generer_cv_par_sections(cv_text, analyse_offre, contexte_rag, recos, echeance)
+        if resultat is not None:
+            return resultat
+        print("[GENERATION] CV non découpable localement : génération en un seul appel")
+        return appeler_mistral_json(prompt_generer_cv_optimise(cv_text, exps_list, analyse_offre, contexte_rag, recos),
+                                    "cv_optimise", avec_brut=True, echeance=echeance)
+    except DelaiDepasse:
+        if not repli_original:
+            raise
+        echeance.degrader("generation", "délai dépassé : CV original conservé")
+        return None, cv_text
+
+def phase_2_optimisation(data, session_id, echeance=None):
+    """Phase 2 : Optimisation & Sauvegarde disque - VERSION ROBUSTE
+    (`echeance` : délai de la requête / annulation, le RAG est sauté s'il ne reste pas assez de temps)"""
     # Chargement des données du disque
+    # (recommandations : celles de l'évaluation Mistral, attendue si elle tourne encore)
+    attendre_evaluation(session_id, echeance)
+    verifier_echeance(echeance)
     cv_text = get_large_text_from_disk(data.get('cv_text_path'))
     analyse_offre = get_json_from_disk(data.get('analyse_offre_path'))
     eval_orig = get_json_from_disk(data.get('evaluation_original_path'))
-    exps_readable = get_json_from_disk(data.get('experiences_path'))
+    exps_readable = get_json_from_disk(data.get('experiences_path')) or []
 
     if not cv_text:
         raise Exception("CV original introuvable sur disque.")
@@ -521,16 +944,27 @@ def phase_2_optimisation(data, session_id):
     else:
         recos = []
 
-    # RAG avec gestion d'erreur
-    try:
-        rag = rag_retrieval_sbbert(cv_text, analyse_offre, "Tous_les_CVs")
-    except Exception as e:
-        print(f"[WARNING] RAG échoué: {e}")
-        rag = ""
-
-    # Appel Mistral avec prompt robuste
-    raw = appeler_mistral(prompt_generer_cv_optimise(cv_text, exps_readable, analyse_offre, rag, recos))
-    js = safe_json_load(raw)
+    # RAG (optionnel) : borné par ARIA_BUDGET_RAG et sauté s'il ne reste pas assez de temps
+    verifier_annulation(echeance)
+    rag = ""
+    if echeance is not None and not echeance.permet(BUDGET_RAG):
+        echeance.degrader("rag", "temps insuffisant : exemples du corpus non utilisés")
+    else:
+        try:
+            calcul = executeur_fond.submit(rag_retrieval_sbbert, cv_text, analyse_offre, "Tous_les_CVs",
+                                           job_emb=embedding_offre(data, analyse_offre))
+            rag = calcul.result(timeout=echeance.delai(BUDGET_RAG) if echeance is not None else None)
+        except AttenteExpiree:
+            echeance.degrader("rag", "délai dépassé : exemples du corpus non utilisés")
+        except Exception as e:
+            print(f"[WARNING] RAG échoué: {e}")
+
+    # Génération par sections parallèles (prompt unique si le CV n'est pas découpable)
+    # Réparation locale + complétion des seuls champs manquants (pas de régénération complète)
+    verifier_annulation(echeance)
+    js, raw = generer_cv_optimise(cv_text, exps_readable, analyse_offre, rag, recos, echeance)
+    verifier_annulation(echeance)
+    data['degradations_optimisation'] = list(echeance.degradations) if echeance is not None else []
 
     if js:
         # Extraire le CV optimisé selon la structure attendue
@@ -560,51 +994,287 @@ def phase_2_optimisation(data, session_id):
 
     return data
 
-def phase_alternatives(cv_text):
-    return appeler_mistral(prompt_suggerer_alternatives(cv_text))
+def phase_2_session(data, session_id, echeance=None):
+    """
+    Phase 2 au clic « Optimiser » : reprend le calcul spéculatif (terminé ou en cours),
+    sinon calcule avec le temps restant.
+    Le travail repris est promu à la priorité et au délai de la requête : à l'échéance il se
+    dégrade lui-même (sections déjà générées conservées). On l'attend donc jusqu'à l'échéance
+    plus MARGE_REPRISE_PHASE_2, au lieu de l'abandonner pour tout recalculer sans temps restant.
+    Le recalcul ne sert que s'il a échoué (ou n'a pas été lancé).
+    """
+    speculateur.annuler(session_id, "alternatives")
+    attente = echeance.delai() + MARGE_REPRISE_PHASE_2 if echeance is not None and echeance.restant() is not None else None
+    resultat = speculateur.recuperer(session_id, "phase_2", timeout=attente, echeance=echeance)
+    if resultat is None:
+        return phase_2_optimisation(data, session_id, echeance)
+    data.update(resultat)
+    return data
+
+def speculer_suite(session_id, data):
+    """
+    Après l'étape 1 : phase 2 puis alternatives lancées en fond pendant que l'utilisateur
+    lit le diagnostic (dans la limite du budget global, la phase 2 d'abord).
+    Chaque travail reçoit une copie des données : la session n'est modifiée qu'au clic.
+    """
+    speculateur.annuler(session_id)
+    speculateur.lancer(session_id, "phase_2", phase_2_optimisation, dict(data), session_id)
+    speculateur.lancer(session_id, "alternatives", prechauffer_alternatives, dict(data))
+
+def scorer_cv_optimise(data, session_id):
+    """Score ATS local du CV optimisé courant (recalculé seulement si le CV a changé)."""
+    source = data.get('optimized_cv_path')
+    if data.get('score_ats_optimise_source') == source and data.get('score_ats_optimise_path'):
+        return get_json_from_disk(data['score_ats_optimise_path'])
+
+    analyse_offre = get_json_from_disk(data.get('analyse_offre_path'))
+    resultat = scorer_cv(get_large_text_from_disk(source), analyse_offre)
+    data['score_ats_optimise_path'] = save_json_to_disk(resultat, session_id, "score_ats_optimise")
+    data['score_ats_optimise_source'] = source
+    return resultat
+
+def evaluation_finale(data, session_id):
+    """Évaluation du CV optimisé pour l'étape 5 : vrai re-scoring local, sans appel LLM."""
+    avant = get_json_from_disk(data.get('score_ats_path'))
+    apres = scorer_cv_optimise(data, session_id)
+
+    deja_couverts = {c["mot_cle"] for c in avant.get("couverture", []) if c.get("trouve")}
+    gagnes = [c["mot_cle"] for c in apres.get("couverture", [])
+              if c.get("trouve") and c["mot_cle"] not in deja_couverts]
+
+    return {
+        "score": apres.get("score", 0),
+        "score_initial": avant.get("score", 0),
+        "verdict_court": f"Couverture ATS : {avant.get('score', 0)} → {apres.get('score', 0)}/100",
+        "force_ajoutee": ("Mots-clés ATS ajoutés : " + ", ".join(gagnes[:6])) if gagnes else "",
+        "encore_absents": ("Encore absents : " + ", ".join(apres["manquants"][:6])) if apres.get("manquants") else "",
+        "couverture": apres.get("couverture", []),
+    }
+
+def enregistrer_cv_modifie(data, texte, session_id, version):
+    """
+    Enregistre le CV modifié par le chatbot (étape 5) et resynchronise sa structure JSON,
+    lue par comparer_versions, l'affichage structuré et les exports.
+    Si la mise en page de texte_cv n'est plus reconnue, le CV reste en texte seul
+    (optimized_cv_json_path = None, comme le repli de generer_cv_optimise).
+    """
+    data['optimized_cv_path'] = save_text_to_disk(texte, session_id, f"cv_optimise_v{version}")
+    ancien = get_json_from_disk(data.get('optimized_cv_json_path'))
+    cv = lire_texte_cv(texte, CV.depuis_json(ancien) if ancien else None)
+    if cv is None:
+        print("[WARNING] CV modifié hors mise en page : structure JSON abandonnée")
+        data['optimized_cv_json_path'] = None
+    else:
+        data['optimized_cv_json_path'] = save_json_to_disk(cv.vers_json(), session_id, f"cv_optimise_json_v{version}")
+
+def comparer_versions(data):
+    """Diff structurel local original -> optimisé pour le panneau de l'étape 5 (sans LLM)."""
+    cv_json = get_json_from_disk(data.get('optimized_cv_json_path'))
+    if not cv_json:
+        return {"modifications_apportes": []}
+    analyse_offre = get_json_from_disk(data.get('analyse_offre_path'))
+    mots_cles = analyse_offre.get('mots_cles_ats', []) + analyse_offre.get('competences_cles', [])
+    return comparer_cv(get_large_text_from_disk(data.get('cv_text_path')), cv_json, mots_cles)
+
+def phase_alternatives(cv_text, echeance=None):
+    return appeler_mistral(prompt_suggerer_alternatives(cv_text), echeance)
+
+NB_VOISINS_ALTERNATIVES = 15
+ALTERNATIVES_BACKOFF = 60          # secondes avant un nouvel essai LLM après un échec (doublé à chaque essai)
+ALTERNATIVES_BACKOFF_MAX = 3600
+_alternatives_en_cours = {}
+_alternatives_lock = threading.Lock()
+
+def alternatives_locales(data, k=3):
+    """Réponse immédiate : titres de poste des CVs du corpus les plus proches (index RAG)."""
+    index = charger_index()
+    if index is None:
+        return []
+    voisins = plus_proches_corpus(obtenir_embedding_cv(data), NB_VOISINS_ALTERNATIVES)
+    votes = Counter()
+    libelles = {}
+    for i, sim in voisins:
+        titre = index.documents[i].get("titre", "")
+        cle = re.sub(r"\W+", " ", titre.lower()).strip()
+        if cle:
+            votes[cle] += sim
+            libelles.setdefault(cle, titre)
+    return [libelles[c] for c, _ in votes.most_common(k)]
+
+def _raffiner_alternatives(cv_hash, cv_text, echeance=None):
+    """
+    Appel LLM en tâche de fond (priorité basse), mémoïsé par hash de CV.
+    En cas d'échec (clé absente, erreur Mistral, appel refusé par l'ordonnanceur),
+    un marqueur {"alternatives": [], "erreur", "ts", "essais"} est mémoïsé à la place :
+    l'étape 4 cesse d'attendre et un nouvel essai n'a lieu qu'après le délai de _attente_nouvel_essai.
+    """
+    echeance = echeance or Echeance(priorite="fond", session=cv_hash)
+    precedent = magasin_cv.lire(cv_hash, "alternatives.json") or {}
+    try:
+        js = safe_json_load(phase_alternatives(cv_text, echeance), "alternatives") or {}
+        magasin_cv.ecrire(cv_hash, "alternatives.json", {"alternatives": list(js.get("alternatives", []))})
+    except TravailAnnule:
+        pass  # spéculation abandonnée : pas un échec, le calcul reprendra à l'étape 4
+    except Exception as e:
+        print(f"[WARNING] Alternatives LLM échouées: {e}")
+        magasin_cv.ecrire(cv_hash, "alternatives.json", {
+            "alternatives": [], "erreur": str(e), "ts": time.time(), "essais": precedent.get("essais", 0) + 1})
+    finally:
+        with _alternatives_lock:
+            _alternatives_en_cours.pop(cv_hash, None)
+
+def _attente_nouvel_essai(memo):
+    """Secondes avant de retenter le LLM après un échec mémoïsé (backoff exponentiel borné)."""
+    return min(ALTERNATIVES_BACKOFF_MAX, ALTERNATIVES_BACKOFF * 2 ** (memo.get("essais", 1) - 1))
+
+def prechauffer_alternatives(data, echeance=None):
+    """Pré-calcul spéculatif de l'étape 4 : réponse locale puis raffinement LLM, mémoïsés par CV."""
+    cv_hash = data.get('cv_hash')
+    if not cv_hash or magasin_cv.lire(cv_hash, "alternatives.json") is not None:
+        return
+    if magasin_cv.lire(cv_hash, "alternatives_locales.json") is None:
+        locales = alternatives_locales(data)
+        if locales:
+            magasin_cv.artefact(cv_hash, "alternatives_locales.json", lambda: locales)
+    verifier_annulation(echeance)
+    with _alternatives_lock:
+        if cv_hash in _alternatives_en_cours:
+            return
+        _alternatives_en_cours[cv_hash] = "speculation"
+    _raffiner_alternatives(cv_hash, get_large_text_from_disk(data.get('cv_text_path')), echeance)
+
+def alternatives_cv(data, echeance=None):
+    """
+    Pistes alternatives pour l'étape 4, sans bloquer l'affichage.
+    Retourne {"alternatives": [...], "source": "llm" | "local", "en_attente": bool} :
+    la réponse LLM mémoïsée si elle existe, sinon la réponse locale immédiate
+    pendant que le raffinement LLM tourne en fond (une seule fois par CV).
+    Après un échec mémoïsé, en_attente est False : le nouvel essai (après backoff)
+    se fait en fond sans faire recharger la page.
+    """
+    cv_hash = data.get('cv_hash')
+    cv_text = get_large_text_from_disk(data.get('cv_text_path'))
+    if not cv_hash:
+        try:
+            js = safe_json_load(phase_alternatives(cv_text, echeance), "alternatives") or {}
+            return {"alternatives": js.get("alternatives", []), "source": "llm", "en_attente": False}
+        except DelaiDepasse:
+            echeance.degrader("alternatives", "délai dépassé : pistes issues des profils proches")
+            return {"alternatives": alternatives_locales(data), "source": "local", "en_attente": False}
+
+    memo = magasin_cv.lire(cv_hash, "alternatives.json")
+    if memo is None or ("erreur" in memo and time.time() - memo.get("ts", 0) >= _attente_nouvel_essai(memo)):
+        with _alternatives_lock:
+            if cv_hash not in _alternatives_en_cours:
+                _alternatives_en_cours[cv_hash] = executeur_fond.submit(_raffiner_alternatives, cv_hash, cv_text)
+    elif memo.get("alternatives"):
+        return {"alternatives": memo["alternatives"], "source": "llm", "en_attente": False}
+
+    locales = magasin_cv.lire(cv_hash, "alternatives_locales.json")
+    if locales is None:
+        locales = alternatives_locales(data)
+        if locales:  # pas de mémo vide : l'index peut être construit plus tard
+            magasin_cv.artefact(cv_hash, "alternatives_locales.json", lambda: locales)
+    return {"alternatives": locales, "source": "local", "en_attente": memo is None}
 # ==========================
 # FONCTION PONT (Pour compatibilité main.py)
 # ==========================
+def _analyse_offre_texte(job_description, echeance=None):
+    """Analyse JSON d'une offre collée en texte ({} si absente).
+    L'analyse est partagée (cache des offres) : l'échéance n'est vérifiée qu'après."""
+    if not job_description:
+        return {}
+    analyse = analyser_offre(texte_offre=job_description)["analyse"] or {}
+    verifier_echeance(echeance)
+    return analyse
+
+
+def _generer_cv_rapide(cv_text, exps_list, analyse, echeance=None):
+    """Génération du CV optimisé sans RAG ni recommandations (mode rapide).
+    Sans repli sur le CV original : un délai dépassé remonte à l'API (504)."""
+    return generer_cv_optimise(cv_text, exps_list, analyse, contexte_rag="Standard", recos=[], echeance=echeance,
+                               repli_original=False)
+
+async def processing_evenements(cv_text, job_description="", echeance=None):
+    """
+    Version asynchrone de processing, sous forme d'événements (mode streaming de /api/optimize).
+    L'analyse de l'offre et l'extraction des expériences tournent en parallèle ; chaque
+    phase est émise dès qu'elle est terminée, avec sa durée, puis le résultat final.
+    echeance : Echeance(DELAI_API) par défaut ; annulée si le consommateur s'arrête
+    avant le résultat (client déconnecté), ce qui arrête les appels Mistral en cours.
+    """
+    t0 = time.perf_counter()
+    timings = {}
+    echeance = echeance or Echeance(DELAI_API)
+    termine = False
+
+    async def phase(nom, fn, *args):
+        debut = time.perf_counter()
+        res = await asyncio.to_thread(fn, *args, echeance)
+        timings[nom] = round((time.perf_counter() - debut) * 1000)
+        return nom, res
+
+    resultats = {"analyse_offre": {}, "experiences": []}
+    taches = [asyncio.ensure_future(phase("experiences", _experiences_contexte, cv_text))]
+    if job_description:
+        taches.append(asyncio.ensure_future(phase("analyse_offre", _analyse_offre_texte, job_description)))
+    try:
+        try:
+            for prochaine in asyncio.as_completed(taches):
+                nom, res = await prochaine
+                resultats[nom] = res
+                yield {"event": nom, "data": res, "duree_ms": timings[nom]}
+        finally:
+            for tache in taches:
+                tache.cancel()
+
+        _, (json_result, resultat_mistral) = await phase(
+            "generation", _generer_cv_rapide, cv_text, resultats["experiences"], resultats["analyse_offre"])
+        timings["total"] = round((time.perf_counter() - t0) * 1000)
+        print(f"[API] processing en {timings['total']} ms {timings}")
+        termine = True
+
+        yield {
+            "event": "resultat",
+            "optimized_text": json_cv_to_text(json_result) if json_result else resultat_mistral,
+            "cv_optimise": json_result,
+            "analyse_offre": resultats["analyse_offre"],
+            "experiences": resultats["experiences"],
+            "timings": timings,
+            "degradations": list(echeance.degradations),
+        }
+    finally:
+        if not termine:
+            echeance.annuler()
+
+async def processing_async(cv_text, job_description="", echeance=None):
+    """Résultat final de processing_evenements (réponse JSON de /api/optimize)."""
+    resultat = None
+    async for evenement in processing_evenements(cv_text, job_description, echeance):
+        resultat = evenement
+    resultat.pop("event", None)
+    return resultat
+
 def processing(cv_text, job_description=""):
     """
     Fonction wrapper qui connecte l'ancien main.py au nouveau moteur logique.
     """
     print(f"DEBUG: Processing appelé avec {len(cv_text)} caractères")
-    
+
     try:
-        # 1. Analyse de l'offre (si présente)
-        analyse = {}
-        if job_description:
-            print("DEBUG: Analyse de l'offre en cours...")
-            raw_analyse = appeler_mistral(prompt_analyse_offre(job_description))
-            analyse = safe_json_load(raw_analyse) or {}
-
-        # 2. Extraction rapide des expériences (pour le contexte)
-        print("DEBUG: Extraction expériences...")
-        raw_exps = appeler_mistral(prompt_extraire_experiences(cv_text))
-        exp_json = safe_json_load(raw_exps)
-        exps_list = []
-        if exp_json and 'experiences' in exp_json:
-             exps_list = [f"{e.get('poste', '')} @ {e.get('employeur', '')}" for e in exp_json['experiences']]
+        # 1 + 2. Analyse de l'offre et extraction des expériences en parallèle
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            f_analyse = pool.submit(_analyse_offre_texte, job_description)
+            f_exps = pool.submit(_experiences_contexte, cv_text)
+            analyse, exps_list = f_analyse.result(), f_exps.result()
 
         # 3. Génération du CV Optimisé
-        print("DEBUG: Génération du CV optimisé...")
-        # On utilise des valeurs par défaut pour RAG et Recos pour ce mode rapide
-        prompt_final = prompt_generer_cv_optimise(
-            cv_text, 
-            exps_list, 
-            analyse, 
-            contexte_rag="Standard", 
-            recos=[]
-        )
-        
-        resultat_mistral = appeler_mistral(prompt_final)
-        
+        json_result, resultat_mistral = _generer_cv_rapide(cv_text, exps_list, analyse)
+
         # 4. Conversion en texte propre pour l'affichage
-        json_result = safe_json_load(resultat_mistral)
         if json_result:
             return json_cv_to_text(json_result)
-        
+
         return resultat_mistral
 
     except Exception as e:
@@ -1,16 +1,23 @@
 import os
 import uuid
 import json
-from typing import Optional
+import asyncio
+import hashlib
+from typing import Optional, List
 
 from fastapi import FastAPI, Request, UploadFile, File, Form, Response
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, StreamingResponse
+from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
+from pydantic import BaseModel
 
 # Import de votre logique métier
 from app import logic
+from app import profilage
+from app import matching
 
 # Création de l'application
 app = FastAPI(title="Aria CV Coach")
@@ -35,6 +42,65 @@ SESSIONS_DB = {}
 # Remplacez "secret-key" par une vraie clé secrète aléatoire
 app.add_middleware(SessionMiddleware, secret_key="votre_cle_secrete_super_securisee")
 
+# Le frontend Next.js (autre origine) appelle l'API JSON /api/optimize
+CORS_ORIGINS = [o.strip() for o in os.environ.get("ARIA_CORS_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["*"],
+)
+
+# Limites d'upload : le CV est lu par blocs dans le fichier temporaire de Starlette
+# (déjà en mémoire ou sur disque selon sa taille : pas de seconde copie)
+MAX_UPLOAD_BYTES = int(os.environ.get("ARIA_MAX_UPLOAD_MB", "10")) * 1024 * 1024
+UPLOAD_CHUNK = 64 * 1024
+MSG_UPLOAD_TROP_LOURD = f"Fichier trop volumineux (max {MAX_UPLOAD_BYTES // (1024 * 1024)} Mo)."
+
+MAX_RAFRAICHISSEMENTS_STEP2 = 15    # rechargements auto de l'étape 2 (toutes les 4 s) en attendant l'évaluation LLM
+MAX_RAFRAICHISSEMENTS_STEP4 = 15    # rechargements auto de l'étape 4 (toutes les 4 s) en attendant le LLM
+
+@app.middleware("http")
+async def limiter_taille_upload(request: Request, call_next):
+    """Refuse les uploads trop lourds dès l'en-tête, avant de lire le corps."""
+    if request.method == "POST" and request.url.path == "/step1":
+        taille = request.headers.get("content-length")
+        # Marge pour l'enveloppe multipart et le champ url_offre
+        if taille and taille.isdigit() and int(taille) > MAX_UPLOAD_BYTES + 64 * 1024:
+            return HTMLResponse(MSG_UPLOAD_TROP_LOURD, status_code=413)
+    return await call_next(request)
+
+@app.middleware("http")
+async def profiler_requete(request: Request, call_next):
+    """Profilage à la demande (en-tête X-Aria-Profil ou ARIA_PROFILAGE_TAUX) : voir profilage.py."""
+    if request.url.path.startswith(("/static", "/admin")) or not profilage.doit_profiler(request.headers):
+        return await call_next(request)
+    profil = profilage.demarrer(f"{request.method} {request.url.path}")
+    if profil is None:
+        return await call_next(request)
+
+    def terminer(statut):
+        profil.session = request.scope.get("session", {}).get("uid")
+        return profilage.terminer(profil, statut)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        await run_in_threadpool(terminer, 500)
+        raise
+
+    # call_next renvoie toujours une réponse en flux : le profil couvre aussi la production du corps
+    corps = response.body_iterator
+
+    async def corps_profile():
+        try:
+            async for morceau in corps:
+                yield morceau
+        finally:
+            await run_in_threadpool(terminer, response.status_code)
+    response.body_iterator = corps_profile()
+    return response
+
 # ==============================================================================
 # UTILITAIRES DE SESSION
 # ==============================================================================
@@ -62,6 +128,46 @@ def get_session_data(request: Request):
         return None
     return SESSIONS_DB[uid]
 
+async def stocker_upload(cv_file: UploadFile):
+    """Lit l'upload par blocs en appliquant la taille max et en calculant son hash SHA-256.
+    Retourne (fichier, hash) : le fichier est celui que Starlette a déjà spoolé, rembobiné."""
+    if cv_file.size is not None and cv_file.size > MAX_UPLOAD_BYTES:
+        raise Exception(MSG_UPLOAD_TROP_LOURD)
+
+    empreinte = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = await cv_file.read(UPLOAD_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > MAX_UPLOAD_BYTES:
+            raise Exception(MSG_UPLOAD_TROP_LOURD)
+        empreinte.update(chunk)
+    await cv_file.seek(0)
+    return cv_file.file, empreinte.hexdigest()
+
+# Intervalle de vérification de la connexion du client pendant un calcul long
+INTERVALLE_DECONNEXION = 0.5
+
+async def surveiller_deconnexion(request: Request, echeance):
+    """Annule l'échéance dès que le client se déconnecte (onglet fermé, requête abandonnée)."""
+    while not echeance.annulee:
+        if await request.is_disconnected():
+            print(f"[ECHEANCE] Client déconnecté : {request.url.path} annulé")
+            echeance.annuler()
+            return
+        await asyncio.sleep(INTERVALLE_DECONNEXION)
+
+async def executer_avec_echeance(request: Request, echeance, fn, *args):
+    """Exécute fn(*args, echeance=echeance) hors de la boucle asyncio en surveillant la connexion :
+    si le client part, les appels Mistral en cours s'arrêtent au lieu de tourner pour rien."""
+    surveillance = asyncio.ensure_future(surveiller_deconnexion(request, echeance))
+    try:
+        return await run_in_threadpool(fn, *args, echeance=echeance)
+    finally:
+        surveillance.cancel()
+
 # ==============================================================================
 # ROUTES (ÉTAPES 1 à 5)
 # ==============================================================================
@@ -75,7 +181,7 @@ async def root(request: Request):
 @app.get("/step1", response_class=HTMLResponse)
 async def step1_upload(request: Request):
     ensure_session(request)
-    return templates.TemplateResponse("step1_upload.html", {"request": request, "step": 1})
+    return templates.TemplateResponse(request, "step1_upload.html", {"request": request, "step": 1})
 
 @app.post("/step1", response_class=HTMLResponse)
 async def handle_upload(
@@ -84,28 +190,38 @@ async def handle_upload(
     url_offre: str = Form(...)
 ):
     uid = ensure_session(request)
+    # Nouvelle analyse : les pré-calculs de l'analyse précédente sont caducs
+    logic.speculateur.annuler(uid)
     
+    spool = None
     try:
-        # Lecture du fichier
-        file_bytes = await cv_file.read()
+        # Lecture du fichier par blocs (jamais entièrement en mémoire)
+        spool, cv_hash = await stocker_upload(cv_file)
         filename = cv_file.filename
         
-        # Appel à la logique (Phase 1)
+        # Appel à la logique (Phase 1), hors de la boucle asyncio
         # Note : logic.phase_1_analyse sauvegarde sur disque et renvoie des chemins
-        resultats_analyse = logic.phase_1_analyse(file_bytes, filename, url_offre, uid)
+        resultats_analyse = await executer_avec_echeance(
+            request, logic.Echeance(logic.DELAI_PHASE_1, session=uid), logic.phase_1_analyse, spool, filename, url_offre, uid, cv_hash)
         
         # Mise à jour de la session
         SESSIONS_DB[uid]["data"].update(resultats_analyse)
         SESSIONS_DB[uid]["step"] = 2
+
+        # Phase 2 et alternatives démarrent pendant la lecture du diagnostic
+        logic.speculer_suite(uid, SESSIONS_DB[uid]["data"])
         
         return RedirectResponse(url="/step2", status_code=303)
         
     except Exception as e:
-        return templates.TemplateResponse("step1_upload.html", {
+        return templates.TemplateResponse(request, "step1_upload.html", {
             "request": request, 
             "step": 1, 
             "error": f"Erreur lors de l'analyse : {str(e)}"
         })
+    finally:
+        if spool is not None:
+            spool.close()
 
 # --- ÉTAPE 2 : DIAGNOSTIC ---
 @app.get("/step2", response_class=HTMLResponse)
@@ -119,20 +235,35 @@ async def step2_diagnostic(request: Request):
     # On récupère les JSON depuis le disque pour les passer au template
     analyse_offre = logic.get_json_from_disk(data.get('analyse_offre_path'))
     evaluation = logic.get_json_from_disk(data.get('evaluation_original_path'))
+    score_ats = logic.get_json_from_disk(data.get('score_ats_path'))
     
     # Construction de l'objet data complet pour le template
     display_data = {
         "analyse_offre": analyse_offre,
-        "evaluation_original": evaluation
+        "evaluation_original": evaluation,
+        "score_ats": score_ats,
+        "avertissements": data.get("avertissements", []),
+        "degradations": data.get("degradations", [])
     }
     
     score = evaluation.get("score", 0)
+
+    # Score ATS local affiché d'emblée ; rechargements bornés tant que l'évaluation Mistral tourne
+    try:
+        rafraichissements = int(request.query_params.get("r", "0"))
+    except ValueError:
+        rafraichissements = 0
+    en_attente = (logic.evaluation_en_attente(get_session_id(request))
+                  and rafraichissements < MAX_RAFRAICHISSEMENTS_STEP2)
     
-    return templates.TemplateResponse("step2_diagnostic.html", {
+    return templates.TemplateResponse(request, "step2_diagnostic.html", {
         "request": request, 
         "step": 2, 
         "data": display_data,
-        "score": score
+        "score": score,
+        "cv_deja_optimise": bool(data.get("optimized_cv_json_path")),
+        "en_attente": en_attente,
+        "rafraichissement_suivant": rafraichissements + 1
     })
 
 @app.post("/step2", response_class=HTMLResponse)
@@ -143,13 +274,16 @@ async def handle_diagnostic_decision(request: Request, decision_radio: str = For
 
     # Si l'utilisateur choisit "Alternatives"
     if "ternatives" in decision_radio:  # Match "Chercher des pistes alternatives"
+        logic.speculateur.annuler(uid, "phase_2")
+        logic.speculateur.adopter(uid, "alternatives")
         session["step"] = 4
         return RedirectResponse(url="/step4", status_code=303)
     
     # Sinon "Optimiser" (Phase 2)
     try:
-        # Appel à la logique d'optimisation
-        session["data"] = logic.phase_2_optimisation(session["data"], uid)
+        # Appel à la logique d'optimisation (résultat spéculatif s'il est prêt ou en cours)
+        session["data"] = await executer_avec_echeance(
+            request, logic.Echeance(logic.DELAI_PHASE_2, session=uid), logic.phase_2_session, session["data"], uid)
         session["step"] = 3
         return RedirectResponse(url="/step3", status_code=303)
     except Exception as e:
@@ -167,10 +301,11 @@ async def step3_optimize(request: Request):
     optimized_cv_text = logic.get_large_text_from_disk(data.get("optimized_cv_path"))
     suggestions = data.get("competences_suggerees", [])
     
-    return templates.TemplateResponse("step3_optimize.html", {
+    return templates.TemplateResponse(request, "step3_optimize.html", {
         "request": request, 
         "step": 3,
-        "data": {"optimized_cv": optimized_cv_text},
+        "data": {"optimized_cv": optimized_cv_text,
+                 "degradations": data.get("degradations_optimisation", [])},
         "sugg": suggestions
     })
 
@@ -197,26 +332,33 @@ async def step4_alternatives(request: Request):
     if not session: return RedirectResponse(url="/")
     
     data = session["data"]
-    cv_text = logic.get_large_text_from_disk(data.get("cv_text_path"))
     
-    # Génération des alternatives via Mistral
-    # On récupère le JSON brut de logic.phase_alternatives
-    alternatives_raw = logic.phase_alternatives(cv_text)
-    alternatives_json = logic.safe_json_load(alternatives_raw)
+    # Pistes alternatives : mémoïsées par CV, réponse locale immédiate
+    # pendant que le raffinement Mistral tourne en tâche de fond
+    resultat = await run_in_threadpool(logic.alternatives_cv, data)
     
     # Formatage HTML simple pour l'affichage
     html_content = "<ul>"
-    if alternatives_json and "alternatives" in alternatives_json:
-        for alt in alternatives_json["alternatives"]:
-            html_content += f"<li><strong>{alt}</strong></li>"
-    else:
-        html_content += f"<li>{alternatives_raw}</li>"
+    for alt in resultat["alternatives"]:
+        html_content += f"<li><strong>{alt}</strong></li>"
+    if not resultat["alternatives"]:
+        html_content += "<li>Aucune piste trouvée pour le moment.</li>"
     html_content += "</ul>"
+    # Rechargements automatiques bornés : la page n'attend pas indéfiniment le raffinement
+    try:
+        rafraichissements = int(request.query_params.get("r", "0"))
+    except ValueError:
+        rafraichissements = 0
+    en_attente = resultat["en_attente"] and rafraichissements < MAX_RAFRAICHISSEMENTS_STEP4
+    if en_attente:
+        html_content += "<p><em>Pistes issues de profils proches — l'analyse IA détaillée arrive…</em></p>"
 
-    return templates.TemplateResponse("step4_alternatives.html", {
+    return templates.TemplateResponse(request, "step4_alternatives.html", {
         "request": request,
         "step": 4,
-        "alternatives": html_content
+        "alternatives": html_content,
+        "en_attente": en_attente,
+        "rafraichissement_suivant": rafraichissements + 1
     })
 
 # --- ÉTAPE 5 : FINAL & CHATBOT ---
@@ -227,30 +369,23 @@ async def step5_final(request: Request):
     
     data = session["data"]
     chat_history = session["chat_history"]
+    uid = get_session_id(request)
     
     # Chargement des données complètes
     cv_json = logic.get_json_from_disk(data.get("optimized_cv_json_path"))
     cv_text = logic.get_large_text_from_disk(data.get("optimized_cv_path"))
     
-    # Recalcul du score (simulation pour l'affichage final, ou reprise de l'ancien)
-    evaluation_original = logic.get_json_from_disk(data.get('evaluation_original_path'))
-    # On booste le score artificiellement pour montrer l'amélioration (logique démo)
-    score_final = min(100, evaluation_original.get("score", 0) + 25)
+    # Re-scoring réel du CV optimisé (score ATS local, sans appel LLM)
+    evaluation_optimized = await run_in_threadpool(logic.evaluation_finale, data, uid)
     
     final_data = {
-        "evaluation_optimized": {
-            "score": score_final,
-            "verdict_court": "Profil optimisé pour l'offre",
-            "points_forts": ["Mots-clés ATS intégrés", "Structure professionnelle", "Langage orienté action"]
-        },
-        "comparaison_versions": {
-            "modifications_apportes": ["Reformulation du résumé", "Mise en avant des compétences techniques", "Correction de la structure"]
-        },
+        "evaluation_optimized": evaluation_optimized,
+        "comparaison_versions": logic.comparer_versions(data),
         "docx_path": data.get("docx_path"),
         "pdf_path": data.get("pdf_path")
     }
 
-    return templates.TemplateResponse("step5_final.html", {
+    return templates.TemplateResponse(request, "step5_final.html", {
         "request": request,
         "step": 5,
         "data": final_data,
@@ -276,18 +411,16 @@ async def handle_chatbot(request: Request, chat_input: str = Form(...)):
     # 3. Appel Mistral pour modification
     try:
         prompt_modif = logic.prompt_modification_cv(current_cv_text, chat_input)
-        response_mistral = logic.appeler_mistral(prompt_modif)
-        json_resp = logic.safe_json_load(response_mistral)
+        # Modification interactive : priorité haute dans l'ordonnanceur Mistral
+        json_resp = await executer_avec_echeance(
+            request, logic.Echeance(logic.DELAI_API, priorite="interactif", session=uid),
+            logic.appeler_mistral_json, prompt_modif, "modification_cv")
         
         bot_response = ""
         if json_resp and "cv_modifie" in json_resp:
             # Mise à jour du CV sur disque
-            new_cv_text = json_resp["cv_modifie"]
-            new_path = logic.save_text_to_disk(new_cv_text, uid, f"cv_optimise_v{len(session['chat_history'])}")
-            data["optimized_cv_path"] = new_path
-            
-            # Essayer de mettre à jour la structure JSON aussi (parsing basique)
-            # Pour simplifier, on garde le texte brut à jour principalement
+            # (texte + structure JSON relue, pour que le diff et l'affichage suivent les modifications)
+            logic.enregistrer_cv_modifie(data, json_resp["cv_modifie"], uid, len(session['chat_history']))
             
             changes = json_resp.get("changements_faits", ["Modification appliquée."])
             bot_response = "✅ " + " ".join(changes)
@@ -322,12 +455,154 @@ async def download_file(request: Request, file_type: str):
 async def reset_session(request: Request):
     uid = get_session_id(request)
     if uid and uid in SESSIONS_DB:
+        logic.speculateur.annuler(uid)
         # Nettoyage fichiers disque via logic
         logic.clean_session_files(uid)
         del SESSIONS_DB[uid]
     request.session.clear()
     return RedirectResponse(url="/", status_code=303)
 
+# ==============================================================================
+# API JSON (Frontend Next.js)
+# ==============================================================================
+
+def client_api(request: Request):
+    """Client de l'API (file équitable de l'ordonnanceur Mistral) : en-tête X-Aria-Client ou IP."""
+    return request.headers.get("x-aria-client") or (request.client.host if request.client else None)
+
+class OptimizeRequest(BaseModel):
+    cv_text: str
+    job_description: str = ""
+    stream: bool = False
+
+@app.post("/api/optimize")
+async def api_optimize(request: Request, payload: OptimizeRequest):
+    """
+    Optimisation directe d'un CV texte (sans le parcours en 5 étapes).
+    Réponse JSON : optimized_text, cv_optimise, analyse_offre, experiences, timings (ms).
+    Avec "stream": true (ou Accept: application/x-ndjson), une ligne JSON par phase terminée.
+    Budget ARIA_DELAI_API : les étapes sautées faute de temps sont listées dans "degradations" ;
+    504 si le CV n'a pas pu être généré à temps.
+    """
+    if not payload.cv_text.strip():
+        return JSONResponse({"error": "Le texte du CV est vide."}, status_code=400)
+
+    if payload.stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def flux():
+            try:
+                echeance = logic.Echeance(logic.DELAI_API, session=client_api(request))
+                async for evenement in logic.processing_evenements(payload.cv_text, payload.job_description, echeance):
+                    yield json.dumps(evenement, ensure_ascii=False) + "\n"
+            except logic.DelaiDepasse:
+                yield json.dumps({"event": "erreur", "error": "Délai dépassé.", "degradations": echeance.degradations},
+                                 ensure_ascii=False) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "erreur", "error": str(e)}, ensure_ascii=False) + "\n"
+        return StreamingResponse(flux(), media_type="application/x-ndjson")
+
+    echeance = logic.Echeance(logic.DELAI_API, session=client_api(request))
+    surveillance = asyncio.ensure_future(surveiller_deconnexion(request, echeance))
+    try:
+        return await logic.processing_async(payload.cv_text, payload.job_description, echeance)
+    except logic.DelaiDepasse:
+        return JSONResponse({"error": "Délai dépassé.", "degradations": echeance.degradations}, status_code=504)
+    except logic.ModelesIndisponibles as e:
+        print(f"[API] Modèles indisponibles /api/optimize : {e}")
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        print(f"[API] Erreur /api/optimize : {e}")
+        return JSONResponse({"error": str(e)}, status_code=502)
+    finally:
+        surveillance.cancel()
+
+class DocumentMatching(BaseModel):
+    id: Optional[str] = None
+    texte: str
+
+class MatchingRequest(BaseModel):
+    cvs: List[DocumentMatching]
+    offres: List[DocumentMatching]
+    top_k: int = 10
+    matrice: bool = False
+    stream: bool = False
+
+@app.post("/api/matching")
+async def api_matching(request: Request, payload: MatchingRequest):
+    """
+    Classement de nombreux CVs face à de nombreuses offres, sans LLM (voir matching.py).
+    Réponse JSON : par_offre (top-k CVs), par_cv (top-k offres), matrice (si demandée), timings.
+    Avec "stream": true (ou Accept: application/x-ndjson), une ligne JSON par événement :
+    progression de l'encodage, puis chaque offre et chaque CV dès que la matrice est calculée.
+    """
+    cvs = [{"id": d.id, "texte": d.texte} for d in payload.cvs]
+    offres = [{"id": d.id, "texte": d.texte} for d in payload.offres]
+    if not cvs or not offres:
+        return JSONResponse({"error": "Il faut au moins un CV et une offre."}, status_code=400)
+    if len(cvs) > matching.MAX_CV or len(offres) > matching.MAX_OFFRES:
+        return JSONResponse({"error": f"Trop de documents (max {matching.MAX_CV} CVs et {matching.MAX_OFFRES} offres)."},
+                            status_code=413)
+    doublons = matching.ids_en_double(cvs, "cv_") + matching.ids_en_double(offres, "offre_")
+    if doublons:
+        return JSONResponse({"error": f"Identifiants en double : {', '.join(doublons)}"}, status_code=400)
+    top_k = max(1, min(payload.top_k, 100))
+
+    if payload.stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def flux():
+            try:
+                async for evenement in iterate_in_threadpool(
+                        matching.evenements_matching(cvs, offres, top_k, payload.matrice)):
+                    yield json.dumps(evenement, ensure_ascii=False) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "erreur", "error": str(e)}, ensure_ascii=False) + "\n"
+        return StreamingResponse(flux(), media_type="application/x-ndjson")
+
+    try:
+        return await run_in_threadpool(matching.calculer_matching, cvs, offres, top_k, payload.matrice)
+    except logic.ModelesIndisponibles as e:
+        print(f"[API] Modèles indisponibles /api/matching : {e}")
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        print(f"[API] Erreur /api/matching : {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/api/stats")
+async def api_stats():
+    """Compteurs internes : contrôles préalables (appels LLM évités), caches, spéculation, cassette et file Mistral."""
+    return {
+        "preflight": logic.preflight.stats(),
+        "parseur_cv": dict(logic.stats_parseur),
+        "cache_cv": logic.magasin_cv.stats(),
+        "cache_offres": logic.cache_offres.stats(),
+        "speculation": logic.speculateur.stats(),
+        "cassette": logic.cassette.stats(),
+        "ordonnanceur_llm": logic.limiteur_mistral.stats(),
+    }
+
+# ==============================================================================
+# ADMIN : PROFILS ENREGISTRÉS
+# ==============================================================================
+
+def admin_autorise(request: Request):
+    """Accès admin : en-tête X-Aria-Profil égal à ARIA_PROFILAGE_JETON (désactivé sans jeton)."""
+    return bool(profilage.JETON) and request.headers.get(profilage.EN_TETE) == profilage.JETON
+
+@app.get("/admin/profils")
+async def admin_profils(request: Request):
+    """Liste des profils enregistrés (route, session, durée, nombre d'échantillons)."""
+    if not admin_autorise(request):
+        return JSONResponse({"error": "Accès refusé."}, status_code=403)
+    return {"profils": await run_in_threadpool(profilage.lister_profils)}
+
+@app.get("/admin/profils/{nom}")
+async def admin_profil(request: Request, nom: str):
+    """Téléchargement d'un profil au format collapsed (flamegraph.pl, speedscope)."""
+    if not admin_autorise(request):
+        return JSONResponse({"error": "Accès refusé."}, status_code=403)
+    chemin = profilage.chemin_profil(nom)
+    if chemin is None:
+        return JSONResponse({"error": "Profil introuvable."}, status_code=404)
+    return FileResponse(chemin, media_type="text/plain", filename=nom)
+
 # Lancement local (si exécuté directement)
 if __name__ == "__main__":
     import uvicorn
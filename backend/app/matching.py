@@ -0,0 +1,223 @@
+# matching.py
+
+import os
+import time
+import math
+from collections import Counter
+
+import numpy as np
+
+from bm25 import tokeniser
+from score_ats import _phrases_cv
+from rag_reformulation_cv import encoder_textes
+
+
+"""
+MATRICE DE MATCHING CVs × OFFRES (sans LLM).
+Objectif : classer des centaines de CVs face à des dizaines d'offres en une passe.
+Les deux côtés sont encodés par lots et indexés par mots-clés, puis la matrice
+complète des scores est calculée par produits matriciels :
+
+- Sémantique : chaque document = centroïde normalisé des embeddings SBERT de ses
+  phrases (MAX_PHRASES_DOC premières) ; similarité = cosinus des centroïdes
+- Lexical : termes clés de chaque offre (TF-IDF, IDF calculé sur les CVs et les
+  offres) ; couverture = part du poids des termes de l'offre présents dans le CV
+- Score = 100 x (POIDS_SEMANTIQUE x sémantique ramenée dans [0, 1] + POIDS_LEXICAL x lexical)
+
+Résultat : top-k des CVs pour chaque offre et des offres pour chaque CV, avec les
+termes communs / manquants. Produit sous forme d'événements (mode streaming).
+"""
+
+
+MAX_CV = int(os.environ.get("ARIA_MATCHING_MAX_CV", "2000"))
+MAX_OFFRES = int(os.environ.get("ARIA_MATCHING_MAX_OFFRES", "200"))
+MAX_CELLULES_MATRICE = 100_000  # au-delà, la matrice complète n'est pas renvoyée
+MAX_PHRASES_DOC = 40
+TERMES_PAR_OFFRE = 30
+TAILLE_LOT_ENCODAGE = 256       # phrases par appel d'encodage (une progression par lot)
+BLOC_CV = 256                   # CVs par bloc pour la matrice lexicale
+POIDS_SEMANTIQUE = 0.5
+POIDS_LEXICAL = 0.5
+SEUIL_SEM_BAS = 0.20            # cosinus de centroïdes : ~0.2 pour deux métiers sans rapport
+SEUIL_SEM_HAUT = 0.75
+TERMES_AFFICHES = 8
+
+
+# ======================
+# Encodage par lots
+# ======================
+def _encoder_documents(textes, cote):
+    """
+    Générateur : événements de progression, puis (return) la matrice (N, d) des
+    centroïdes normalisés. Toutes les phrases du côté sont encodées ensemble, par lots.
+    """
+    phrases, proprietaire = [], []
+    for i, texte in enumerate(textes):
+        morceaux = _phrases_cv(texte)[:MAX_PHRASES_DOC] or [texte[:500] or " "]
+        phrases.extend(morceaux)
+        proprietaire.extend([i] * len(morceaux))
+    proprietaire = np.asarray(proprietaire)
+
+    blocs = []
+    for debut in range(0, len(phrases), TAILLE_LOT_ENCODAGE):
+        blocs.append(encoder_textes(phrases[debut:debut + TAILLE_LOT_ENCODAGE]))
+        yield {"event": "encodage", "cote": cote, "phrases": min(debut + TAILLE_LOT_ENCODAGE, len(phrases)),
+               "total": len(phrases)}
+    emb = np.concatenate(blocs).astype(np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-9
+
+    # Somme des phrases par document (scatter-add), puis normalisation
+    centroides = np.zeros((len(textes), emb.shape[1]), dtype=np.float32)
+    np.add.at(centroides, proprietaire, emb)
+    centroides /= np.linalg.norm(centroides, axis=1, keepdims=True) + 1e-9
+    return centroides
+
+
+# ======================
+# Index de termes
+# ======================
+def _termes_offres(tokens_offres, tokens_cvs):
+    """
+    Termes clés de chaque offre et leurs poids TF-IDF (IDF sur CVs + offres).
+    Retourne (vocabulaire {terme: colonne}, poids (M, V) float32).
+    """
+    n_docs = len(tokens_offres) + len(tokens_cvs)
+    df = Counter()
+    for tokens in tokens_cvs:
+        df.update(tokens)
+    for tokens in tokens_offres:
+        df.update(set(tokens))
+
+    selection = []
+    for tokens in tokens_offres:
+        tf = Counter(tokens)
+        poids = {t: (1 + math.log(n)) * math.log(1 + n_docs / df[t]) for t, n in tf.items()}
+        selection.append(sorted(poids.items(), key=lambda x: -x[1])[:TERMES_PAR_OFFRE])
+
+    vocab = {}
+    for termes in selection:
+        for terme, _ in termes:
+            vocab.setdefault(terme, len(vocab))
+    poids = np.zeros((len(tokens_offres), max(len(vocab), 1)), dtype=np.float32)
+    for j, termes in enumerate(selection):
+        for terme, w in termes:
+            poids[j, vocab[terme]] = w
+    return vocab, poids
+
+
+def _couverture_lexicale(tokens_cvs, vocab, poids):
+    """Matrice (N, M) : part du poids des termes de chaque offre présents dans chaque CV."""
+    total = np.maximum(poids.sum(axis=1), 1e-9)
+    lex = np.empty((len(tokens_cvs), poids.shape[0]), dtype=np.float32)
+    for debut in range(0, len(tokens_cvs), BLOC_CV):
+        bloc = tokens_cvs[debut:debut + BLOC_CV]
+        presence = np.zeros((len(bloc), poids.shape[1]), dtype=np.float32)
+        for i, tokens in enumerate(bloc):
+            colonnes = [vocab[t] for t in tokens if t in vocab]
+            presence[i, colonnes] = 1.0
+        lex[debut:debut + len(bloc)] = (presence @ poids.T) / total
+    return lex
+
+
+# ======================
+# Matrice et top-k
+# ======================
+def _top_k(scores, k):
+    """Indices des k meilleurs scores de chaque ligne, triés (argpartition puis tri local)."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    partiel = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    ordre = np.argsort(-np.take_along_axis(scores, partiel, axis=1), axis=1)
+    return np.take_along_axis(partiel, ordre, axis=1)
+
+
+def _identifiants(docs, prefixe):
+    return [str(d.get("id") or f"{prefixe}{i}") for i, d in enumerate(docs)]
+
+
+def ids_en_double(docs, prefixe):
+    """Identifiants portés par plusieurs documents (ids fournis ou générés) : les résultats s'écraseraient."""
+    return sorted(i for i, n in Counter(_identifiants(docs, prefixe)).items() if n > 1)
+
+
+def evenements_matching(cvs, offres, top_k=10, avec_matrice=False):
+    """
+    Matching CVs × offres sous forme d'événements (une ligne NDJSON chacun en streaming) :
+    encodage (progression), index, une ligne par offre (top-k CVs), une par CV (top-k offres),
+    matrice (optionnelle, si assez petite), fin (dimensions et durées en ms).
+
+    cvs / offres : [{"id": str (optionnel), "texte": str}]
+    """
+    if not cvs or not offres:
+        raise Exception("Il faut au moins un CV et une offre.")
+    if len(cvs) > MAX_CV or len(offres) > MAX_OFFRES:
+        raise Exception(f"Trop de documents (max {MAX_CV} CVs et {MAX_OFFRES} offres).")
+    doublons = ids_en_double(cvs, "cv_") + ids_en_double(offres, "offre_")
+    if doublons:
+        raise Exception(f"Identifiants en double : {', '.join(doublons)}")
+    t0 = time.perf_counter()
+    timings = {}
+    ids_cv, ids_offre = _identifiants(cvs, "cv_"), _identifiants(offres, "offre_")
+    textes_cv = [d.get("texte") or "" for d in cvs]
+    textes_offre = [d.get("texte") or "" for d in offres]
+
+    debut = time.perf_counter()
+    emb_cv = yield from _encoder_documents(textes_cv, "cvs")
+    emb_offre = yield from _encoder_documents(textes_offre, "offres")
+    timings["encodage"] = round((time.perf_counter() - debut) * 1000)
+
+    debut = time.perf_counter()
+    tokens_cv = [set(tokeniser(t)) for t in textes_cv]
+    vocab, poids = _termes_offres([tokeniser(t) for t in textes_offre], tokens_cv)
+    lexical = _couverture_lexicale(tokens_cv, vocab, poids)
+    timings["index"] = round((time.perf_counter() - debut) * 1000)
+    yield {"event": "index", "termes_offres": len(vocab), "duree_ms": timings["index"]}
+
+    debut = time.perf_counter()
+    semantique = np.clip((emb_cv @ emb_offre.T - SEUIL_SEM_BAS) / (SEUIL_SEM_HAUT - SEUIL_SEM_BAS), 0.0, 1.0)
+    scores = 100.0 * (POIDS_SEMANTIQUE * semantique + POIDS_LEXICAL * lexical)
+    meilleurs_cv = _top_k(scores.T, top_k)       # (M, k) : CVs pour chaque offre
+    meilleures_offres = _top_k(scores, top_k)    # (N, k) : offres pour chaque CV
+    timings["matrice"] = round((time.perf_counter() - debut) * 1000)
+
+    termes = [None] * len(offres)
+    colonnes_termes = {j: t for t, j in vocab.items()}
+
+    def correspondance(i, j, id_):
+        if termes[j] is None:
+            termes[j] = [colonnes_termes[c] for c in np.argsort(-poids[j]) if poids[j, c] > 0]
+        return {
+            "id": id_,
+            "score": int(round(float(scores[i, j]))),
+            "semantique": round(float(semantique[i, j]), 2),
+            "lexical": round(float(lexical[i, j]), 2),
+            "termes_communs": [t for t in termes[j] if t in tokens_cv[i]][:TERMES_AFFICHES],
+            "termes_manquants": [t for t in termes[j] if t not in tokens_cv[i]][:TERMES_AFFICHES],
+        }
+
+    for j, id_offre in enumerate(ids_offre):
+        yield {"event": "offre", "id": id_offre, "top": [correspondance(i, j, ids_cv[i]) for i in meilleurs_cv[j]]}
+    for i, id_cv in enumerate(ids_cv):
+        yield {"event": "cv", "id": id_cv, "top": [correspondance(i, j, ids_offre[j]) for j in meilleures_offres[i]]}
+    if avec_matrice and scores.size <= MAX_CELLULES_MATRICE:
+        yield {"event": "matrice", "cvs": ids_cv, "offres": ids_offre, "scores": np.rint(scores).astype(int).tolist()}
+
+    timings["total"] = round((time.perf_counter() - t0) * 1000)
+    print(f"[MATCHING] {len(cvs)} CVs x {len(offres)} offres en {timings['total']} ms {timings}")
+    yield {"event": "fin", "n_cvs": len(cvs), "n_offres": len(offres), "top_k": top_k, "timings": timings}
+
+
+def calculer_matching(cvs, offres, top_k=10, avec_matrice=False):
+    """Résultat complet de evenements_matching (réponse JSON non streamée)."""
+    resultat = {"par_offre": {}, "par_cv": {}}
+    for evenement in evenements_matching(cvs, offres, top_k, avec_matrice):
+        if evenement["event"] == "offre":
+            resultat["par_offre"][evenement["id"]] = evenement["top"]
+        elif evenement["event"] == "cv":
+            resultat["par_cv"][evenement["id"]] = evenement["top"]
+        elif evenement["event"] == "matrice":
+            resultat["matrice"] = {k: evenement[k] for k in ("cvs", "offres", "scores")}
+        elif evenement["event"] == "fin":
+            resultat.update({k: v for k, v in evenement.items() if k != "event"})
+    return resultat
@@ -0,0 +1,294 @@
+# modele_cv.py
+
+
+"""
+MODÈLE CANONIQUE DU CV OPTIMISÉ (enregistrements compacts à __slots__).
+Objectif : le même dict cv_optimise_complet était parcouru trois fois (texte,
+DOCX, PDF), chaque sérialiseur retraitant les champs liste-ou-chaîne et
+concaténant avec += en boucle. Le dict est maintenant normalisé une seule fois
+(CV.depuis_json) et les sérialiseurs travaillent sur ce modèle :
+
+- texte_cv           : texte lisible (chatbot, API, étape 3), construit par join
+- contexte_docx      : contexte du template DOCX
+- export_cv.story_pdf : flowables ReportLab (module export_cv)
+- lire_texte_cv      : inverse de texte_cv (CV modifié en texte par le chatbot de l'étape 5)
+
+Normalisation : chaînes nettoyées (None -> ""), listes de compétences / langues
+jointes par ", ", tâches toujours en tuple, contact (dict, liste ou texte) en une ligne.
+CV.vers_json() redonne le dict au format du schéma cv_optimise (aller-retour stable).
+"""
+
+
+import re
+
+
+SEPARATEUR_LISTE = ", "
+SEPARATEUR_CONTACT = " | "
+
+
+def _texte(valeur):
+    """Chaîne d'un champ texte (None -> "", listes jointes)."""
+    if type(valeur) is str:
+        return valeur.strip()
+    if valeur is None:
+        return ""
+    if isinstance(valeur, (list, tuple)):
+        return SEPARATEUR_LISTE.join(str(v).strip() for v in valeur if v)
+    return str(valeur).strip()
+
+
+def _contact(valeur):
+    """Contact en une ligne : valeurs non vides d'un dict / d'une liste, ou texte."""
+    if isinstance(valeur, dict):
+        valeur = valeur.values()
+    if isinstance(valeur, (list, tuple, type({}.values()))):
+        return SEPARATEUR_CONTACT.join(str(v) for v in valeur if v)
+    return _texte(valeur)
+
+
+def _puces(valeur):
+    """Tâches : tuple de chaînes non vides (une chaîne seule devient une puce)."""
+    if not valeur:
+        return ()
+    if isinstance(valeur, (list, tuple)):
+        return tuple([t for t in map(_texte, valeur) if t])
+    return (_texte(valeur),)
+
+
+class Experience:
+    __slots__ = ("poste", "entreprise", "dates", "taches")
+
+    def __init__(self, poste="", entreprise="", dates="", taches=()):
+        self.poste = poste
+        self.entreprise = entreprise
+        self.dates = dates
+        self.taches = taches
+
+    @classmethod
+    def depuis_json(cls, e):
+        return cls(_texte(e.get("poste")), _texte(e.get("entreprise")), _texte(e.get("dates")),
+                   _puces(e.get("taches")))
+
+    def vers_json(self):
+        return {"poste": self.poste, "entreprise": self.entreprise, "dates": self.dates, "taches": list(self.taches)}
+
+
+class Formation:
+    __slots__ = ("diplome", "ecole", "dates", "details")
+
+    def __init__(self, diplome="", ecole="", dates="", details=""):
+        self.diplome = diplome
+        self.ecole = ecole
+        self.dates = dates
+        self.details = details
+
+    @classmethod
+    def depuis_json(cls, f):
+        return cls(_texte(f.get("diplome")), _texte(f.get("ecole")), _texte(f.get("dates")), _texte(f.get("details")))
+
+    def vers_json(self):
+        return {"diplome": self.diplome, "ecole": self.ecole, "dates": self.dates, "details": self.details}
+
+
+class CV:
+    __slots__ = ("prenom_nom", "contact", "resume", "experiences", "formation", "competences_techniques",
+                 "soft_skills", "langues", "certifications", "interets")
+
+    def __init__(self, prenom_nom="", contact="", resume="", experiences=(), formation=(),
+                 competences_techniques="", soft_skills="", langues="", certifications="", interets=""):
+        self.prenom_nom = prenom_nom
+        self.contact = contact
+        self.resume = resume
+        self.experiences = experiences
+        self.formation = formation
+        self.competences_techniques = competences_techniques
+        self.soft_skills = soft_skills
+        self.langues = langues
+        self.certifications = certifications
+        self.interets = interets
+
+    @classmethod
+    def depuis_json(cls, data):
+        """CV normalisé depuis le JSON cv_optimise (enveloppe cv_optimise_complet acceptée)."""
+        if isinstance(data, CV):
+            return data
+        if "cv_optimise_complet" in data:
+            data = data["cv_optimise_complet"] or {}
+        entete = data.get("entete") or {}
+        return cls(
+            _texte(entete.get("prenom_nom")),
+            _contact(entete.get("contact_info")),
+            _texte(data.get("resume")),
+            tuple([Experience.depuis_json(e) for e in data.get("experiences") or () if isinstance(e, dict)]),
+            tuple([Formation.depuis_json(f) for f in data.get("formation") or () if isinstance(f, dict)]),
+            _texte(data.get("competences_techniques")),
+            _texte(data.get("soft_skills")),
+            _texte(data.get("langues")),
+            _texte(data.get("certifications")),
+            _texte(data.get("interets")),
+        )
+
+    def vers_json(self):
+        """Dict au format du schéma cv_optimise (contact déjà mis en forme)."""
+        return {
+            "entete": {"prenom_nom": self.prenom_nom, "contact_info": self.contact},
+            "resume": self.resume,
+            "experiences": [e.vers_json() for e in self.experiences],
+            "formation": [f.vers_json() for f in self.formation],
+            "competences_techniques": self.competences_techniques,
+            "soft_skills": self.soft_skills,
+            "langues": self.langues,
+            "certifications": self.certifications,
+            "interets": self.interets,
+        }
+
+    def infos_complementaires(self, avec_certifications=True):
+        """
+        [(libellé, valeur)] des rubriques complémentaires non vides, dans l'ordre d'affichage.
+        Le PDF n'a jamais affiché les certifications (avec_certifications=False).
+        """
+        return [(libelle, valeur) for libelle, valeur in (
+            ("Langues", self.langues), ("Soft Skills", self.soft_skills),
+            ("Certifications", self.certifications if avec_certifications else ""),
+            ("Intérêts", self.interets)) if valeur]
+
+
+# ======================
+# Sérialiseurs
+# ======================
+def texte_cv(cv):
+    """Texte lisible du CV (même mise en page que l'ancien json_cv_to_text)."""
+    lignes = [cv.prenom_nom.upper(), cv.contact, ""]
+    if cv.resume:
+        lignes += ["PROFIL __________________________________________________", cv.resume, ""]
+    if cv.experiences:
+        lignes.append("EXPERIENCES _____________________________________________")
+        for e in cv.experiences:
+            lignes.append(f"{e.poste} @ {e.entreprise} ({e.dates})")
+            lignes.extend(f"- {t}" for t in e.taches)
+            lignes.append("")
+    if cv.formation:
+        lignes.append("FORMATION _______________________________________________")
+        lignes.extend(f"{f.diplome} - {f.ecole} ({f.dates})" for f in cv.formation)
+    lignes.append("COMPÉTENCES & DIVERS ____________________________________")
+    for titre, valeur in (("Tech", cv.competences_techniques), ("Soft Skills", cv.soft_skills),
+                          ("Langues", cv.langues)):
+        if valeur:
+            lignes.append(f"{titre}: {valeur}")
+    return "\n".join(lignes) + "\n"
+
+
+TITRE_RUBRIQUE = re.compile(r"^(PROFIL|EXPERIENCES|FORMATION|COMPÉTENCES & DIVERS) _{5,}$")
+LIGNE_EXPERIENCE = re.compile(r"^(.*?) @ (.*) \(([^()]*)\)$")
+LIGNE_FORMATION = re.compile(r"^(.*?) - (.*) \(([^()]*)\)$")
+LIGNE_DIVERS = {"Tech": "competences_techniques", "Soft Skills": "soft_skills", "Langues": "langues"}
+
+
+def lire_texte_cv(texte, base=None):
+    """
+    CV relu depuis la mise en page de texte_cv (texte modifié par le chatbot de l'étape 5).
+    Les champs que texte_cv n'écrit pas (certifications, intérêts, détails de formation,
+    casse du nom) sont repris de base. None si aucune rubrique de texte_cv n'est reconnue.
+    """
+    base = base or CV()
+    lignes = [l.strip() for l in (texte or "").splitlines()]
+    if not any(TITRE_RUBRIQUE.match(l) for l in lignes):
+        return None
+
+    entete, rubrique = [], None
+    resume, experiences, formation, divers = [], [], [], {}
+    for ligne in lignes:
+        titre = TITRE_RUBRIQUE.match(ligne)
+        if titre:
+            rubrique = titre.group(1)
+        elif not ligne:
+            continue
+        elif rubrique is None:
+            entete.append(ligne)
+        elif rubrique == "PROFIL":
+            resume.append(ligne)
+        elif rubrique == "EXPERIENCES":
+            m = LIGNE_EXPERIENCE.match(ligne)
+            if m:
+                experiences.append(Experience(*(g.strip() for g in m.groups()), taches=[]))
+            elif experiences:
+                experiences[-1].taches.append(ligne.lstrip("-•* ").strip())
+        elif rubrique == "FORMATION":
+            m = LIGNE_FORMATION.match(ligne)
+            if m:
+                formation.append(Formation(*(g.strip() for g in m.groups())))
+        else:
+            libelle, _, valeur = ligne.partition(":")
+            if libelle.strip() in LIGNE_DIVERS:
+                divers[LIGNE_DIVERS[libelle.strip()]] = valeur.strip()
+
+    for e in experiences:
+        e.taches = tuple(t for t in e.taches if t)
+    details = {(f.diplome, f.ecole): f.details for f in base.formation}
+    for f in formation:
+        f.details = details.get((f.diplome, f.ecole), "")
+    nom = entete[0] if entete else ""
+    if base.prenom_nom and base.prenom_nom.upper() == nom:
+        nom = base.prenom_nom
+    return CV(nom, entete[1] if len(entete) > 1 else "", " ".join(resume), tuple(experiences), tuple(formation),
+              divers.get("competences_techniques", ""), divers.get("soft_skills", ""), divers.get("langues", ""),
+              base.certifications, base.interets)
+
+
+def contexte_docx(cv):
+    """Contexte du template DOCX (template_2.docx)."""
+    return {
+        "entete": {"prenom_nom": cv.prenom_nom, "contact_info": cv.contact},
+        "contact": cv.contact,
+        "resume": cv.resume,
+        "competences_techniques": cv.competences_techniques,
+        "experiences_text": "\n\n".join(
+            "\n".join([f"{e.poste} chez {e.entreprise} ({e.dates})"] + [f"- {t}" for t in e.taches])
+            for e in cv.experiences),
+        "formation_text": "\n\n".join(
+            f"{f.diplome}, {f.ecole} ({f.dates})" + (f"\n• {f.details}" if f.details else "")
+            for f in cv.formation),
+        "infos_supp_text": "\n".join(f"{libelle}: {valeur}" for libelle, valeur in cv.infos_complementaires()),
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    def cv_exemple(n_exp=6, n_taches=6):
+        return {
+            "entete": {"prenom_nom": "Camille Martin", "contact_info": {"email": "camille@mail.fr", "tel": "06 12 34 56 78"}},
+            "resume": "Ingénieure data orientée produit, 8 ans d'expérience en pipelines et MLOps.",
+            "experiences": [{"poste": f"Data Engineer {i}", "entreprise": f"Société {i}", "dates": f"20{10 + i}",
+                             "taches": [f"Pipeline {j} (Spark, Airflow) : latence -{5 * j} %" for j in range(n_taches)]}
+                            for i in range(n_exp)],
+            "formation": [{"diplome": "Master Informatique", "ecole": "Université de Lyon", "dates": "2012",
+                           "details": "Mention bien"}] * 3,
+            "competences_techniques": ["Python", "SQL", "Spark", "Airflow", "Docker"],
+            "soft_skills": ["Rigueur", "Communication"],
+            "langues": ["Anglais courant", "Espagnol"],
+            "interets": "Trail, photographie",
+        }
+
+    def mesurer(nom, fn, n):
+        fn()
+        debut = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"  {nom:28s} {1e6 * (time.perf_counter() - debut) / n:9.1f} µs")
+
+    data = cv_exemple()
+    cv = CV.depuis_json(data)
+    assert CV.depuis_json(cv.vers_json()).vers_json() == cv.vers_json(), "aller-retour instable"
+    assert lire_texte_cv(texte_cv(cv), cv).vers_json() == cv.vers_json(), "relecture du texte instable"
+    print("CV de 6 expériences x 6 tâches :")
+    mesurer("parse (depuis_json)", lambda: CV.depuis_json(data), 20000)
+    mesurer("aller-retour JSON", lambda: CV.depuis_json(CV.depuis_json(data).vers_json()), 10000)
+    mesurer("texte_cv", lambda: texte_cv(cv), 20000)
+    mesurer("contexte_docx", lambda: contexte_docx(cv), 20000)
+    mesurer("parse + texte + docx", lambda: (lambda c: (texte_cv(c), contexte_docx(c)))(CV.depuis_json(data)), 10000)
+    try:
+        from export_cv import story_pdf
+        mesurer("story_pdf (flowables)", lambda: story_pdf(cv), 500)
+    except ImportError:
+        pass
@@ -0,0 +1,160 @@
+# ordonnanceur_llm.py
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+
+"""
+ORDONNANCEUR des appels Mistral : priorités, équité entre sessions, attente bornée.
+Objectif : les appels interactifs (modifications du CV par le chatbot) gardent une
+latence basse quand les analyses, le travail spéculatif et les traitements de fond
+se disputent le même quota. Remplace le simple sémaphore « premier arrivé, premier servi ».
+
+- Classes de priorité (ordre strict) : interactif > analyse > fond
+- Équité : dans une classe, les sessions (ou clients de l'API) sont servies à tour
+  de rôle ; une session qui lance 6 sections en parallèle ne passe pas devant les
+  autres pour chacune
+- Réserve : la classe fond n'occupe jamais les ARIA_LLM_RESERVE dernières places,
+  gardées libres pour le travail qui attend une réponse
+- Attente bornée par classe (ARIA_LLM_ATTENTE_MAX_<CLASSE>, secondes) : au-delà,
+  l'appel est refusé plutôt que de tenir la requête indéfiniment
+- Métriques : profondeur de file et temps d'attente (moyenne, p95) par classe
+"""
+
+
+CLASSES = ("interactif", "analyse", "fond")
+RESERVE = int(os.environ.get("ARIA_LLM_RESERVE", "1"))
+ATTENTE_MAX = {
+    "interactif": float(os.environ.get("ARIA_LLM_ATTENTE_MAX_INTERACTIF", "30")),
+    "analyse": float(os.environ.get("ARIA_LLM_ATTENTE_MAX_ANALYSE", "60")),
+    "fond": float(os.environ.get("ARIA_LLM_ATTENTE_MAX_FOND", "300")),
+}
+FENETRE_METRIQUES = 500         # dernières attentes gardées par classe (percentiles)
+
+
+class _Ticket:
+    __slots__ = ("classe", "cle", "arrivee", "fin")
+
+    def __init__(self, classe, cle):
+        self.classe = classe
+        self.cle = cle
+        self.arrivee = time.monotonic()
+        self.fin = None             # instant limite d'attente (None = illimité)
+
+
+class OrdonnanceurLLM:
+    """
+    Places d'appel Mistral (capacite simultanées), attribuées par priorité puis à tour de rôle.
+    Même usage qu'un sémaphore : acquerir(...) -> bool, puis liberer().
+    """
+
+    def __init__(self, capacite, reserve=RESERVE, attente_max=ATTENTE_MAX):
+        self.capacite = capacite
+        self.reserve = min(reserve, capacite - 1)
+        self.attente_max = attente_max
+        self.occupees = 0
+        self._cond = threading.Condition()
+        self._files = {c: OrderedDict() for c in CLASSES}    # classe -> {cle: deque[_Ticket]}
+        self._attentes = {c: deque(maxlen=FENETRE_METRIQUES) for c in CLASSES}
+        self.compteurs = Counter()
+        self._profondeur_max = Counter()
+
+    def _places(self, classe):
+        return self.capacite - (self.reserve if classe == "fond" else 0)
+
+    def _elu(self):
+        """Ticket servi en premier : classe la plus prioritaire non vide, session en tête du tour."""
+        for classe in CLASSES:
+            sessions = self._files[classe]
+            if sessions:
+                return next(iter(sessions.values()))[0]
+        return None
+
+    def _retirer(self, ticket, servi):
+        sessions = self._files[ticket.classe]
+        file = sessions[ticket.cle]
+        file.remove(ticket)
+        if not file:
+            del sessions[ticket.cle]
+        elif servi:
+            sessions.move_to_end(ticket.cle)     # tour de rôle : la session repasse en dernier
+
+    def acquerir(self, classe="analyse", cle=None, timeout=None):
+        """
+        Attend une place. timeout : délai de l'appelant (échéance), borné par
+        l'attente max de la classe. Retourne False si la place n'a pas été obtenue à temps.
+        """
+        if classe not in self._files:
+            raise Exception(f"Classe de priorité inconnue : {classe}")
+        limite = self.attente_max.get(classe)
+        if timeout is not None:
+            limite = timeout if limite is None else min(limite, timeout)
+        ticket = _Ticket(classe, cle)
+        ticket.fin = None if limite is None else ticket.arrivee + limite
+
+        with self._cond:
+            self._files[classe].setdefault(cle, deque()).append(ticket)
+            profondeur = sum(len(f) for f in self._files[classe].values())
+            self._profondeur_max[classe] = max(self._profondeur_max[classe], profondeur)
+            # ticket.classe / ticket.fin peuvent changer pendant l'attente (reclasser)
+            while not (self._elu() is ticket and self.occupees < self._places(ticket.classe)):
+                restant = None if ticket.fin is None else ticket.fin - time.monotonic()
+                if restant is not None and restant <= 0:
+                    self._retirer(ticket, servi=False)
+                    self.compteurs[f"refuses_{ticket.classe}"] += 1
+                    self._cond.notify_all()     # la tête de file a pu changer
+                    return False
+                self._cond.wait(restant)
+            self._retirer(ticket, servi=True)
+            self.occupees += 1
+            self._attentes[ticket.classe].append(time.monotonic() - ticket.arrivee)
+            self.compteurs[f"servis_{ticket.classe}"] += 1
+            self._cond.notify_all()
+        return True
+
+    def reclasser(self, cle, de, vers, limite=None):
+        """
+        Passe les appels en attente de la session `cle` de la classe `de` à la classe `vers`
+        (travail de fond repris par une requête). Leur attente repart avec le plafond de
+        la nouvelle classe, borné par `limite` (instant time.monotonic() du délai de l'appelant).
+        """
+        if de == vers:
+            return
+        with self._cond:
+            file = self._files[de].pop(cle, None)
+            if not file:
+                return
+            maintenant = time.monotonic()
+            for ticket in file:
+                ticket.classe = vers
+                plafond = self.attente_max.get(vers)
+                fins = [f for f in (None if plafond is None else maintenant + plafond, limite) if f is not None]
+                ticket.fin = min(fins) if fins else None
+            self._files[vers].setdefault(cle, deque()).extend(file)
+            self.compteurs[f"reclasses_{de}"] += len(file)
+            self._cond.notify_all()
+
+    def liberer(self):
+        with self._cond:
+            self.occupees -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            classes = {}
+            for classe in CLASSES:
+                attentes = sorted(self._attentes[classe])
+                classes[classe] = {
+                    "en_attente": sum(len(f) for f in self._files[classe].values()),
+                    "sessions_en_attente": len(self._files[classe]),
+                    "profondeur_max": self._profondeur_max[classe],
+                    "servis": self.compteurs[f"servis_{classe}"],
+                    "refuses": self.compteurs[f"refuses_{classe}"],
+                    "reclasses": self.compteurs[f"reclasses_{classe}"],
+                    "attente_moy_ms": round(1000 * sum(attentes) / len(attentes)) if attentes else 0,
+                    "attente_p95_ms": round(1000 * attentes[int(0.95 * (len(attentes) - 1))]) if attentes else 0,
+                }
+            return {"capacite": self.capacite, "reserve_fond": self.reserve, "occupees": self.occupees,
+                    "classes": classes}
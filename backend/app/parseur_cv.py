@@ -0,0 +1,483 @@
+# parseur_cv.py
+
+import os
+import re
+
+from score_ats import normaliser
+
+
+"""
+PARSEUR LOCAL DE CV (FR / EN), sans LLM.
+Objectif : découper le texte extrait d'un CV en rubriques (expériences, formation,
+compétences...), lire l'en-tête de contact et lister les expériences
+{poste, employeur, dates, taches} en quelques millisecondes. Chaque résultat porte
+une confiance : en dessous du seuil, l'appelant retombe sur l'extraction LLM.
+
+Évaluation sur des CVs annotés :  python parseur_cv.py [cvs_annotes.jsonl]
+(corpus anonymisé : python parseur_cv.py --corpus [dossier_cvs])
+"""
+
+
+SEUIL_CONFIANCE = float(os.environ.get("ARIA_PARSEUR_SEUIL", "0.6"))
+MAX_MOTS_TITRE = 5          # un titre de rubrique est une ligne courte
+MAX_MOTS_ENTETE = 16        # au-delà, une ligne est une description, pas un en-tête de poste
+MAX_TACHES = 12
+
+# Rubriques canoniques -> variantes (comparées sur la ligne normalisée sans espaces)
+RUBRIQUES = {
+    "experiences": r"(professional|work|relevant|employment|career)?(experience|history)s?(professionnelles?)?"
+                   r"|experiencesprofessionnelles?|experienceprofessionnelle|parcours(professionnel)?"
+                   r"|employment|workhistory|careerhistory",
+    "formation": r"formations?|education(andtraining)?|diplomes?|formationsetdiplomes|academic(background)?|training"
+                 r"|cursus|etudes",
+    "competences": r"(technical|core|key)?(skills?|competences?)(techniques|highlights|summary)?|skillhighlights"
+                   r"|(core)?qualifications|expertises?|outils|technologies",
+    "langues": r"langues?|languages?",
+    "resume": r"(professional|executive|career)?(summary|profile|overview)|profil|objecti(ve|f)|apropos|resume",
+    "certifications": r"certifications?|certificates?|licenses?(andcertifications)?",
+    "realisations": r"accomplishments?|achievements?|realisations?",
+    "projets": r"projects?|projets?(personnels)?",
+    "interets": r"interests?|centresdinterets?|loisirs|hobbies",
+    "autres": r"additionalinformation|informationscomplementaires|references?|affiliations?|volunteer(ing|experience)?"
+              r"|benevolat|activities",
+}
+_RUBRIQUES = [(nom, re.compile(motif)) for nom, motif in RUBRIQUES.items()]
+
+MOIS = (r"(?:jan(?:v(?:ier)?|uary)?|f[eé]v(?:rier)?|feb(?:ruary)?|mar(?:s|ch)?|avr(?:il)?|apr(?:il)?|mai|may"
+        r"|juin|june?|juil(?:let)?|july?|ao[uû]t|aug(?:ust)?|sept?(?:embre|ember)?|oct(?:obre|ober)?"
+        r"|nov(?:embre|ember)?|d[eé]c(?:embre|ember)?)\.?")
+DATE = r"(?:%s\s+|\d{1,2}\s*/\s*)?(?:19|20)\d{2}" % MOIS
+FIN = r"(?:%s|current|pr[eé]sent|now|today|aujourd'?\s?hui|ce jour|actuel(?:lement)?|en cours)" % DATE
+PERIODE = re.compile(r"(?:depuis|since)\s+%s|%s\s*(?:-|–|—|to|à|a|au|until|jusqu'?\s?(?:à|en))\s*%s" % (DATE, DATE, FIN),
+                     re.I)
+DATE_SEULE = re.compile(r"(?<![\d/])%s(?![\d/])" % DATE, re.I)
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[a-z]{2,}", re.I)
+TELEPHONE = re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?0?\d{1,3}\)?(?:[\s.-]?\d{2}){4}")
+LIEN = re.compile(r"(?:https?://|www\.|linkedin\.com/|github\.com/)\S+", re.I)
+NOM_PROPRE = r"[A-ZÉ][\w'’.-]*(?:[ -][A-ZÉ][\w'’.-]*)?"
+LIEU_SEUL = re.compile(r"%s(?:\s*,\s*%s)*" % (NOM_PROPRE, NOM_PROPRE))
+SEPARATEURS = re.compile(r"\s*(?:—|–|\||@|·|•|\bchez\b|\bat\b|\s-\s)\s*")
+PUCE = re.compile(r"^\s*(?:[-•▪●◦*·➢✓]|\d+[.)])\s+")
+
+ENTREPRISE = re.compile(
+    r"\b(inc|s\.?a\.?s\.?u?|sarl|s\.?a\.?|ltd|llc|llp|plc|corp\w*|gmbh|group\w*|groupe|holding"
+    r"|bank|banque|universit\w+|hospital|h[oô]pital|clinique|agency|agence|consulting|conseil|solutions|technologies"
+    r"|services|associates|partners|ministere|ministère|mairie|studio|labs?|laboratoire|startup|cabinet)\b", re.I)
+POSTE = re.compile(
+    r"\b(engineer|ing[eé]nieure?|developer|d[eé]veloppeu(?:r|se)|manager|director|directeur|directrice|consultante?"
+    r"|analyst|analyste|assistante?|specialist|sp[eé]cialiste|coordinat(?:or|eur|rice)|chef|head|lead|responsable"
+    r"|technici(?:an|en|enne)|intern|stagiaire|alternante?|apprenti|officer|associate|administrat(?:or|eur|rice)"
+    r"|architecte?|designer|accountant|comptable|clerk|supervisor|superviseu(?:r|se)|representative|commercial"
+    r"|vendeu(?:r|se)|sales|teacher|enseignante?|professeur|nurse|infirmi(?:er|[eè]re)|president|pr[eé]sidente?"
+    r"|owner|founder|fondat(?:eur|rice)|cto|ceo|cfo|scientist|chercheu(?:r|se)|researcher|data|product|project"
+    r"|projet|operator|op[eé]rat(?:eur|rice)|agent|advisor|conseill(?:er|[eè]re)|auditor|auditeur|planner|producer"
+    r"|editor|r[eé]dact(?:eur|rice)|trainer|formateur|counselor|recruiter|recruteur|hostess|h[oô]tesse|cashier"
+    r"|caissi(?:er|[eè]re)|driver|chauffeur|mechanic|m[eé]canicien|executive|principal|partner|volunteer|b[eé]n[eé]vole)\b",
+    re.I)
+DIPLOME = re.compile(
+    r"\b(master|mast[eè]re|mba|msc|bachelor|b\.?\s?(?:sc|com|a)\b|licence|license|dipl[oô]m\w*|degree|associate|doctora\w*"
+    r"|ph\.?\s?d|bts|dut|but|bac(?:calaur[eé]at)?|ing[eé]nieur|certifica\w*|cap|high school|ged)\b", re.I)
+ECOLE = re.compile(
+    r"\b(universit\w+|[eé]cole|school|college|coll[eè]ge|institut\w*|academy|acad[eé]mie|lyc[eé]e|iut|insa|polytechni\w+"
+    r"|business school|campus|faculty|facult[eé])\b", re.I)
+
+
+# ======================
+# Lignes et rubriques
+# ======================
+MOJIBAKE = [("â€“", " – "), ("â€”", " — "), ("â€™", "'"), ("â€¢", "•"), ("ï¼", " – "), ("Â", " "), ("\xa0", " ")]
+# Jetons d'anonymisation du corpus Tous_les_CVs : règles actives seulement avec corpus=True
+ANONYME = re.compile(r"company\s?name", re.I)   # employeur anonymisé du corpus
+ANONYME_LIEU = re.compile(r"\b(?:City|State)\b")
+MOTS_LIAISON = {"to", "a", "au", "de", "du", "from", "et", "and", "in", "en"}
+MAX_MOTS_FRAGMENT = 10
+
+
+def _nettoyer(ligne):
+    # Artefacts d'encodage fréquents des PDF du corpus (UTF-8 relu en cp1252, séparateur pleine chasse)
+    for avant, apres in MOJIBAKE:
+        ligne = ligne.replace(avant, apres)
+    return re.sub(r"\s+", " ", ligne).strip()
+
+
+def rubrique(ligne):
+    """Nom canonique de la rubrique si la ligne est un titre de rubrique, sinon None."""
+    ligne = ligne.strip().rstrip(":").strip()
+    if not ligne or len(ligne.split()) > MAX_MOTS_TITRE or len(ligne) > 50:
+        return None
+    compact = re.sub(r"[^a-z]", "", normaliser(ligne))
+    for nom, motif in _RUBRIQUES:
+        if motif.fullmatch(compact):
+            return nom
+    return None
+
+
+def decouper_sections(texte):
+    """
+    Découpe le CV en rubriques.
+
+    Returns
+    -------
+    (entete, sections) : lignes avant la première rubrique, et liste de
+    {"rubrique", "titre", "lignes"} dans l'ordre du document
+    """
+    entete, sections = [], []
+    for brute in texte.splitlines():
+        ligne = _nettoyer(brute)
+        if not ligne:
+            continue
+        nom = rubrique(ligne)
+        if nom:
+            sections.append({"rubrique": nom, "titre": ligne, "lignes": []})
+        elif sections:
+            sections[-1]["lignes"].append(ligne)
+        else:
+            entete.append(ligne)
+    return entete, sections
+
+
+def extraire_contact(entete):
+    """Coordonnées de l'en-tête : nom, titre, email, téléphone, liens."""
+    texte = "\n".join(entete)
+    email = EMAIL.search(texte)
+    tel = TELEPHONE.search(texte)
+    autres = [l for l in entete if not EMAIL.search(l) and not TELEPHONE.search(l) and not LIEN.search(l)]
+    nom = next((l for l in autres if 2 <= len(l.split()) <= 4 and not POSTE.search(l)
+                and re.fullmatch(r"[A-Za-zÀ-ÿ'’ .-]+", l)), "")
+    titre = next((l for l in autres if l != nom and len(l.split()) <= 8), "")
+    return {
+        "nom": nom,
+        "titre": titre,
+        "email": email.group(0) if email else "",
+        "telephone": tel.group(0).strip() if tel else "",
+        "liens": LIEN.findall(texte),
+    }
+
+
+# ======================
+# Expériences
+# ======================
+def _date(ligne):
+    """(début, fin) du texte de date (plage, sinon date seule), ou None."""
+    m = PERIODE.search(ligne) or DATE_SEULE.search(ligne)
+    return (m.start(), m.end()) if m else None
+
+
+def _est_entete(ligne):
+    n_mots = len(ligne.split())
+    return (n_mots <= MAX_MOTS_ENTETE and not PUCE.match(ligne) and not ligne[:1].islower()
+            and not (ligne.endswith(".") and n_mots > 6))
+
+
+def _voisine_entete(ligne, corpus=False):
+    """Ligne voisine d'une date pouvant compléter l'en-tête : courte et en majuscules initiales
+    (poste, nom d'entreprise), ou avec un indice d'entreprise. Écarte les descriptions."""
+    if not _est_entete(ligne):
+        return False
+    if (corpus and ANONYME.search(ligne)) or ENTREPRISE.search(ligne) or (len(ligne.split()) <= 6 and POSTE.search(ligne)):
+        return True
+    mots = [m for m in re.findall(r"[A-Za-zÀ-ÿ][\w'’&/-]*", ligne) if m.lower() not in MOTS_LIAISON]
+    return 0 < len(mots) <= 8 and sum(m[0].isupper() for m in mots) >= 0.6 * len(mots)
+
+
+def _est_lieu(partie):
+    """'Paris', 'Lyon, France', 'City , State' : noms propres courts sans indice de poste ni d'entreprise."""
+    return bool(LIEU_SEUL.fullmatch(partie)) and not ENTREPRISE.search(partie) and not POSTE.search(partie)
+
+
+def _separer_entete(fragments, corpus=False):
+    """Sépare poste / employeur dans les fragments d'en-tête (dates déjà retirées)."""
+    texte = " – ".join(f for f in fragments if f)
+    employeur = ""
+    if corpus:
+        m = ANONYME.search(texte)
+        if m:
+            employeur = "Company Name"
+            texte = texte[:m.start()] + " – " + texte[m.end():]
+        texte = ANONYME_LIEU.sub(" – ", texte)
+    parties = []
+    for p in SEPARATEURS.split(texte):
+        p = p.strip(" ,;:-–()")
+        if "," in p and _est_lieu(p):
+            # 'Google, Paris' : entreprise + ville si l'employeur manque, sinon simple lieu
+            if not employeur:
+                parties.append(p.split(",")[0])
+            continue
+        # 'Poste, Entreprise, Ville' : la virgule ne sépare que si l'employeur reste à trouver
+        parties.extend(p.split(",") if not employeur and "," in p else [p])
+    parties = [p.strip(" ,;:-–()") for p in parties]
+    parties = [p for p in parties if re.search(r"[A-Za-zÀ-ÿ]{2}", p) and p.lower() not in MOTS_LIAISON
+               and len(p.split()) <= MAX_MOTS_FRAGMENT]
+    while len(parties) > 2 and _est_lieu(parties[-1]):
+        parties.pop()
+    if not employeur:
+        cues = [p for p in parties if ENTREPRISE.search(p) and not POSTE.search(p)]
+        if cues:
+            employeur = cues[0]
+            parties.remove(employeur)
+        elif len(parties) >= 2:
+            # Sans indice d'entreprise : le fragment qui ressemble le moins à un poste
+            sans_poste = [p for p in parties if not POSTE.search(p)]
+            if sans_poste:
+                employeur = sans_poste[0]
+                parties.remove(employeur)
+    postes = [p for p in parties if POSTE.search(p)] or parties
+    poste = postes[0] if postes else ""
+    return poste[:80], employeur[:80]
+
+
+def extraire_experiences(lignes, corpus=False):
+    """
+    Expériences d'une rubrique (ou du CV entier) : chaque date ou plage de dates
+    ancre un poste, dont l'en-tête est la ligne de la date et ses voisines courtes.
+
+    Returns
+    -------
+    list[dict] : {"poste", "employeur", "dates", "taches"}
+    """
+    return _experiences_et_structure(lignes, corpus)[0]
+
+
+def _experiences_et_structure(lignes, corpus=False):
+    """extraire_experiences + couverture structurelle {"lignes", "dates"} (0-1) pour la confiance."""
+    ancres = [i for i, l in enumerate(lignes) if _est_entete(l) and _date(l)]
+    experiences, utilisees = [], set()
+    blocs = []
+    for n, i in enumerate(ancres):
+        debut, fin = _date(lignes[i])
+        dates = lignes[i][debut:fin]
+        fragments = [lignes[i][:debut], lignes[i][fin:]]
+        utilisees.add(i)
+        reste = " ".join(fragments).strip(" ,;:-–|")
+        precedente = i - 1 if i > 0 and i - 1 not in utilisees and _voisine_entete(lignes[i - 1], corpus) else None
+        suivante = i + 1 if i + 1 < len(lignes) and (n + 1 >= len(ancres) or ancres[n + 1] != i + 1) \
+            and _voisine_entete(lignes[i + 1], corpus) else None
+        entete = [i]
+        # Ligne de date seule ou incomplète : le reste de l'en-tête est sur une ligne voisine
+        poste, employeur = _separer_entete(fragments, corpus)
+        if not (poste and employeur):
+            # Date seule sur sa ligne : l'en-tête suit plus souvent qu'il ne précède
+            voisines = (suivante, precedente) if not reste else (precedente, suivante)
+            meilleur, score = None, bool(poste) + bool(employeur)
+            for j in voisines:
+                if j is None:
+                    continue
+                p2, e2 = _separer_entete([lignes[j]] + fragments, corpus) if j == precedente \
+                    else _separer_entete(fragments + [lignes[j]], corpus)
+                if bool(p2) + bool(e2) > score or (meilleur is None and not reste and p2):
+                    meilleur, score, poste, employeur = j, bool(p2) + bool(e2), p2, e2
+            if meilleur is not None:
+                entete.append(meilleur)
+                utilisees.add(meilleur)
+        blocs.append((min(entete), max(entete)))
+        experiences.append({"poste": poste, "employeur": employeur, "dates": dates, "taches": []})
+
+    # Tâches : lignes entre l'en-tête d'un poste et celui du suivant
+    consommees, ancres_gardees = 0, 0
+    for n, (debut_bloc, fin_entete) in enumerate(blocs):
+        fin_bloc = blocs[n + 1][0] if n + 1 < len(blocs) else len(lignes)
+        taches = [PUCE.sub("", l) for l in lignes[fin_entete + 1:fin_bloc]]
+        experiences[n]["taches"] = [t for t in taches if len(t) > 3][:MAX_TACHES]
+        if experiences[n]["poste"] or experiences[n]["employeur"]:
+            consommees += fin_bloc - debut_bloc
+            ancres_gardees += 1
+
+    # Couverture : lignes rattachées à un poste retenu, plages de dates devenues des postes
+    datees = set(ancres) | {i for i, l in enumerate(lignes) if PERIODE.search(l)}
+    structure = {
+        "lignes": round(consommees / len(lignes), 2) if lignes else 0.0,
+        "dates": round(ancres_gardees / len(datees), 2) if datees else 0.0,
+    }
+    return [e for e in experiences if e["poste"] or e["employeur"]], structure
+
+
+def _separation_plausible(e):
+    """Poste / employeur d'aspect cohérent : distincts, sans date résiduelle, employeur qui n'est pas un intitulé."""
+    poste, employeur = e["poste"], e["employeur"]
+    if poste and employeur and poste.lower() == employeur.lower():
+        return False
+    if DATE_SEULE.search(poste) or DATE_SEULE.search(employeur):
+        return False
+    return not (employeur and POSTE.search(employeur) and not ENTREPRISE.search(employeur))
+
+
+def confiance_experiences(experiences, rubrique_trouvee, structure=None):
+    """
+    0-1 : champs (poste + employeur, séparation plausible) pondérés par la structure
+    (part des lignes rattachées à un poste et des dates devenues des postes),
+    pénalisée sans rubrique expériences.
+    """
+    if not experiences:
+        return 0.0
+    champs = sum((bool(e["poste"]) + bool(e["employeur"])) / 2 * (1.0 if _separation_plausible(e) else 0.5)
+                 for e in experiences) / len(experiences)
+    couverture = (structure["lignes"] + structure["dates"]) / 2 if structure else 1.0
+    return round(champs * (0.3 + 0.7 * couverture) * (1.0 if rubrique_trouvee else 0.7), 2)
+
+
+# ======================
+# Formation
+# ======================
+def extraire_formation(lignes, corpus=False):
+    """
+    Diplômes de la rubrique formation : une ligne avec un indice de diplôme ou d'école
+    ouvre une entrée ; une date seule sur sa ligne se rattache à l'entrée voisine ;
+    les autres lignes deviennent des détails.
+
+    Returns
+    -------
+    list[dict] : {"diplome", "ecole", "dates", "details"}
+    """
+    formations, date_en_attente = [], ""
+    for ligne in lignes:
+        ligne = PUCE.sub("", ligne)
+        span = _date(ligne)
+        dates = ligne[span[0]:span[1]] if span else ""
+        reste = (ligne[:span[0]] + " – " + ligne[span[1]:]) if span else ligne
+        if corpus:
+            reste = ANONYME_LIEU.sub(" – ", reste)
+        if not re.search(r"[A-Za-zÀ-ÿ]{2}", reste):
+            # Date seule : elle précède le diplôme (ou complète la dernière entrée sans date)
+            if formations and not formations[-1]["dates"] and not date_en_attente:
+                formations[-1]["dates"] = dates
+            else:
+                date_en_attente = dates
+            continue
+        if DIPLOME.search(reste) or ECOLE.search(reste):
+            parties = [q.strip(" ,;:-–()") for p in SEPARATEURS.split(reste) for q in p.split(",")]
+            parties = [p for p in parties if re.search(r"[A-Za-zÀ-ÿ]{2}", p)]
+            while len(parties) > 1 and _est_lieu(parties[-1]) and not (DIPLOME.search(parties[-1])
+                                                                        or ECOLE.search(parties[-1])):
+                parties.pop()
+            ecole = next((p for p in parties if ECOLE.search(p) and not DIPLOME.search(p)), "")
+            diplome = ", ".join(p for p in parties if p != ecole)
+            formations.append({
+                "diplome": (diplome or ecole)[:120],
+                "ecole": ecole[:120],
+                "dates": dates or date_en_attente,
+                "details": "",
+            })
+            date_en_attente = ""
+        elif formations:
+            formations[-1]["details"] = (formations[-1]["details"] + " " + ligne).strip()[:200]
+    return formations
+
+
+# ======================
+# API publique
+# ======================
+def analyser_cv(texte, corpus=False):
+    """
+    Analyse locale complète du CV.
+
+    corpus : active les règles propres aux jetons d'anonymisation du corpus Tous_les_CVs
+    ("Company Name", "City, State") ; à réserver à l'évaluation / l'indexation du corpus.
+
+    Returns
+    -------
+    dict : contact, sections {rubrique: [lignes]}, experiences [{poste, employeur, dates, taches}],
+    formation [{diplome, ecole, dates, details}], structure {lignes, dates} (couverture 0-1),
+    confiance (des expériences, 0-1)
+    """
+    entete, sections = decouper_sections(texte or "")
+    par_rubrique = {}
+    for s in sections:
+        par_rubrique.setdefault(s["rubrique"], []).extend(s["lignes"])
+
+    lignes_exp = par_rubrique.get("experiences")
+    rubrique_trouvee = bool(lignes_exp)
+    if not rubrique_trouvee:
+        lignes_exp = [_nettoyer(l) for l in (texte or "").splitlines() if l.strip()]
+    experiences, structure = _experiences_et_structure(lignes_exp, corpus)
+
+    return {
+        "contact": extraire_contact(entete),
+        "entete": entete,
+        "sections": par_rubrique,
+        "experiences": experiences,
+        "formation": extraire_formation(par_rubrique.get("formation", []), corpus),
+        "structure": structure,
+        "confiance": confiance_experiences(experiences, rubrique_trouvee, structure),
+    }
+
+
+def experiences_cv(texte):
+    """
+    Même structure que l'extraction LLM (prompt_extraire_experiences) + la confiance :
+    ({"experiences": [{"poste", "employeur", "dates"}]}, confiance)
+    """
+    analyse = analyser_cv(texte)
+    exps = [{"poste": e["poste"], "employeur": e["employeur"], "dates": e["dates"]} for e in analyse["experiences"]]
+    return {"experiences": exps}, analyse["confiance"]
+
+
+def evaluer(cvs_annotes):
+    """
+    Compare le parseur à des CVs annotés [{"texte", "experiences": [{"poste", "employeur", "dates"}]}].
+    Retourne les taux d'exactitude par champ (sur les expériences attendues) et de CVs
+    fiables / exacts, pour vérifier que la confiance sépare bien les deux.
+    """
+    attendues = exacts = fiables = fiables_exacts = 0
+    champs = {"poste": 0, "employeur": 0, "dates": 0}
+    for cv in cvs_annotes:
+        analyse = analyser_cv(cv["texte"])
+        trouvees = analyse["experiences"]
+        cv_exact = len(trouvees) == len(cv["experiences"])
+        for attendue, trouvee in zip(cv["experiences"], trouvees + [{}] * len(cv["experiences"])):
+            for champ in champs:
+                ok = (trouvee.get(champ) or "").lower() == attendue[champ].lower()
+                champs[champ] += ok
+                cv_exact &= ok
+        attendues += len(cv["experiences"])
+        exacts += cv_exact
+        fiable = analyse["confiance"] >= SEUIL_CONFIANCE
+        fiables += fiable
+        fiables_exacts += fiable and cv_exact
+    n = max(len(cvs_annotes), 1)
+    return {
+        "cvs": len(cvs_annotes),
+        **{champ: round(ok / max(attendues, 1), 3) for champ, ok in champs.items()},
+        "cvs_exacts": round(exacts / n, 3),
+        "cvs_fiables": round(fiables / n, 3),
+        "precision_fiables": round(fiables_exacts / max(fiables, 1), 3),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+    import time
+    from pathlib import Path
+
+    # Par défaut : CVs annotés non anonymisés (vérité terrain poste / employeur / dates).
+    #   python parseur_cv.py [cvs_annotes.jsonl]
+    # Corpus anonymisé Tous_les_CVs (règles corpus=True, sans vérité terrain) :
+    #   python parseur_cv.py --corpus [dossier_cvs]
+    args = sys.argv[1:]
+    ici = os.path.dirname(os.path.abspath(__file__))
+    if args[:1] != ["--corpus"]:
+        chemin = args[0] if args else os.path.join(os.path.dirname(ici), "tests", "donnees", "cvs_annotes.jsonl")
+        with open(chemin, encoding="utf-8") as f:
+            cvs = [json.loads(l) for l in f if l.strip()]
+        print(json.dumps(evaluer(cvs), indent=2))
+        sys.exit(0)
+
+    from extraction_cv import extraire_texte_pdf
+    dossier = Path(args[1] if len(args) > 1 else os.path.join(ici, "Tous_les_CVs"))
+    textes = [extraire_texte_pdf(str(c)) for c in sorted(dossier.glob("*.pdf"))]
+    t0 = time.perf_counter()
+    resultats = [analyser_cv(t, corpus=True) for t in textes]
+    duree = time.perf_counter() - t0
+
+    # Pas de vérité terrain ici : l'employeur "Company Name" est imposé par la règle corpus,
+    # seuls la vitesse, la confiance et la propreté des postes sont informatifs.
+    n = len(resultats)
+    fiables = sum(r["confiance"] >= SEUIL_CONFIANCE for r in resultats)
+    exps = [e for r in resultats for e in r["experiences"]]
+    poste_propre = sum(bool(e["poste"]) and not re.search(r"company\s?name|\bcity\b|\bstate\b|\d{4}", e["poste"], re.I)
+                       for e in exps)
+    print(f"{n} CVs analysés en {duree * 1000:.0f} ms ({duree * 1000 / max(n, 1):.2f} ms/CV)")
+    print(f"Confiance >= {SEUIL_CONFIANCE} (pas d'appel LLM) : {fiables}/{n} ({100 * fiables / max(n, 1):.1f} %)")
+    print(f"Expériences : {len(exps)} ({len(exps) / max(n, 1):.1f}/CV)")
+    print(f"  poste sans résidu (lieu, date, employeur) : {100 * poste_propre / max(len(exps), 1):.1f} %")
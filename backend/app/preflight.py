@@ -0,0 +1,287 @@
+# preflight.py
+
+import os
+import re
+import math
+import threading
+from collections import Counter
+
+import requests
+
+from cassettes import cassette
+from extraction_cv import compter_pages_pdf, PDF_MAX_PAGES
+from score_ats import normaliser
+
+
+"""
+CONTRÔLES PRÉALABLES (pre-flight) de l'étape 1, avant toute dépense LLM.
+Objectif : refuser en quelques millisecondes ce qui ferait échouer ou dérailler
+l'analyse (fichier vide ou trop lourd, PDF scanné sans texte, document qui n'est
+pas un CV, URL d'offre injoignable), et compter les appels Mistral ainsi évités.
+
+Les contrôles lèvent RejetPreflight (message affiché à l'utilisateur) ou renvoient
+des avertissements non bloquants.
+
+Évaluation du classifieur sur un dossier :  python preflight.py [dossier_cvs]
+"""
+
+
+TAILLE_MIN_OCTETS = 1024
+TAILLE_MAX_OCTETS = int(os.environ.get("ARIA_MAX_UPLOAD_MB", "10")) * 1024 * 1024
+PAGES_MAX = int(os.environ.get("ARIA_PREFLIGHT_MAX_PAGES", str(PDF_MAX_PAGES)))
+PAGES_AVERTISSEMENT = 4
+CARACTERES_MIN = int(os.environ.get("ARIA_PREFLIGHT_MIN_CHARS", "300"))
+SEUIL_CV = float(os.environ.get("ARIA_PREFLIGHT_SEUIL_CV", "0.35"))       # en dessous : rejet
+SEUIL_CV_DOUTE = 0.55                                                      # en dessous : avertissement
+TIMEOUT_URL = float(os.environ.get("ARIA_PREFLIGHT_TIMEOUT_URL", "3"))
+VERIFIER_URL = os.environ.get("ARIA_PREFLIGHT_URL", "1") != "0"
+
+# Appels Mistral de la phase 1 : analyse de l'offre, évaluation, extraction des expériences
+APPELS_LLM_PHASE_1 = 3
+
+SIGNATURES = {".pdf": b"%PDF", ".docx": b"PK\x03\x04"}
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+MOTS_FR = set("le la les des du de et est en un une pour dans avec sur par au aux qui que ses nous vous".split())
+MOTS_EN = set("the and of to in for with on at by is are from as an be this that our you".split())
+
+# Classifieur CV / non-CV : régression logistique sur quelques indices structurels
+# (rubriques en titre de ligne, périodes d'emploi, coordonnées). Poids ajustés sur
+# 600 CVs de Tous_les_CVs contre 245 documents non-CV (README, licences, notices),
+# puis arrondis ; coordonnées et indices négatifs fixés à la main (corpus anonymisé).
+RUBRIQUES = re.compile(
+    r"(experience|employment|workhistory|parcours|education|formation|diplome|training|skill|competence|"
+    r"qualification|summary|profil|overview|highlights|accomplishment|realisation|certification|langue|"
+    r"language|interet|interest|loisir|hobbies|projet|project|reference|objecti)")
+RUBRIQUES_CLES = [("experience", "employment", "workhistory", "parcours"),
+                  ("education", "formation", "diplome", "training"),
+                  ("skill", "competence", "qualification")]
+MOIS = (r"(?:jan\w*|feb\w*|fev\w*|mar\w*|apr\w*|avr\w*|may|mai|jun\w*|juin|jul\w*|juil\w*|aug\w*|aou\w*|"
+        r"sep\w*|oct\w*|nov\w*|dec\w*|\d{1,2}/)")
+PERIODE = re.compile(r"(?:%s\s*)?(?:19|20)\d{2}\s*(?:-|–|to|a|au)?\s*(?:%s\s*)?"
+                     r"(?:(?:19|20)\d{2}|current|present|now|today|aujourd hui|actuel\w*|ce jour)" % (MOIS, MOIS))
+NEGATIFS = re.compile(
+    r"\b(madame monsieur|dear (sir|madam|hiring)|je vous prie|veuillez agreer|sincerely|lettre de motivation|"
+    r"cover letter|nous recherchons|we are looking for|vos missions|profil recherche|about the role|"
+    r"numero de facture|invoice number|montant ttc|total ht|abstract|bibliograph\w*|table des matieres|"
+    r"table of contents)\b")
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[a-z]{2,}", re.I)
+TELEPHONE = re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?0?\d{1,3}\)?(?:[\s.-]?\d{2,4}){3,4}")
+
+POIDS = {"biais": -5.5, "rubriques": 1.0, "rubriques_cles": 2.0, "periodes": 0.4,
+         "contact": 0.8, "negatifs": -2.0, "longueur": -0.8}
+
+
+class RejetPreflight(Exception):
+    """Document ou offre refusé avant analyse (message destiné à l'utilisateur)."""
+
+    def __init__(self, message, motif):
+        super().__init__(message)
+        self.motif = motif
+
+
+# ======================
+# Compteurs
+# ======================
+_lock = threading.Lock()
+compteurs = Counter()
+
+
+def _compter(*cles, n=1):
+    with _lock:
+        for cle in cles:
+            compteurs[cle] += n
+
+
+def rejeter(message, motif):
+    """Compte le rejet (et les appels LLM évités) puis lève RejetPreflight."""
+    _compter("rejets", f"rejet_{motif}")
+    _compter("appels_llm_evites", n=APPELS_LLM_PHASE_1)
+    print(f"[PREFLIGHT] Rejet ({motif}) : {message}")
+    raise RejetPreflight(message, motif)
+
+
+def stats():
+    with _lock:
+        return dict(compteurs)
+
+
+# ======================
+# Fichier
+# ======================
+def _taille(source):
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    source.seek(0, os.SEEK_END)
+    taille = source.tell()
+    source.seek(0)
+    return taille
+
+
+def _entete(source, n=8):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:n])
+    source.seek(0)
+    entete = source.read(n)
+    source.seek(0)
+    return entete
+
+
+def verifier_fichier(source, nom):
+    """
+    Extension, signature, taille et nombre de pages du CV uploadé.
+    Retourne la liste des avertissements (non bloquants).
+    """
+    _compter("verifications")
+    avertissements = []
+    ext = os.path.splitext(nom or "")[1].lower()
+    if ext not in SIGNATURES:
+        rejeter("Format non supporté : envoyez un CV en PDF ou DOCX.", "format")
+    if not _entete(source).startswith(SIGNATURES[ext]):
+        rejeter(f"Le fichier n'est pas un {ext[1:].upper()} valide.", "format")
+
+    taille = _taille(source)
+    if taille < TAILLE_MIN_OCTETS:
+        rejeter("Le fichier est vide ou presque.", "taille")
+    if taille > TAILLE_MAX_OCTETS:
+        rejeter(f"Fichier trop volumineux (max {TAILLE_MAX_OCTETS // (1024 * 1024)} Mo).", "taille")
+
+    if ext == ".pdf":
+        try:
+            nb_pages = compter_pages_pdf(source)
+        except Exception as e:
+            rejeter(f"PDF illisible : {e}", "format")
+        if nb_pages > PAGES_MAX:
+            rejeter(f"Document de {nb_pages} pages : un CV dépasse rarement {PAGES_AVERTISSEMENT} pages.", "pages")
+        if nb_pages > PAGES_AVERTISSEMENT:
+            avertissements.append(f"CV de {nb_pages} pages : les recruteurs en lisent rarement plus de 2.")
+    return avertissements
+
+
+# ======================
+# Texte
+# ======================
+def detecter_langue(texte):
+    """'fr', 'en' ou None, d'après la part de mots vides de chaque langue."""
+    mots = normaliser(texte[:5000]).split()
+    if not mots:
+        return None
+    fr = sum(m in MOTS_FR for m in mots) / len(mots)
+    en = sum(m in MOTS_EN for m in mots) / len(mots)
+    if max(fr, en) < 0.02:
+        return None
+    return "fr" if fr >= en else "en"
+
+
+def _rubriques(texte):
+    """Rubriques de CV reconnues en titre de ligne (3 mots au plus, ex. 'ProfessionalExperience')."""
+    trouvees = set()
+    for ligne in texte.splitlines()[:400]:
+        norm = normaliser(ligne)
+        if 0 < len(norm.split()) <= 3:
+            compact = norm.replace(" ", "")
+            m = RUBRIQUES.search(compact)
+            if m and len(compact) <= len(m.group(1)) + 20:
+                trouvees.add(m.group(1))
+    return trouvees
+
+
+def _a_telephone(texte):
+    for m in TELEPHONE.finditer(texte):
+        chiffres = re.sub(r"\D", "", m.group(0))
+        # Exclut les suites d'années ("2001, 2002, 2003") prises pour un numéro
+        if 9 <= len(chiffres) <= 15 and not re.fullmatch(r"((19|20)\d\d[\s,.-]*)+", m.group(0).strip()):
+            return True
+    return False
+
+
+def caracteristiques_cv(texte):
+    """Indices structurels d'un CV, bornés pour ne pas laisser un seul indice dominer."""
+    norm = normaliser(texte[:20000])
+    n_mots = max(len(norm.split()), 1)
+    rubriques = _rubriques(texte)
+    entete = texte[:3000]
+    return {
+        "rubriques": min(len(rubriques), 6),
+        "rubriques_cles": sum(any(r in groupe for r in rubriques) for groupe in RUBRIQUES_CLES),
+        "periodes": min(len(PERIODE.findall(norm)), 6),
+        "contact": 1.0 if (EMAIL.search(entete) or _a_telephone(entete)) else 0.0,
+        "negatifs": min(len(NEGATIFS.findall(norm)), 3),
+        "longueur": math.log(n_mots / 1500) if n_mots > 1500 else 0.0,
+    }
+
+
+def score_cv(texte):
+    """Probabilité (0-1) que le texte soit un CV."""
+    x = caracteristiques_cv(texte)
+    z = POIDS["biais"] + sum(POIDS[k] * v for k, v in x.items())
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def verifier_texte(texte):
+    """Quantité de texte extractible, langue et classification CV. Retourne les avertissements."""
+    avertissements = []
+    n_caracteres = len(re.sub(r"\s+", "", texte or ""))
+    if n_caracteres < CARACTERES_MIN:
+        rejeter("Aucun texte exploitable dans le document (PDF scanné ou image ?). "
+                "Exportez votre CV en PDF texte ou en DOCX.", "texte")
+
+    proba = score_cv(texte)
+    if proba < SEUIL_CV:
+        rejeter("Ce document ne ressemble pas à un CV (pas de rubriques expériences / formation / compétences).",
+                "non_cv")
+    if proba < SEUIL_CV_DOUTE:
+        avertissements.append("Structure de CV peu reconnaissable : l'analyse peut être moins précise.")
+
+    if detecter_langue(texte) is None and len(texte.split()) >= 80:
+        avertissements.append("Langue non reconnue : l'analyse est optimisée pour les CVs en français ou en anglais.")
+    return avertissements
+
+
+# ======================
+# URL de l'offre
+# ======================
+def verifier_url(url):
+    """
+    L'URL de l'offre répond-elle ? HEAD rapide, puis GET en streaming (sans lire le corps)
+    si le site refuse HEAD. Les refus anti-robots (403/429) ne sont qu'un avertissement.
+    """
+    _compter("verifications_url")
+    if not re.match(r"^https?://[^\s/]+\.[^\s]+", (url or "").strip(), re.I):
+        rejeter("L'URL de l'offre est invalide (http(s)://...).", "url")
+    if not VERIFIER_URL or cassette.rejoue:     # relecture hors ligne : la page vient de la cassette
+        return []
+
+    headers = {"User-Agent": USER_AGENT}
+    try:
+        r = requests.head(url, timeout=TIMEOUT_URL, allow_redirects=True, headers=headers)
+        if r.status_code >= 400:
+            r = requests.get(url, timeout=TIMEOUT_URL, allow_redirects=True, headers=headers, stream=True)
+            r.close()
+    except requests.RequestException as e:
+        rejeter(f"L'offre est injoignable ({type(e).__name__}). Vérifiez l'URL.", "url")
+
+    if r.status_code in (401, 403, 429):
+        return [f"Le site de l'offre limite l'accès aux robots (HTTP {r.status_code}) : l'analyse peut échouer."]
+    if r.status_code >= 400:
+        rejeter(f"L'offre est introuvable (HTTP {r.status_code}). Vérifiez l'URL.", "url")
+    return []
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from pathlib import Path
+    from extraction_cv import extraire_texte_pdf
+
+    dossier = Path(sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tous_les_CVs"))
+    probas, t0 = [], time.perf_counter()
+    for chemin in sorted(dossier.glob("*.pdf")):
+        texte = extraire_texte_pdf(str(chemin))
+        if len(re.sub(r"\s+", "", texte)) >= CARACTERES_MIN:
+            probas.append((score_cv(texte), chemin.name))
+    duree = time.perf_counter() - t0
+    acceptes = sum(p >= SEUIL_CV for p, _ in probas)
+    print(f"{acceptes}/{len(probas)} CVs acceptés (seuil {SEUIL_CV}) en {duree:.1f}s (extraction comprise)")
+    for p, nom in sorted(probas)[:10]:
+        print(f"  {p:.2f}  {nom}")
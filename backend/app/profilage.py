@@ -0,0 +1,191 @@
+# profilage.py
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+"""
+PROFILAGE À LA DEMANDE de requêtes lentes (échantillonnage de la pile, temps réel).
+Objectif : savoir où part le temps Python d'une session lente (PyPDF2, extraction
+de l'offre, mise en page ReportLab de creer_pdf_cv, SBERT / KMeans du RAG, attente
+Mistral...) sans instrumenter le code ni ralentir les autres requêtes.
+
+- Déclenchement : en-tête X-Aria-Profil égal à ARIA_PROFILAGE_JETON, ou tirage
+  aléatoire avec la probabilité ARIA_PROFILAGE_TAUX (0 par défaut : désactivé)
+- Échantillonnage : un thread relève sys._current_frames() toutes les
+  ARIA_PROFILAGE_INTERVALLE_MS ; temps réel (wall clock), les attentes réseau et
+  disque apparaissent donc comme le calcul
+- Seules les piles qui traversent le code de l'application sont gardées (les
+  workers inactifs des pools sont ignorés). Tous les threads de l'application
+  sont relevés : une requête concurrente peut apparaître dans le profil
+- Sortie : format « collapsed » (une ligne `thread;frame;...;frame N`), lisible
+  par flamegraph.pl, speedscope ou inferno, + métadonnées JSON (session, route)
+"""
+
+
+TAUX = float(os.environ.get("ARIA_PROFILAGE_TAUX", "0"))
+JETON = os.environ.get("ARIA_PROFILAGE_JETON", "")
+INTERVALLE = float(os.environ.get("ARIA_PROFILAGE_INTERVALLE_MS", "5")) / 1000
+DOSSIER = os.environ.get("ARIA_PROFILAGE_DIR", os.path.join(os.getcwd(), "temp_data", "profils"))
+MAX_FICHIERS = int(os.environ.get("ARIA_PROFILAGE_MAX_FICHIERS", "50"))
+MAX_SIMULTANES = 2              # échantillonneurs actifs en même temps
+EN_TETE = "x-aria-profil"
+
+DOSSIER_APP = os.path.dirname(os.path.abspath(__file__))
+
+
+def _nom_frame(code):
+    """'fichier.py:fonction' (sans numéro de ligne : les appels d'une même fonction fusionnent)."""
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profil:
+    """Échantillonneur de piles actif pendant une requête."""
+
+    def __init__(self, route, session=None, intervalle=INTERVALLE):
+        self.route = route
+        self.session = session
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self.n_echantillons = 0
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._echantillonner, name="aria-profil", daemon=True)
+        self._debut = None
+        self.duree = 0.0
+
+    def demarrer(self):
+        self._debut = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        self._arret.set()
+        self._thread.join()
+        self.duree = time.perf_counter() - self._debut
+
+    def _echantillonner(self):
+        moi = threading.get_ident()
+        while not self._arret.wait(self.intervalle):
+            noms = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == moi:
+                    continue
+                pile, dans_app = [], False
+                while frame is not None:
+                    code = frame.f_code
+                    dans_app = dans_app or code.co_filename.startswith(DOSSIER_APP)
+                    pile.append(_nom_frame(code))
+                    frame = frame.f_back
+                if dans_app:
+                    pile.append(noms.get(ident, str(ident)))
+                    self.piles[";".join(reversed(pile))] += 1
+            self.n_echantillons += 1
+
+    def collapsed(self):
+        return "".join(f"{pile} {n}\n" for pile, n in self.piles.most_common())
+
+
+# ======================
+# Déclenchement
+# ======================
+_places = threading.BoundedSemaphore(MAX_SIMULTANES)
+
+
+def doit_profiler(en_tetes):
+    """Requête à profiler ? (en-tête avec le bon jeton, ou tirage ARIA_PROFILAGE_TAUX)"""
+    demande = en_tetes.get(EN_TETE)
+    if demande is not None:
+        return bool(JETON) and demande == JETON
+    return TAUX > 0 and random.random() < TAUX
+
+
+def demarrer(route, session=None):
+    """Profil démarré, ou None si MAX_SIMULTANES profils tournent déjà."""
+    if not _places.acquire(blocking=False):
+        return None
+    try:
+        return Profil(route, session).demarrer()
+    except Exception:
+        _places.release()
+        raise
+
+
+def terminer(profil, statut=None):
+    """Arrête le profil et l'enregistre. Retourne le nom du fichier .folded (None si vide)."""
+    try:
+        profil.arreter()
+    finally:
+        _places.release()
+    if not profil.piles:
+        return None
+    return enregistrer(profil, statut)
+
+
+# ======================
+# Stockage
+# ======================
+def _slug(route):
+    return "".join(c if c.isalnum() else "_" for c in route.strip("/")) or "racine"
+
+
+def enregistrer(profil, statut=None):
+    os.makedirs(DOSSIER, exist_ok=True)
+    horodatage = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = f"{horodatage}_{_slug(profil.route)}_{(profil.session or 'anonyme')[:8]}"
+    with open(os.path.join(DOSSIER, base + ".folded"), "w", encoding="utf-8") as f:
+        f.write(profil.collapsed())
+    meta = {
+        "fichier": base + ".folded",
+        "route": profil.route,
+        "session": profil.session,
+        "statut": statut,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "duree_ms": round(profil.duree * 1000),
+        "n_echantillons": profil.n_echantillons,
+        "intervalle_ms": round(profil.intervalle * 1000, 1),
+    }
+    with open(os.path.join(DOSSIER, base + ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    print(f"[PROFIL] {profil.route} : {meta['duree_ms']} ms, {profil.n_echantillons} échantillons -> {meta['fichier']}")
+    _purger()
+    return meta["fichier"]
+
+
+def _purger():
+    """Garde les MAX_FICHIERS profils les plus récents."""
+    fichiers = sorted(f for f in os.listdir(DOSSIER) if f.endswith(".folded"))
+    for ancien in fichiers[:-MAX_FICHIERS] if MAX_FICHIERS > 0 else []:
+        for ext in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(DOSSIER, ancien[:-len(".folded")] + ext))
+            except OSError:
+                pass
+
+
+def lister_profils():
+    """Métadonnées des profils enregistrés, du plus récent au plus ancien."""
+    if not os.path.isdir(DOSSIER):
+        return []
+    profils = []
+    for nom in sorted(os.listdir(DOSSIER), reverse=True):
+        if nom.endswith(".json"):
+            try:
+                with open(os.path.join(DOSSIER, nom), encoding="utf-8") as f:
+                    profils.append(json.load(f))
+            except (OSError, ValueError):
+                pass
+    return profils
+
+
+def chemin_profil(nom):
+    """Chemin d'un profil .folded, ou None (nom inconnu ou hors du dossier)."""
+    if os.path.basename(nom) != nom or not nom.endswith(".folded"):
+        return None
+    chemin = os.path.join(DOSSIER, nom)
+    return chemin if os.path.isfile(chemin) else None
@@ -1,12 +1,13 @@
 # rag_reformulation_cv.py
 
 import os
+import time
+import threading
+from concurrent.futures import TimeoutError as AttenteExpiree
 import numpy as np
-from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
-from sentence_transformers import SentenceTransformer
-from keybert import KeyBERT
+
+from serveur_modeles import ClientModeles, ModelesIndisponibles, TIMEOUT_CLIENT
+from embeddings_onnx import charger_modeles, backend_embeddings
 
 
 """
@@ -19,16 +20,187 @@ pour aider Mistral à mieux reformuler le CV final.
 # ======================
 # Initialisation modèles
 # ======================
-sbert_model = SentenceTransformer("all-MiniLM-L6-v2")
-kw_model = KeyBERT(model=sbert_model)
+# Avec ARIA_MODEL_SOCKET, SBERT / KeyBERT tournent dans serveur_modeles.py (un seul
+# chargement par machine). Sinon (développement), ils sont chargés dans le process
+# au premier usage. Backend d'encodage : ARIA_EMBEDDINGS_BACKEND (voir embeddings_onnx.py).
+# Avec un serveur configuré, il n'y a jamais de repli en process (un chargement par worker) :
+# serveur pas encore prêt -> nouveaux essais espacés, puis erreur explicite.
+MODEL_SOCKET = os.environ.get("ARIA_MODEL_SOCKET")
+ESSAIS_SERVEUR = int(os.environ.get("ARIA_MODEL_ESSAIS", "5"))
+ATTENTE_ESSAI_SERVEUR = 0.5          # secondes avant le 2e essai, doublées ensuite
+
+client_modeles = ClientModeles(MODEL_SOCKET) if MODEL_SOCKET else None
+_modeles = {}
+_lock_modeles = threading.Lock()
+
+
+def _modeles_locaux():
+    """SBERT + KeyBERT chargés dans le process (mode sans serveur de modèles)."""
+    if not _modeles:
+        with _lock_modeles:
+            if not _modeles:
+                _modeles.update(charger_modeles())
+    return _modeles
+
+
+def _via_serveur(appel):
+    """
+    Résultat de `appel(client_modeles)`, ou None seulement sans serveur configuré (modèles en process).
+    Serveur injoignable (pas encore démarré, redémarrage) : ESSAIS_SERVEUR essais avec attente
+    doublée. Délai dépassé ou erreur côté serveur : pas de nouvel essai. Dans tous les cas l'échec
+    remonte en ModelesIndisponibles, sans charger les modèles dans le worker.
+    """
+    if client_modeles is None:
+        return None
+    attente = ATTENTE_ESSAI_SERVEUR
+    for essai in range(1, ESSAIS_SERVEUR + 1):
+        try:
+            return appel(client_modeles)
+        except ConnectionError as e:
+            if essai == ESSAIS_SERVEUR:
+                raise ModelesIndisponibles(f"Serveur de modèles indisponible après {essai} essais : {e}") from e
+            print(f"[WARNING] {e} -> nouvel essai dans {attente:.1f}s ({essai}/{ESSAIS_SERVEUR})")
+            time.sleep(attente)
+            attente *= 2
+        except AttenteExpiree as e:
+            raise ModelesIndisponibles(f"Serveur de modèles : pas de réponse en {TIMEOUT_CLIENT:.0f}s") from e
+        except Exception as e:
+            print(f"[WARNING] Erreur du serveur de modèles : {e}")
+            raise ModelesIndisponibles(str(e)) from e
+
+
+def backend_encodeur():
+    """Backend qui encode réellement les textes : celui du serveur de modèles s'il répond, sinon celui du process."""
+    if _modeles:
+        return _modeles["backend"]
+    return _via_serveur(lambda c: c.backend()) or backend_embeddings()
+
+
+def encoder_textes(textes):
+    """Embeddings SBERT (np.ndarray float32, une ligne par texte)."""
+    textes = list(textes)
+    emb = _via_serveur(lambda c: c.encoder(textes))
+    if emb is None:
+        emb = _modeles_locaux()["sbert"].encode(textes)
+    return np.asarray(emb, dtype=np.float32)
+
+
+def extraire_mots_cles(textes, top_n=10):
+    """Mots-clés KeyBERT (1-2 grammes) de chaque texte : une liste de chaînes par texte."""
+    textes = list(textes)
+    res = _via_serveur(lambda c: c.mots_cles(textes, top_n))
+    if res is None:
+        kw_model = _modeles_locaux()["keybert"]
+        res = [[kw[0] for kw in kw_model.extract_keywords(t, keyphrase_ngram_range=(1,2),
+                                                          stop_words='english', top_n=top_n)]
+               for t in textes]
+    return res
+
+
+def plus_proches_corpus(vecteur, k=10):
+    """[(indice, similarité)] des k CVs de l'index les plus proches de `vecteur`."""
+    res = _via_serveur(lambda c: c.topk(vecteur, k))
+    if res is None:
+        from index_corpus import charger_index
+        index = charger_index()
+        res = index.plus_proches(vecteur, k) if index is not None else []
+    return res
+
+
+def encoder_cv(texte_cv, top_n=10):
+    """
+    Embedding d'un CV, calculé comme pour la base : SBERT sur ses mots-clés KeyBERT.
+    """
+    kws = extraire_mots_cles([texte_cv], top_n)[0]
+    return encoder_textes([" ".join(kws)])[0]
+
+
+NB_CANDIDATS = 50    # candidats conservés après fusion RRF
+NB_CONTEXTE = 3      # CVs retenus dans le contexte envoyé à Mistral
+SEUIL_SBERT = 0.40   # similarité cosinus minimale d'un CV pertinent
+# Score BM25 minimal, relatif au meilleur score de la requête : un seul mot-clé courant
+# en commun ne suffit pas (scores BM25 non bornés, incomparables d'une offre à l'autre)
+SEUIL_BM25_RELATIF = float(os.environ.get("ARIA_RAG_SEUIL_BM25", "0.5"))
+MMR_LAMBDA = float(os.environ.get("ARIA_MMR_LAMBDA", "0.7"))            # 1 = pertinence seule
+MMR_PENALITE_CLUSTER = float(os.environ.get("ARIA_MMR_CLUSTER", "0.2"))  # malus si cluster déjà choisi
+
+
+def filtrer_pertinents(candidats, sims, scores_bm25, seuil_sbert=SEUIL_SBERT, seuil_bm25=SEUIL_BM25_RELATIF):
+    """Candidats assez proches en sémantique, ou dont le score BM25 atteint seuil_bm25 x le meilleur."""
+    meilleur_bm25 = float(np.max(scores_bm25)) if len(scores_bm25) else 0.0
+    plancher_bm25 = seuil_bm25 * meilleur_bm25 if meilleur_bm25 > 0 else np.inf
+    return [i for i in candidats if sims[i] >= seuil_sbert or scores_bm25[i] >= plancher_bm25]
+
+
+def selection_mmr(pertinence, vecteurs, k=NB_CONTEXTE, lambda_=MMR_LAMBDA,
+                  clusters=None, penalite_cluster=MMR_PENALITE_CLUSTER):
+    """
+    Maximal Marginal Relevance : choisit k candidats pertinents et différents entre eux.
+
+    À chaque tour : lambda * pertinence - (1 - lambda) * similarité max avec les déjà
+    choisis, moins `penalite_cluster` si le cluster du candidat est déjà représenté.
+    Déterministe (ex-aequo départagés par l'ordre des candidats).
+
+    Parameters
+    ----------
+    pertinence : array (n,)
+        Score de pertinence des candidats (normalisé en interne sur [0, 1])
+    vecteurs : array (n, d)
+        Embeddings normalisés des candidats
+    clusters : array (n,), optional
+        Identifiant de cluster hors ligne de chaque candidat
+
+    Returns
+    -------
+    list[int] : positions des candidats retenus, dans l'ordre de sélection
+    """
+    pertinence = np.asarray(pertinence, dtype=np.float32)
+    n = len(pertinence)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    pertinence = pertinence / (pertinence.max() or 1.0)
+    sim = np.asarray(vecteurs, dtype=np.float32) @ np.asarray(vecteurs, dtype=np.float32).T
+
+    choisis = []
+    redondance = np.zeros(n, dtype=np.float32)    # similarité max avec les choisis
+    malus = np.zeros(n, dtype=np.float32)
+    disponible = np.ones(n, dtype=bool)
+    for _ in range(k):
+        score = lambda_ * pertinence - (1 - lambda_) * redondance - malus
+        score[~disponible] = -np.inf
+        j = int(np.argmax(score))
+        choisis.append(j)
+        disponible[j] = False
+        redondance = np.maximum(redondance, sim[j])
+        if clusters is not None:
+            malus[np.asarray(clusters) == clusters[j]] = penalite_cluster
+    return choisis
+
+
+def mots_cles_offre(analyse_offre):
+    """Mots-clés de l'offre (compétences, ATS, missions), dédoublonnés dans l'ordre."""
+    job_keywords = analyse_offre.get("competences_cles", []) + \
+                   analyse_offre.get("mots_cles_ats", []) + \
+                   analyse_offre.get("missions_principales", [])
+    return list(dict.fromkeys(job_keywords))  # éviter doublons
+
+
+def encoder_mots_cles_offre(analyse_offre):
+    """Embedding SBERT des mots-clés de l'offre (réutilisable d'une requête à l'autre)."""
+    return encoder_textes([" ".join(mots_cles_offre(analyse_offre))])[0]
 
 
 # =====================================
 # Fonction principale appelée par Streamlit
 # =====================================
-def rag_retrieval_sbbert(cv_text_user, analyse_offre, base_cv_folder=r"Tous_les_CVs"):
+def rag_retrieval_sbbert(cv_text_user, analyse_offre, base_cv_folder=r"Tous_les_CVs", job_emb=None):
     """
-    Recherche les sections de CV les plus proches du CV utilisateur + offre.
+    Recherche les CV de la base les plus proches de l'offre (recherche hybride).
+
+    Les CV de la base sont lus dans l'index pré-construit (index_corpus.py) :
+    similarité SBERT sur leurs mots-clés + BM25 sur leur texte complet,
+    fusionnés par Reciprocal Rank Fusion.
 
     Parameters
     ----------
@@ -37,89 +209,66 @@ def rag_retrieval_sbbert(cv_text_user, analyse_offre, base_cv_folder=r"Tous_les_
     analyse_offre : dict
         Analyse JSON de l’offre d’emploi provenant de optimizer_app
     base_cv_folder : str
-        Dossier contenant les exemples de CV (base de connaissances)
-        au format .txt ou .md
+        Conservé pour compatibilité : la base est désormais lue dans l'index
+        (ARIA_INDEX_DIR, construit depuis Tous_les_CVs)
+    job_emb : np.ndarray, optional
+        Embedding des mots-clés de l'offre déjà calculé (cache des offres)
 
     Returns
     -------
-    str : texte contextuel pour Mistral
+    str : texte contextuel pour Mistral ("" si aucun index n'est disponible)
     """
+    from index_corpus import charger_index
+    from bm25 import fusion_rrf
 
     # -----------------------------
-    # 1. Charger les CV de la base
+    # 1. Charger l'index de la base
     # -----------------------------
-    cv_paths = sorted(list(Path(base_cv_folder).glob("*.txt")))
-    if not cv_paths:
-        return "Aucune base CV trouvée pour le RAG."
+    index = charger_index()
+    if index is None or not len(index):
+        # Pas de contexte plutôt qu'un message d'erreur injecté dans le prompt
+        print("[WARNING] Aucune base CV indexée pour le RAG (lancer index_corpus.py)")
+        return ""
 
-    cv_texts = [Path(p).read_text(encoding="utf-8") for p in cv_paths]
+    job_keywords_list = mots_cles_offre(analyse_offre)
+    if job_emb is None:
+        job_emb = encoder_mots_cles_offre(analyse_offre)
 
     # -----------------------------
-    # 2. Extraire keywords de l’offre
+    # 2. Scores dense (SBERT) et lexical (BM25)
     # -----------------------------
-    job_keywords = analyse_offre.get("competences_cles", []) + \
-                   analyse_offre.get("mots_cles_ats", []) + \
-                   analyse_offre.get("missions_principales", [])
-
-    job_keywords_list = list(set(job_keywords))  # éviter doublons
-
-    # -----------------------------
-    # 3. Générer keywords pour chaque CV modèle
-    # -----------------------------
-    cv_keywords = []
-    for text in cv_texts:
-        kws = kw_model.extract_keywords(text, keyphrase_ngram_range=(1,2),
-                                        stop_words='english', top_n=10)
-        cv_keywords.append([kw[0] for kw in kws])
+    sims = index.similarites(job_emb)
+    bm25 = index.bm25
+    scores_bm25 = bm25.scores(job_keywords_list) if bm25 is not None else np.zeros_like(sims)
 
     # -----------------------------
-    # 4. Embeddings SBERT
+    # 3. Fusion RRF
     # -----------------------------
-    cv_kw_texts = [" ".join(kws) for kws in cv_keywords]
-    cv_embeddings = sbert_model.encode(cv_kw_texts)
-
-    job_emb = sbert_model.encode([" ".join(job_keywords_list)])[0]
-
-    # -----------------------------
-    # 5. Similarité
-    # -----------------------------
-    sims = cosine_similarity([job_emb], cv_embeddings)[0]
-    ranked_idx = np.argsort(sims)[::-1]
+    ranked_idx, fused = fusion_rrf(sims, scores_bm25, top=NB_CANDIDATS)
 
     # -----------------------------
-    # 6. Filtrer CVs pertinents
+    # 4. Filtrer CVs pertinents
     # -----------------------------
-    threshold = 0.40
-    relevant_idx = [i for i, s in enumerate(sims) if s >= threshold]
+    relevant_idx = filtrer_pertinents(ranked_idx, sims, scores_bm25)
 
     # Si aucun CV n'est pertinent → prendre le top 3 quand même
-    if not relevant_idx:
-        relevant_idx = ranked_idx[:3]
+    if len(relevant_idx) < 3:
+        relevant_idx = list(ranked_idx[:3])
 
     # -----------------------------
-    # 7. Clustering pour diversifier
+    # 5. Diversification MMR (clusters calculés hors ligne)
     # -----------------------------
-    relevant_embeddings = cv_embeddings[relevant_idx]
-    k = min(3, len(relevant_embeddings))
-
-    kmeans = KMeans(n_clusters=k, random_state=42).fit(relevant_embeddings)
-    labels = kmeans.labels_
+    relevant_idx = np.asarray(relevant_idx)
+    choisis = selection_mmr(fused[relevant_idx], index.vecteurs(relevant_idx),
+                            clusters=index.clusters[relevant_idx])
 
     # -----------------------------
-    # 8. Sélectionner le meilleur CV par cluster
+    # 6. Textes des CVs retenus
     # -----------------------------
-    selected_texts = []
-
-    for cluster_id in range(k):
-        # indices appartenant au cluster
-        cluster_members = [i for i, lab in zip(relevant_idx, labels) if lab == cluster_id]
-
-        # choisir le plus similaire du cluster
-        best_member = max(cluster_members, key=lambda i: sims[i])
-        selected_texts.append(cv_texts[best_member])
+    selected_texts = [index.texte(relevant_idx[j]) for j in choisis]
 
     # -----------------------------
-    # 9. Générer un contexte final structuré
+    # 7. Générer un contexte final structuré
     # -----------------------------
     final_context = "\n\n====================\n".join(selected_texts)
 
@@ -0,0 +1,126 @@
+# score_ats.py
+
+import re
+import unicodedata
+
+import numpy as np
+
+from rag_reformulation_cv import encoder_textes
+
+
+"""
+SCORE ATS LOCAL (sans LLM).
+Objectif : mesurer en quelques millisecondes la couverture des mots-clés de l'offre
+(competences_cles + mots_cles_ats) par un CV, en combinant :
+- un matching lexical vectorisé (tokens normalisés, présence exacte de l'expression)
+- une similarité SBERT entre chaque mot-clé et les phrases du CV
+"""
+
+
+POIDS_SOURCES = {"competences_cles": 2.0, "mots_cles_ats": 1.0}
+SEUIL_SEM_BAS = 0.35     # en dessous : aucune couverture sémantique
+SEUIL_SEM_HAUT = 0.70    # au-dessus : couverture sémantique complète
+SEUIL_TROUVE = 0.6       # couverture minimale pour considérer le mot-clé présent
+CREDIT_PARTIEL = 0.7     # tous les tokens présents mais pas l'expression exacte
+MAX_PHRASES_CV = 200
+
+
+def normaliser(texte):
+    """Minuscules, sans accents, ponctuation -> espaces (on garde + # . pour C++, C#, .NET)."""
+    texte = unicodedata.normalize("NFKD", str(texte).lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    texte = re.sub(r"[^a-z0-9+#.]+", " ", texte)
+    return re.sub(r"\s+", " ", re.sub(r"(?<![a-z0-9])\.|\.(?![a-z0-9])", " ", texte)).strip()
+
+
+def _phrases_cv(texte_cv):
+    """Découpe le CV en lignes / phrases exploitables pour la similarité."""
+    morceaux = re.split(r"[\n\r]+|(?<=[.;!?])\s+|\s[•\-–]\s", texte_cv)
+    phrases = [m.strip() for m in morceaux if len(m.strip()) > 3]
+    return phrases[:MAX_PHRASES_CV]
+
+
+def mots_cles_ponderes(analyse_offre):
+    """[(mot_cle, source, poids)] dédoublonnés (la source la plus lourde l'emporte)."""
+    vus = {}
+    for source, poids in POIDS_SOURCES.items():
+        for mc in analyse_offre.get(source, []) or []:
+            cle = normaliser(mc)
+            if cle and (cle not in vus or vus[cle][2] < poids):
+                vus[cle] = (str(mc), source, poids)
+    return list(vus.values())
+
+
+def couverture_lexicale(mots_cles, texte_cv):
+    """
+    Couverture lexicale de chaque mot-clé (np.ndarray, valeurs dans [0, 1]).
+    Matrice d'incidence mots-clés × vocabulaire, produit par le vecteur de présence du CV.
+    """
+    cv_norm = f" {normaliser(texte_cv)} "
+    tokens_cv = set(cv_norm.split())
+    kw_tokens = [normaliser(mc).split() for mc in mots_cles]
+
+    vocab = {t: i for i, t in enumerate(sorted({t for toks in kw_tokens for t in toks}))}
+    if not vocab:
+        return np.zeros(len(mots_cles), dtype=np.float32)
+
+    incidence = np.zeros((len(mots_cles), len(vocab)), dtype=np.float32)
+    for i, toks in enumerate(kw_tokens):
+        incidence[i, [vocab[t] for t in toks]] = 1.0
+    presence = np.fromiter((t in tokens_cv for t in vocab), dtype=np.float32, count=len(vocab))
+
+    n_tokens = np.maximum(incidence.sum(axis=1), 1.0)
+    fraction = (incidence @ presence) / n_tokens
+    exact = np.fromiter((f" {' '.join(toks)} " in cv_norm if toks else False for toks in kw_tokens),
+                        dtype=bool, count=len(kw_tokens))
+    return np.where(exact, 1.0, np.where(fraction >= 1.0, CREDIT_PARTIEL, fraction * 0.5)).astype(np.float32)
+
+
+def couverture_semantique(mots_cles, texte_cv, emb_mots_cles=None):
+    """Meilleure similarité cosinus de chaque mot-clé avec une phrase du CV, ramenée dans [0, 1]."""
+    phrases = _phrases_cv(texte_cv)
+    if not phrases or not mots_cles:
+        return np.zeros(len(mots_cles), dtype=np.float32)
+    kw = encoder_textes(mots_cles) if emb_mots_cles is None else np.asarray(emb_mots_cles, dtype=np.float32)
+    ph = encoder_textes(phrases)
+    kw /= np.linalg.norm(kw, axis=1, keepdims=True) + 1e-9
+    ph /= np.linalg.norm(ph, axis=1, keepdims=True) + 1e-9
+    best = (kw @ ph.T).max(axis=1)
+    return np.clip((best - SEUIL_SEM_BAS) / (SEUIL_SEM_HAUT - SEUIL_SEM_BAS), 0.0, 1.0).astype(np.float32)
+
+
+def scorer_cv(texte_cv, analyse_offre, semantique=True):
+    """
+    Score ATS local d'un CV par rapport à l'analyse d'offre.
+
+    Returns
+    -------
+    dict : {"score": int 0-100, "couverture": [par mot-clé], "manquants": [mots-clés absents]}
+    """
+    kws = mots_cles_ponderes(analyse_offre or {})
+    if not kws or not texte_cv:
+        return {"score": 0, "couverture": [], "manquants": []}
+
+    mots = [k[0] for k in kws]
+    poids = np.array([k[2] for k in kws], dtype=np.float32)
+    lex = couverture_lexicale(mots, texte_cv)
+    sem = couverture_semantique(mots, texte_cv) if semantique else np.zeros_like(lex)
+    couv = np.maximum(lex, sem)
+
+    score = int(round(100 * float((couv * poids).sum() / poids.sum())))
+    details = [
+        {
+            "mot_cle": mot,
+            "source": source,
+            "lexical": round(float(l), 2),
+            "semantique": round(float(s), 2),
+            "couverture": round(float(c), 2),
+            "trouve": bool(c >= SEUIL_TROUVE),
+        }
+        for (mot, source, _), l, s, c in zip(kws, lex, sem, couv)
+    ]
+    return {
+        "score": score,
+        "couverture": details,
+        "manquants": [d["mot_cle"] for d in details if not d["trouve"]],
+    }
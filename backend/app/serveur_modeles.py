@@ -0,0 +1,236 @@
+# serveur_modeles.py
+
+import os
+import json
+import queue
+import socket
+import struct
+import threading
+import socketserver
+from concurrent.futures import Future
+
+import numpy as np
+
+from embeddings_onnx import charger_modeles
+
+
+"""
+SERVEUR DE MODÈLES LOCAL (SBERT + KeyBERT) partagé par tous les workers web.
+Objectif : charger les modèles une seule fois par machine au lieu d'une fois par
+worker uvicorn. Les workers lui parlent sur une socket Unix via ClientModeles,
+qui regroupe les appels d'encodage concurrents en un seul lot.
+
+Lancement :  python serveur_modeles.py [chemin_socket]
+Côté web  :  ARIA_MODEL_SOCKET=/tmp/aria_modeles.sock (sinon, modèles en process)
+
+Protocole : chaque message = en-tête JSON + charge binaire optionnelle (float32),
+précédés de leurs longueurs (2 x uint32 big-endian).
+"""
+
+
+SOCKET_DEFAUT = os.environ.get("ARIA_MODEL_SOCKET") or "/tmp/aria_modeles.sock"
+FENETRE_LOT_MS = float(os.environ.get("ARIA_MODEL_BATCH_MS", "5"))
+TAILLE_LOT_MAX = int(os.environ.get("ARIA_MODEL_BATCH_MAX", "64"))
+TIMEOUT_CLIENT = float(os.environ.get("ARIA_MODEL_TIMEOUT", "30"))
+
+
+class ModelesIndisponibles(Exception):
+    """Le serveur de modèles configuré n'a pas pu répondre (injoignable, trop lent ou en erreur)."""
+
+
+# ======================
+# Protocole
+# ======================
+def envoyer(sock, entete, charge=b""):
+    donnees = json.dumps(entete).encode("utf-8")
+    sock.sendall(struct.pack(">II", len(donnees), len(charge)) + donnees + charge)
+
+
+def _recevoir_exact(sock, n):
+    morceaux = []
+    while n:
+        bloc = sock.recv(min(n, 1 << 20))
+        if not bloc:
+            raise ConnectionError("Connexion fermée par le serveur de modèles.")
+        morceaux.append(bloc)
+        n -= len(bloc)
+
+    return b"".join(morceaux)
+
+
+def recevoir(sock):
+    n_entete, n_charge = struct.unpack(">II", _recevoir_exact(sock, 8))
+    entete = json.loads(_recevoir_exact(sock, n_entete).decode("utf-8"))
+    return entete, _recevoir_exact(sock, n_charge) if n_charge else b""
+
+
+def _vers_octets(matrice):
+    matrice = np.ascontiguousarray(matrice, dtype=np.float32)
+    return list(matrice.shape), matrice.tobytes()
+
+
+def _depuis_octets(forme, charge):
+    return np.frombuffer(charge, dtype=np.float32).reshape(forme)
+
+
+# ======================
+# Serveur
+# ======================
+class _Gestionnaire(socketserver.BaseRequestHandler):
+    """Une connexion = une suite de requêtes (les clients gardent leur socket ouverte)."""
+
+    def handle(self):
+        modeles = self.server.modeles
+        while True:
+            try:
+                entete, charge = recevoir(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                op = entete.get("op")
+                if op == "ping":
+                    envoyer(self.request, {"ok": True, "backend": modeles["backend"]})
+                elif op == "encode":
+                    with self.server.lock_modele:
+                        emb = modeles["sbert"].encode(entete["textes"])
+                    forme, octets = _vers_octets(emb)
+                    envoyer(self.request, {"ok": True, "forme": forme}, octets)
+                elif op == "mots_cles":
+                    with self.server.lock_modele:
+                        res = [[kw[0] for kw in modeles["keybert"].extract_keywords(
+                                    t, keyphrase_ngram_range=(1, 2), stop_words="english",
+                                    top_n=entete.get("top_n", 10))]
+                               for t in entete["textes"]]
+                    envoyer(self.request, {"ok": True, "mots_cles": res})
+                elif op == "topk":
+                    from index_corpus import charger_index
+                    index = charger_index(backend_requetes=modeles["backend"])
+                    vecteur = _depuis_octets(entete["forme"], charge)
+                    res = index.plus_proches(vecteur, entete.get("k", 10)) if index is not None else []
+                    envoyer(self.request, {"ok": True, "resultats": res})
+                else:
+                    envoyer(self.request, {"ok": False, "erreur": f"Opération inconnue : {op}"})
+            except Exception as e:
+                envoyer(self.request, {"ok": False, "erreur": str(e)})
+
+
+class ServeurModeles(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, chemin_socket=SOCKET_DEFAUT):
+        # SBERT PyTorch ou ONNX int8 selon ARIA_EMBEDDINGS_BACKEND
+        self.modeles = charger_modeles()
+        # Un seul passage modèle à la fois : torch / ONNX Runtime parallélisent déjà chaque lot sur les cœurs
+        self.lock_modele = threading.Lock()
+        if os.path.exists(chemin_socket):
+            os.remove(chemin_socket)
+        super().__init__(chemin_socket, _Gestionnaire)
+        os.chmod(chemin_socket, 0o660)
+        print(f"[MODELES] Serveur prêt sur {chemin_socket}")
+
+
+# ======================
+# Client
+# ======================
+class ClientModeles:
+    """
+    Client thread-safe du serveur de modèles.
+    Les appels encoder() concurrents d'un même worker sont regroupés en lots
+    (fenêtre de ARIA_MODEL_BATCH_MS ms, au plus ARIA_MODEL_BATCH_MAX textes).
+    """
+
+    def __init__(self, chemin_socket=SOCKET_DEFAUT):
+        self.chemin = chemin_socket
+        self._local = threading.local()
+        self._file = queue.Queue()
+        self._thread_lots = threading.Thread(target=self._boucle_lots, daemon=True, name="aria-lots-modeles")
+        self._thread_lots.start()
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(TIMEOUT_CLIENT)
+            sock.connect(self.chemin)
+            self._local.sock = sock
+        return sock
+
+    def _appel(self, entete, charge=b""):
+        try:
+            sock = self._socket()
+            envoyer(sock, entete, charge)
+            reponse, donnees = recevoir(sock)
+        except (OSError, ConnectionError) as e:
+            sock = getattr(self._local, "sock", None)
+            if sock is not None:
+                sock.close()
+            self._local.sock = None
+            raise ConnectionError(f"Serveur de modèles injoignable ({self.chemin}) : {e}")
+        if not reponse.get("ok"):
+            raise Exception(f"Serveur de modèles : {reponse.get('erreur')}")
+        return reponse, donnees
+
+    def disponible(self):
+        try:
+            self._appel({"op": "ping"})
+            return True
+        except Exception:
+            return False
+
+    def backend(self):
+        """Backend d'embeddings du serveur ("onnx" | "torch")."""
+        reponse, _ = self._appel({"op": "ping"})
+        return reponse.get("backend")
+
+    # ---------- Encodage groupé ----------
+    def _boucle_lots(self):
+        while True:
+            lot = [self._file.get()]
+            n_textes = len(lot[0][0])
+            delai = FENETRE_LOT_MS / 1000.0
+            while n_textes < TAILLE_LOT_MAX:
+                try:
+                    item = self._file.get(timeout=delai)
+                except queue.Empty:
+                    break
+                lot.append(item)
+                n_textes += len(item[0])
+            textes = [t for textes_item, _ in lot for t in textes_item]
+            try:
+                reponse, donnees = self._appel({"op": "encode", "textes": textes})
+                emb = _depuis_octets(reponse["forme"], donnees)
+                debut = 0
+                for textes_item, fut in lot:
+                    fut.set_result(emb[debut:debut + len(textes_item)])
+                    debut += len(textes_item)
+            except Exception as e:
+                for _, fut in lot:
+                    fut.set_exception(e)
+
+    def encoder(self, textes):
+        textes = list(textes)
+        if not textes:
+            return np.zeros((0, 0), dtype=np.float32)
+        fut = Future()
+        self._file.put((textes, fut))
+        return fut.result(timeout=TIMEOUT_CLIENT)
+
+    def mots_cles(self, textes, top_n=10):
+        reponse, _ = self._appel({"op": "mots_cles", "textes": list(textes), "top_n": top_n})
+        return reponse["mots_cles"]
+
+    def topk(self, vecteur, k=10):
+        forme, octets = _vers_octets(np.asarray(vecteur, dtype=np.float32))
+        reponse, _ = self._appel({"op": "topk", "forme": forme, "k": k}, octets)
+        return [(int(i), float(s)) for i, s in reponse["resultats"]]
+
+
+if __name__ == "__main__":
+    import sys
+    import embeddings_onnx
+    embeddings_onnx.PROCESS_DEDIE = True    # seul process à encoder : tous les cœurs
+    serveur = ServeurModeles(sys.argv[1] if len(sys.argv) > 1 else SOCKET_DEFAUT)
+    try:
+        serveur.serve_forever()
+    finally:
+        serveur.server_close()
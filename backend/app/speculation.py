@@ -0,0 +1,131 @@
+# speculation.py
+
+import os
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from echeance import Echeance, TravailAnnule
+
+
+"""
+CALCUL SPÉCULATIF entre deux étapes du parcours.
+Objectif : pendant que l'utilisateur lit le diagnostic (étape 2), lancer en fond
+les suites probables (phase 2, alternatives) pour que l'étape suivante soit prête
+au clic. Le travail est abandonné si l'utilisateur choisit l'autre branche, quitte
+la session ou ne revient pas dans le délai ARIA_SPECULATION_TTL.
+
+Budget global : au plus ARIA_SPECULATION_MAX travaux spéculatifs en attente ou en
+cours, toutes sessions confondues ; au-delà, rien n'est lancé (calcul au clic).
+"""
+
+
+BUDGET_SPECULATION = int(os.environ.get("ARIA_SPECULATION_MAX", "4"))
+TTL_SPECULATION = int(os.environ.get("ARIA_SPECULATION_TTL", "900"))   # secondes
+
+
+class Speculateur:
+    """
+    Travaux spéculatifs indexés par (session, nom).
+    Chaque travail reçoit une Echeance sans limite de temps qu'il doit consulter entre
+    ses étapes coûteuses (verifier_echeance) : un travail déjà démarré ne peut pas
+    être interrompu de force, seulement prié de s'arrêter.
+    """
+
+    def __init__(self, budget=BUDGET_SPECULATION, ttl=TTL_SPECULATION, ordonnanceur=None):
+        self.budget = budget
+        self.ttl = ttl
+        self.ordonnanceur = ordonnanceur    # OrdonnanceurLLM : appels en attente promus à la reprise
+        self._executeur = ThreadPoolExecutor(max_workers=max(budget, 1), thread_name_prefix="aria-spec")
+        self._lock = threading.Lock()
+        self._travaux = {}          # (cle, nom) -> (future, echeance, debut)
+        self.compteurs = Counter()
+
+    def _purger(self):
+        """Abandonne les travaux jamais réclamés (session quittée sans /reset). Sous self._lock."""
+        limite = time.monotonic() - self.ttl
+        for ident in [i for i, (_, _, debut) in self._travaux.items() if debut < limite]:
+            future, echeance, _ = self._travaux.pop(ident)
+            echeance.annuler()
+            future.cancel()
+            self.compteurs["expires"] += 1
+
+    def lancer(self, cle, nom, fn, *args):
+        """
+        Lance fn(*args, echeance=Echeance(priorite="fond")) en fond si le budget le permet.
+        Retourne False si le travail existe déjà ou si le budget global est épuisé.
+        """
+        with self._lock:
+            self._purger()
+            if (cle, nom) in self._travaux:
+                return False
+            actifs = sum(not f.done() for f, _, _ in self._travaux.values())
+            if actifs >= self.budget:
+                self.compteurs["hors_budget"] += 1
+                return False
+            echeance = Echeance(priorite="fond", session=cle)
+            future = self._executeur.submit(fn, *args, echeance=echeance)
+            self._travaux[(cle, nom)] = (future, echeance, time.monotonic())
+            self.compteurs["lances"] += 1
+        return True
+
+    def _promouvoir(self, cle, echeance, appelant):
+        """Le travail de fond devient celui de la requête : priorité, session, délai (voir Echeance.rattacher)."""
+        if appelant is None:
+            return
+        echeance.rattacher(appelant)
+        if self.ordonnanceur is not None:
+            self.ordonnanceur.reclasser(cle, "fond", echeance.priorite, echeance.limite)
+
+    def recuperer(self, cle, nom, timeout=None, echeance=None):
+        """
+        Résultat du travail (attendu s'il est en cours : il a de l'avance sur un recalcul,
+        au plus `timeout` secondes, après quoi il est abandonné).
+        echeance : celle de la requête qui le réclame ; le travail en cours est promu
+        (sa priorité, sa session, son délai) au lieu de rester en classe fond.
+        Retourne None s'il n'a pas été lancé, a échoué, a été annulé ou n'a pas fini à temps.
+        """
+        with self._lock:
+            entree = self._travaux.pop((cle, nom), None)
+        if entree is None:
+            return None
+        future, echeance_travail, _ = entree
+        self._promouvoir(cle, echeance_travail, echeance)
+        echeance = echeance_travail
+        try:
+            resultat = future.result(timeout=timeout)
+        except Exception as e:
+            echeance.annuler()
+            if not isinstance(e, TravailAnnule):
+                print(f"[SPECULATION] {nom} échoué, recalcul au clic : {e}")
+            self.compteurs["echoues"] += 1
+            return None
+        self.compteurs["utilises"] += 1
+        return resultat
+
+    def adopter(self, cle, nom):
+        """Réclame le travail sans l'attendre : il continue en fond pour le compte de la
+        requête (ses résultats sont mémoïsés ailleurs, la page n'attend pas : pas de
+        promotion). Retourne True s'il avait été lancé."""
+        with self._lock:
+            entree = self._travaux.pop((cle, nom), None)
+        if entree is not None:
+            self.compteurs["utilises"] += 1
+        return entree is not None
+
+    def annuler(self, cle, nom=None):
+        """Abandonne le travail `nom` de la session (tous ses travaux si nom est None)."""
+        with self._lock:
+            idents = [i for i in self._travaux if i[0] == cle and (nom is None or i[1] == nom)]
+            entrees = [self._travaux.pop(i) for i in idents]
+        for future, echeance, _ in entrees:
+            echeance.annuler()
+            future.cancel()
+            self.compteurs["annules"] += 1
+
+    def stats(self):
+        with self._lock:
+            en_cours = sum(not f.done() for f, _, _ in self._travaux.values())
+            return {"budget": self.budget, "en_cours": en_cours, "en_attente_de_clic": len(self._travaux) - en_cours,
+                    **self.compteurs}
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# Les modules de app/ s'importent à plat (from score_ats import ...), comme dans le conteneur
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,57 @@
+# test_cache_cv.py
+
+import os
+import time
+import threading
+
+from cache_cv import MagasinCV
+
+
+def _vieillir(chemin, secondes=3600):
+    """Recule la date d'accès d'un dossier de CV (comme s'il n'avait pas servi depuis longtemps)."""
+    t = time.time() - secondes
+    os.utime(chemin, (t, t))
+
+
+def test_bail_d_un_autre_worker_protege_de_l_eviction(tmp_path):
+    worker_a = MagasinCV(str(tmp_path), capacite=1)
+    worker_b = MagasinCV(str(tmp_path), capacite=1)
+    worker_a.acquerir("cv-a", "session-a")
+    worker_a.artefact("cv-a", "cv_original.txt", lambda: "texte A")
+    _vieillir(tmp_path / "cv-a")
+
+    worker_b.acquerir("cv-b", "session-b")   # excédent : cv-a reste, son bail est vivant
+    assert worker_b.lire("cv-a", "cv_original.txt") == "texte A"
+
+    worker_a.liberer_session("session-a")
+    _vieillir(tmp_path / "cv-a")
+    worker_b.acquerir("cv-c", "session-c")
+    assert not os.path.exists(tmp_path / "cv-a")
+    assert worker_b.stats() == {"cvs": 2, "references": 2, "capacite": 1}
+
+
+def test_acces_recent_protege_de_l_eviction(tmp_path):
+    magasin = MagasinCV(str(tmp_path), capacite=1)
+    magasin.artefact("cv-a", "cv_original.txt", lambda: "texte A")   # lecteur sans bail
+    magasin.acquerir("cv-b", "session-b")
+    assert magasin.lire("cv-a", "cv_original.txt") == "texte A"
+
+
+def test_extraction_vide_non_memoisee(tmp_path):
+    magasin = MagasinCV(str(tmp_path))
+    valeur, chemin = magasin.artefact("cv", "experiences_list.json", lambda: [], memoriser=bool)
+    assert valeur == [] and chemin is None
+    valeur, chemin = magasin.artefact("cv", "experiences_list.json", lambda: ["Dev @ A"], memoriser=bool)
+    assert valeur == ["Dev @ A"] and magasin.lire("cv", "experiences_list.json") == ["Dev @ A"]
+
+
+def test_ecritures_concurrentes_sans_fichier_temporaire_partage(tmp_path):
+    magasins = [MagasinCV(str(tmp_path)) for _ in range(8)]   # un par worker : pas de verrou commun
+    threads = [threading.Thread(target=m.ecrire, args=("cv", "alternatives.json", {"alternatives": [str(i)] * 500}))
+               for i, m in enumerate(magasins)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(magasins[0].lire("cv", "alternatives.json")["alternatives"]) == 500
+    assert os.listdir(tmp_path / "cv") == ["alternatives.json"]
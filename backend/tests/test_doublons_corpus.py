@@ -0,0 +1,33 @@
+# test_doublons_corpus.py
+
+from doublons_corpus import grouper_doublons, shingles, signatures_minhash, _permutations, PREMIER
+
+
+BASE = ("Data engineer with eight years of experience building batch and streaming pipelines "
+        "in Python and Scala on Spark, Airflow and Kafka, deployed on AWS with Terraform. "
+        "Led a team of four engineers, cut nightly job duration by forty percent, migrated the "
+        "warehouse from Hadoop to Snowflake and set up data quality checks with Great Expectations. "
+        "Previously backend developer on Django and PostgreSQL for an e-commerce platform serving "
+        "two million monthly users, in charge of payment integration and search relevance.")
+# ~2 % des mots modifiés : même CV, une ligne retouchée
+VARIANTE = BASE.replace("forty percent", "forty five percent")
+AUTRE = ("Infirmière diplômée d'État, dix ans en service de réanimation puis en bloc opératoire, "
+         "encadrement des étudiants, gestion des stocks de médicaments et des protocoles d'hygiène, "
+         "formation aux gestes d'urgence et participation au comité qualité de l'hôpital.")
+
+
+def test_signature_calculee_sans_debordement():
+    a, b = _permutations()
+    h = shingles(BASE)
+    attendu = [min((int(x) * int(ai) + int(bi)) % int(PREMIER) for x in h) for ai, bi in zip(a, b)]
+    assert signatures_minhash([BASE])[0].tolist() == attendu
+
+
+def test_quasi_doublons_regroupes():
+    canonique = grouper_doublons([BASE, AUTRE, VARIANTE])
+    assert canonique[0] == canonique[2] == 2          # canonique : le plus long des deux
+    assert canonique[1] == 1
+
+
+def test_textes_distincts_non_regroupes():
+    assert grouper_doublons([BASE, AUTRE]) == [0, 1]
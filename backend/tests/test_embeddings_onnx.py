@@ -0,0 +1,16 @@
+# test_embeddings_onnx.py
+
+import embeddings_onnx
+
+
+def test_threads_partages_entre_workers_web(monkeypatch):
+    monkeypatch.setattr(embeddings_onnx, "_coeurs", lambda: 8)
+    monkeypatch.setattr(embeddings_onnx, "THREADS", 0)
+    monkeypatch.setattr(embeddings_onnx, "WORKERS_WEB", 0)
+    assert embeddings_onnx.threads_onnx() == 1                  # nombre de workers inconnu
+    monkeypatch.setattr(embeddings_onnx, "WORKERS_WEB", 3)
+    assert embeddings_onnx.threads_onnx() == 2
+    monkeypatch.setattr(embeddings_onnx, "PROCESS_DEDIE", True)
+    assert embeddings_onnx.threads_onnx() == 8                  # serveur de modèles, index
+    monkeypatch.setattr(embeddings_onnx, "THREADS", 4)
+    assert embeddings_onnx.threads_onnx() == 4                  # ARIA_ONNX_THREADS prime
@@ -0,0 +1,36 @@
+# test_extraction_cv.py
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from reportlab.pdfgen import canvas
+
+import preflight
+from extraction_cv import extraire_texte_pdf
+
+
+def _pdf(n_pages=3):
+    tampon = io.BytesIO()
+    c = canvas.Canvas(tampon)
+    for i in range(n_pages):
+        c.drawString(100, 700, f"Page {i} : Data Engineer Python")
+        c.showPage()
+    c.save()
+    return tampon.getvalue()
+
+
+def test_extraction_concurrente():
+    # Uploads simultanés : les appels PDFium des threads de requêtes sont sérialisés
+    contenu = _pdf()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        textes = list(pool.map(lambda _: extraire_texte_pdf(contenu), range(64)))
+    assert set(textes) == {extraire_texte_pdf(contenu)}
+    assert "Page 2 : Data Engineer Python" in textes[0]
+
+
+def test_preflight_concurrent():
+    # Le préflight compte les pages par le même chemin sérialisé que l'extraction
+    contenu = _pdf(n_pages=5)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        resultats = list(pool.map(lambda _: preflight.verifier_fichier(contenu, "cv.pdf"), range(64)))
+    assert all(len(r) == 1 and "5 pages" in r[0] for r in resultats)
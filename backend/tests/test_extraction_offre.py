@@ -0,0 +1,47 @@
+# test_extraction_offre.py
+
+from contextlib import contextmanager
+
+import extraction_offre
+
+
+def _servir(monkeypatch, blocs):
+    class PageLocale:
+        @contextmanager
+        def page(self, url, ouvrir):
+            yield "text/html; charset=utf-8", "utf-8", iter(blocs)
+    monkeypatch.setattr(extraction_offre, "cassette", PageLocale())
+
+
+def test_job_posting_sans_description_complete_par_la_page(monkeypatch):
+    _servir(monkeypatch, [
+        b'<html><head><script type="application/ld+json">{"@type":"JobPosting","title":"Dev"}</script></head>',
+        b"<body><h1>Dev Python</h1><p>Missions : concevoir des API.</p></body></html>",
+    ])
+    texte = extraction_offre.extraire_offre("https://exemple.fr/offre")
+    assert "Poste : Dev" in texte and "Missions : concevoir des API." in texte
+
+
+def test_job_posting_avec_description_arrete_la_lecture(monkeypatch):
+    _servir(monkeypatch, [
+        b'<html><head><script type="application/ld+json">'
+        b'{"@type":"JobPosting","title":"Dev","description":"Concevoir des API"}</script></head>',
+        b"<body><p>Texte de la page</p></body></html>",
+    ])
+    texte = extraction_offre.extraire_offre("https://exemple.fr/offre")
+    assert "Description : Concevoir des API" in texte and "Texte de la page" not in texte
+
+
+def test_en_tete_du_site_ignore_en_tete_de_l_offre_garde():
+    html = ("<html><head><title>Data Engineer H/F - JobBoard</title></head><body>"
+            "<header><a>Connexion</a><a>Publier une offre</a></header>"
+            "<main><article><header><h1>Data Engineer H/F</h1><p>Lyon - CDI</p></header>"
+            "<p>Pipelines Spark.</p></article></main></body></html>")
+    texte = extraction_offre.html_vers_texte(html)
+    assert texte == "Data Engineer H/F\nLyon - CDI\nPipelines Spark."
+
+
+def test_title_intitule_de_repli_sans_h1():
+    html = ("<html><head><title>Infirmier de bloc (F/H)</title></head>"
+            "<body><div><p>Poste en réanimation.</p></div></body></html>")
+    assert extraction_offre.html_vers_texte(html) == "Infirmier de bloc (F/H)\nPoste en réanimation."
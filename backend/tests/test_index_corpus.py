@@ -0,0 +1,44 @@
+# test_index_corpus.py
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import index_corpus
+from index_corpus import (IndexCorpus, ecrire_textes, quantifier_embeddings, clusteriser_embeddings, _sauver,
+                          FICHIER_DOCUMENTS, FICHIER_EMBEDDINGS, FICHIER_CLUSTERS)
+
+
+TEXTES = ["Data Engineer\nPipelines Spark", "Infirmière\nRéanimation, « bloc » opératoire", "Comptable\n" + "x" * 5000]
+
+
+def _index(dossier):
+    """Les fichiers que construire_index écrit, sans passer par SBERT / KeyBERT."""
+    with open(os.path.join(dossier, FICHIER_DOCUMENTS), "w", encoding="utf-8") as f:
+        for i, texte in enumerate(TEXTES):
+            f.write(json.dumps({"id": str(i), "titre": texte.split("\n")[0], "mots_cles": []}) + "\n")
+    ecrire_textes(TEXTES, dossier)
+    _sauver(os.path.join(dossier, FICHIER_EMBEDDINGS), np.random.default_rng(0).normal(size=(3, 8)).astype(np.float32))
+    quantifier_embeddings(dossier)
+    clusteriser_embeddings(dossier)
+
+
+def test_textes_lus_a_la_demande(tmp_path):
+    _index(str(tmp_path))
+    index = IndexCorpus(str(tmp_path))
+    assert all("texte" not in d for d in index.documents)
+    assert [index.texte(i) for i in (2, 0, 1)] == [TEXTES[2], TEXTES[0], TEXTES[1]]
+
+
+def test_index_incomplet_refuse_au_chargement(tmp_path, monkeypatch):
+    _index(str(tmp_path))
+    os.remove(os.path.join(str(tmp_path), FICHIER_CLUSTERS))
+    with pytest.raises(Exception, match="Index incomplet"):
+        IndexCorpus(str(tmp_path))
+    assert not os.path.exists(os.path.join(str(tmp_path), FICHIER_CLUSTERS))   # rien n'est écrit au chargement
+
+    monkeypatch.setattr(index_corpus, "_index", None)
+    monkeypatch.setattr(index_corpus, "_index_erreur", None)
+    assert index_corpus.charger_index(str(tmp_path)) is None
@@ -0,0 +1,37 @@
+# test_json_llm.py
+
+from json_llm import SCHEMAS, ParseurJSONIncremental, champs_manquants, charger_json, completer_champs
+
+
+def test_prose_avant_objet_ignoree_si_le_schema_attend_un_objet():
+    assert charger_json('Note [1]: voici {"alternatives": ["Data Analyst"]}', SCHEMAS["alternatives"]) \
+        == {"alternatives": ["Data Analyst"]}
+
+
+def test_reparation_fences_et_virgules():
+    assert charger_json('```json\n{"a": [1, 2,], "b": "ok",}\n``` fin') == {"a": [1, 2], "b": "ok"}
+
+
+def test_chaine_tronquee_signalee_manquante():
+    parseur = ParseurJSONIncremental(SCHEMAS["evaluation"])
+    parseur.feed('{"score": 72, "points_forts": ["Python"], "points_faibles": [], "recommandations": [], '
+                 '"verdict_court": "Bon profil mais')
+    obj = parseur.resultat()
+    assert obj["verdict_court"] is None
+    assert champs_manquants(obj, SCHEMAS["evaluation"]) == ["verdict_court"]
+
+
+def test_element_de_liste_tronque_redemande():
+    parseur = ParseurJSONIncremental(SCHEMAS["evaluation"])
+    parseur.feed('{"score": 72, "points_faibles": [], "verdict_court": "ok", "recommandations": [], '
+                 '"points_forts": ["Python", "Communicat')
+    obj = parseur.resultat()
+    assert champs_manquants(obj, SCHEMAS["evaluation"]) == ["points_forts.1"]
+    complet = completer_champs(obj, SCHEMAS["evaluation"], "prompt",
+                               lambda prompt: 'Voici [le complément] : {"points_forts.1": "Communication"}')
+    assert complet["points_forts"] == ["Python", "Communication"]
+
+
+def test_element_tronque_retire_si_la_completion_echoue():
+    obj = charger_json('{"score": 72, "points_forts": ["Python", "Communicat')
+    assert obj["points_forts"] == ["Python"]
@@ -0,0 +1,31 @@
+# test_modele_cv.py
+
+from modele_cv import CV, texte_cv, lire_texte_cv
+
+
+CV_JSON = {
+    "entete": {"prenom_nom": "Camille Martin", "contact_info": "camille@mail.fr | 06 12 34 56 78"},
+    "resume": "Ingénieure data orientée produit.",
+    "experiences": [{"poste": "Data Engineer", "entreprise": "Société A", "dates": "2019 - 2022",
+                     "taches": ["Pipelines Spark", "Orchestration Airflow"]}],
+    "formation": [{"diplome": "Master Informatique", "ecole": "Université de Lyon", "dates": "2012",
+                   "details": "Mention bien"}],
+    "competences_techniques": "Python, SQL",
+    "soft_skills": "Rigueur",
+    "langues": "Anglais",
+    "certifications": "AWS",
+    "interets": "Trail",
+}
+
+
+def test_relecture_du_texte_modifie():
+    cv = CV.depuis_json(CV_JSON)
+    texte = texte_cv(cv).replace("- Orchestration Airflow", "- Orchestration Airflow\n- Déploiement Kubernetes")
+    relu = lire_texte_cv(texte, cv)
+    assert relu.experiences[0].taches == ("Pipelines Spark", "Orchestration Airflow", "Déploiement Kubernetes")
+    assert (relu.prenom_nom, relu.certifications, relu.formation[0].details) == ("Camille Martin", "AWS", "Mention bien")
+    assert lire_texte_cv(texte_cv(cv), cv).vers_json() == cv.vers_json()
+
+
+def test_texte_hors_mise_en_page():
+    assert lire_texte_cv("Camille Martin\nData Engineer chez Société A") is None
@@ -0,0 +1,106 @@
+# test_parcours.py
+
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import docx
+import pytest
+from fastapi.testclient import TestClient
+
+# main s'importe comme dans le conteneur (from app import logic)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import main  # noqa: E402
+from app import logic  # noqa: E402
+import score_ats  # noqa: E402
+
+
+ANALYSE_OFFRE = {"titre_poste": "Data Engineer", "competences_cles": ["Python", "Spark"],
+                 "mots_cles_ats": ["Airflow", "Kubernetes"], "missions_principales": ["Pipelines"]}
+EVALUATION = {"score": 72, "points_forts": ["Python"], "points_faibles": ["Kubernetes"],
+              "verdict_court": "Bon profil", "recommandations": ["Citer Kubernetes"]}
+
+
+def _mistral(prompt, schema=None, avec_brut=False, echeance=None):
+    """Réponses Mistral figées par schéma (aucun appel réseau)."""
+    reponse = {"evaluation": EVALUATION, "experiences": {"experiences": []}}.get(schema, {})
+    return (reponse, "") if avec_brut else reponse
+
+
+def _cv_docx():
+    document = docx.Document()
+    for ligne in ("Camille Martin", "camille@mail.fr | 06 12 34 56 78", "PROFIL",
+                  "Ingénieure data, huit ans de pipelines batch et streaming en production.",
+                  "EXPÉRIENCES", "Data Engineer - Société A (2019 - 2022)",
+                  "Conception de pipelines Python et Spark orchestrés sous Airflow",
+                  "Migration de l'entrepôt Hadoop vers Snowflake, contrôles de qualité des données",
+                  "Développeuse backend - Société B (2015 - 2019)",
+                  "API Django et PostgreSQL pour une plateforme e-commerce de deux millions d'utilisateurs",
+                  "FORMATION", "Master Informatique - Université de Lyon (2012)",
+                  "COMPÉTENCES", "Python, SQL, Spark, Airflow, Docker, Terraform", "LANGUES", "Anglais courant"):
+        document.add_paragraph(ligne)
+    tampon = io.BytesIO()
+    document.save(tampon)
+    return tampon.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(logic, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(logic, "magasin_cv", logic.MagasinCV(str(tmp_path / "cv_store")))
+    # Exécuteurs propres au test : les travaux de fond (même adoptés ou annulés) finissent
+    # avant que le magasin temporaire ne soit retiré
+    speculateur = logic.Speculateur(ordonnanceur=logic.limiteur_mistral)
+    executeur_fond = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(logic, "speculateur", speculateur)
+    monkeypatch.setattr(logic, "executeur_fond", executeur_fond)
+    monkeypatch.setattr(logic, "appeler_mistral_json", _mistral)
+    monkeypatch.setattr(logic, "analyser_offre",
+                        lambda url_offre=None, texte_offre=None: {"hash": "offre-test", "analyse": ANALYSE_OFFRE})
+    monkeypatch.setattr(logic.preflight, "verifier_url", lambda url: [])
+    monkeypatch.setattr(logic, "scorer_cv", lambda texte, analyse: score_ats.scorer_cv(texte, analyse, semantique=False))
+    monkeypatch.setattr(logic, "embedding_offre", lambda data, analyse: None)
+    with TestClient(main.app) as c:
+        yield c
+    for uid in list(main.SESSIONS_DB):
+        logic.speculateur.annuler(uid)
+        logic.clean_session_files(uid)
+        main.SESSIONS_DB.pop(uid)
+    speculateur._executeur.shutdown(wait=True)
+    executeur_fond.shutdown(wait=True)
+
+
+def _deposer_cv(client):
+    return client.post("/step1", data={"url_offre": "https://exemple.fr/offre"},
+                       files={"cv_file": ("cv.docx", _cv_docx())}, follow_redirects=False)
+
+
+def test_etape_1_puis_optimisation(client):
+    reponse = _deposer_cv(client)
+    assert reponse.status_code == 303 and reponse.headers["location"] == "/step2"
+
+    diagnostic = client.get("/step2")
+    assert diagnostic.status_code == 200 and "Data Engineer" in diagnostic.text
+
+    reponse = client.post("/step2", data={"decision_radio": "auto_optimiser"}, follow_redirects=False)
+    assert reponse.status_code == 303 and reponse.headers["location"] == "/step3"
+
+
+def test_evaluation_ia_garde_l_echelle_ats(client):
+    _deposer_cv(client)
+    uid = next(iter(main.SESSIONS_DB))
+    logic.attendre_evaluation(uid)
+    data = main.SESSIONS_DB[uid]["data"]
+    evaluation = logic.get_json_from_disk(data["evaluation_original_path"])
+    assert evaluation["verdict_court"] == "Bon profil"
+    assert evaluation["score"] == logic.get_json_from_disk(data["score_ats_path"])["score"] == data["score_initial"]
+
+
+def test_matching_refuse_les_identifiants_en_double(client):
+    reponse = client.post("/api/matching", json={
+        "cvs": [{"id": "a", "texte": "Python"}, {"id": "a", "texte": "Java"}, {"texte": "SQL"}],
+        "offres": [{"id": "offre_1", "texte": "Dev"}, {"texte": "Data"}]})   # offre_1 : id fourni = id généré
+    assert reponse.status_code == 400
+    assert reponse.json()["error"] == "Identifiants en double : a, offre_1"
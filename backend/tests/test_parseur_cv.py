@@ -0,0 +1,52 @@
+# test_parseur_cv.py
+
+import os
+import json
+
+from parseur_cv import SEUIL_CONFIANCE, analyser_cv, confiance_experiences, evaluer, extraire_experiences
+
+DONNEES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "donnees")
+
+
+def _cvs_annotes():
+    with open(os.path.join(DONNEES, "cvs_annotes.jsonl"), encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+def test_fin_de_periode_en_francais():
+    for fin in ("Présent", "présent", "Aujourd'hui", "En cours", "Actuellement"):
+        exps = extraire_experiences([f"Data Engineer – Capgemini – Janvier 2021 – {fin}"])
+        assert exps[0]["dates"] == f"Janvier 2021 – {fin}"
+        assert (exps[0]["poste"], exps[0]["employeur"]) == ("Data Engineer", "Capgemini")
+
+
+def test_jetons_du_corpus_ignores_hors_mode_corpus():
+    ligne = ["Accountant Company Name City , State 2015 - 2018"]
+    assert extraire_experiences(ligne, corpus=True)[0]["employeur"] == "Company Name"
+    assert extraire_experiences(ligne)[0]["employeur"] != "Company Name"
+
+
+def test_separation_douteuse_sous_le_seuil():
+    # Deux intitulés de poste : l'employeur n'en est pas un
+    exps = [{"poste": "Data Engineer", "employeur": "Lead Developer", "dates": "2020", "taches": []}]
+    assert confiance_experiences(exps, True) < SEUIL_CONFIANCE
+
+
+def test_structure_partielle_sous_le_seuil():
+    # Postes bien séparés mais la moitié des plages de dates et des lignes non rattachées
+    exps = [{"poste": "Comptable", "employeur": "KPMG", "dates": "2020 - 2021", "taches": []}]
+    assert confiance_experiences(exps, True, {"lignes": 0.2, "dates": 0.3}) < SEUIL_CONFIANCE
+    assert confiance_experiences(exps, True, {"lignes": 1.0, "dates": 1.0}) == 1.0
+
+
+def test_cvs_annotes_non_anonymises():
+    resultats = evaluer(_cvs_annotes())
+    assert resultats["poste"] >= 0.9 and resultats["dates"] >= 0.9 and resultats["employeur"] >= 0.8
+    # Un CV jugé fiable (pas d'appel LLM) doit être exact
+    assert resultats["precision_fiables"] == 1.0
+
+
+def test_cv_mal_decoupe_renvoye_au_llm():
+    # Date, poste et employeur sur trois lignes : l'employeur n'est pas trouvé
+    cv = next(c for c in _cvs_annotes() if "Groupe SEB" in c["texte"])
+    assert analyser_cv(cv["texte"])["confiance"] < SEUIL_CONFIANCE
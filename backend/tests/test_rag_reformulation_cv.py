@@ -0,0 +1,16 @@
+# test_rag_reformulation_cv.py
+
+import numpy as np
+
+from rag_reformulation_cv import filtrer_pertinents
+
+
+def test_un_mot_cle_courant_ne_suffit_pas():
+    sims = np.array([0.55, 0.20, 0.25, 0.10])
+    scores_bm25 = np.array([0.0, 9.0, 0.4, 5.0])   # CV 2 : un seul mot-clé courant en commun
+    assert filtrer_pertinents([1, 0, 3, 2], sims, scores_bm25) == [1, 0, 3]
+
+
+def test_sans_score_bm25_seule_la_semantique_compte():
+    sims = np.array([0.55, 0.20])
+    assert filtrer_pertinents([0, 1], sims, np.zeros(2)) == [0]
@@ -0,0 +1,56 @@
+# test_serveur_modeles.py
+
+from concurrent.futures import TimeoutError as AttenteExpiree
+
+import numpy as np
+import pytest
+
+import rag_reformulation_cv
+from serveur_modeles import ModelesIndisponibles
+
+
+class ClientFactice:
+    """Client de modèles dont les premiers appels échouent avec `erreurs` (dans l'ordre)."""
+
+    def __init__(self, *erreurs):
+        self.erreurs = list(erreurs)
+        self.appels = 0
+
+    def encoder(self, textes):
+        self.appels += 1
+        if self.erreurs:
+            raise self.erreurs.pop(0)
+        return np.ones((len(textes), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def serveur(monkeypatch):
+    monkeypatch.setattr(rag_reformulation_cv, "ATTENTE_ESSAI_SERVEUR", 0)
+    monkeypatch.setattr(rag_reformulation_cv, "_modeles_locaux",
+                        lambda: pytest.fail("modèles chargés dans le worker malgré le serveur"))
+
+    def installer(client):
+        monkeypatch.setattr(rag_reformulation_cv, "client_modeles", client)
+        return client
+    return installer
+
+
+def test_serveur_pas_encore_pret_reessaye(serveur):
+    client = serveur(ClientFactice(ConnectionError("refusé"), ConnectionError("refusé")))
+    assert rag_reformulation_cv.encoder_textes(["a", "b"]).shape == (2, 4)
+    assert client.appels == 3
+
+
+def test_serveur_injoignable_sans_repli_en_process(serveur):
+    client = serveur(ClientFactice(*[ConnectionError("refusé")] * rag_reformulation_cv.ESSAIS_SERVEUR))
+    with pytest.raises(ModelesIndisponibles, match="après"):
+        rag_reformulation_cv.encoder_textes(["a"])
+    assert client.appels == rag_reformulation_cv.ESSAIS_SERVEUR
+
+
+@pytest.mark.parametrize("erreur", [AttenteExpiree(), Exception("Serveur de modèles : CUDA out of memory")])
+def test_delai_ou_erreur_serveur_sans_nouvel_essai(serveur, erreur):
+    client = serveur(ClientFactice(erreur))
+    with pytest.raises(ModelesIndisponibles):
+        rag_reformulation_cv.encoder_textes(["a"])
+    assert client.appels == 1